@@ -1,17 +1,27 @@
-from flask import Flask, render_template, jsonify
-import importlib
-import pkgutil
-from services.base import ServiceBase
+from flask import Flask, abort, jsonify, render_template, request, send_file
 import pathlib
 import os
+import threading
+from typing import Callable, List, Optional
 
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
-def create_app():
-    app = Flask(
-        __name__,
-        template_folder=str(pathlib.Path(__file__).parent / "templates"),
-        static_folder=str(pathlib.Path(__file__).parent / "static"),
-    )
+from services import assets, db_trace, manifest, metrics, profiling, session_store
+from services.cached_response import CachedBody
+
+BASE_DIR = pathlib.Path(__file__).parent
+
+# Хуки, которые применяются к главному приложению и к каждому приложению сервиса
+# при его создании (middleware, метрики, профилирование и т.п.)
+AppHook = Callable[[Flask], None]
+
+
+def _env_list(name: str) -> Optional[List[str]]:
+    raw = os.environ.get(name, "").strip()
+    return [x.strip() for x in raw.split(",") if x.strip()] or None
+
+
+def _configure(app: Flask) -> None:
     app.config["JSON_AS_ASCII"] = False
 
     # ✅ секрет для cookie-сессий
@@ -23,44 +33,156 @@ def create_app():
     app.config["MAX_FORM_MEMORY_SIZE"] = 512 * 1024 * 1024      # 512 МБ на «нефайловые» поля (textarea)
     app.config["MAX_FORM_PARTS"] = 200000                       # много частей формы (если понадобится)
 
+    # URL статики с отпечатком содержимого: {{ asset_url('style.css') }}
+    app.jinja_env.globals["asset_url"] = assets.url
+
+
+class LazyServiceApp:
+    """
+    WSGI-приложение сервиса, которое создаётся при первом запросе к /services/<id>:
+    только тогда импортируется модуль сервиса и регистрируется его blueprint.
+    """
+    def __init__(self, parent: Flask, info: manifest.ServiceInfo):
+        self.parent = parent
+        self.info = info
+        self._app: Optional[Flask] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Flask:
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    self._app = self._build()
+        return self._app
+
+    def _build(self) -> Flask:
+        svc = manifest.load_service(self.info)
+        sub = Flask(__name__, template_folder=str(BASE_DIR / "templates"), static_folder=None)
+        _configure(sub)
+        # одна сессия на всё приложение: тот же бэкенд и та же cookie
+        sub.session_interface = self.parent.session_interface
+        sub.register_blueprint(svc.blueprint)
+        for hook in self.parent.extensions["service_app_hooks"]:
+            hook(sub)
+        return sub
+
+    def __call__(self, environ, start_response):
+        return self.load()(environ, start_response)
+
+
+def add_app_hook(app: Flask, hook: AppHook) -> None:
+    """
+    Применяет hook к главному приложению, к уже созданным и ко всем будущим приложениям сервисов.
+    """
+    app.extensions["service_app_hooks"].append(hook)
+    hook(app)
+    for lazy in app.extensions["service_apps"].values():
+        if lazy._app is not None:
+            hook(lazy._app)
+
+
+def preload_services(app: Flask) -> None:
+    """
+    Создать приложения всех сервисов сразу (например, до fork воркеров gunicorn).
+    """
+    for lazy in app.extensions["service_apps"].values():
+        lazy.load()
+
+
+def create_app(preload: Optional[bool] = None):
+    app = Flask(
+        __name__,
+        template_folder=str(BASE_DIR / "templates"),
+        static_folder=str(BASE_DIR / "static"),
+    )
+    _configure(app)
+    # серверные сессии: в cookie только подписанный id (SESSION_BACKEND=cookie — как раньше)
+    session_interface = session_store.make_interface()
+    if session_interface is not None:
+        app.session_interface = session_interface
 
-    # Динамический поиск сервисов
-    services = []
-    services_path = pathlib.Path(__file__).parent / "services"
-    for finder, name, ispkg in pkgutil.iter_modules([str(services_path)]):
-        if name in ("base", "__pycache__"):
-            continue
-        module = importlib.import_module(f"services.{name}")
-        svc = getattr(module, "service", None)
-        if isinstance(svc, ServiceBase):
-            services.append(svc)
-            if svc.blueprint is not None:
-                app.register_blueprint(svc.blueprint, url_prefix=f"/services/{svc.id}")
-
-    services.sort(key=lambda s: s.name.lower())
+    # Сервисы — по манифесту (без импорта модулей); STP_SERVICES=id1,id2 — только эти
+    services = manifest.discover(allow=_env_list("STP_SERVICES"))
     app.extensions["services"] = services
+    app.extensions["service_app_hooks"] = []
+    app.extensions["service_apps"] = {
+        s.id: LazyServiceApp(app, s) for s in services if s.has_blueprint
+    }
+    app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {
+        f"/services/{sid}": lazy for sid, lazy in app.extensions["service_apps"].items()
+    })
+    # профилирование запроса по флагу (только при PROFILE_TOKEN) — снаружи всего, включая сервисы
+    profiling.install(app)
+    # счётчики и гистограммы запросов — во всех приложениях, включая ленивые
+    add_app_hook(app, metrics.instrument)
+    # число и время запросов к БД за HTTP-запрос — в заголовки ответа и лог
+    add_app_hook(app, db_trace.instrument)
+    if preload is None:
+        preload = os.environ.get("STP_PRELOAD_SERVICES", "") not in ("", "0")
+    if preload:
+        preload_services(app)
 
-    # === ГЛАВНАЯ СТРАНИЦА ===
-    @app.route("/")
-    def index():
-        tiles = [{
+    def _tiles():
+        return [{
             "id": s.id,
             "name": s.name,
             "description": s.description,
             "icon": s.icon,
-            "path": f"/services/{s.id}" if s.blueprint else None
+            "path": s.path,
         } for s in services]
-        return render_template("index.html", tiles=tiles)
 
-    # Опционально: JSON-список сервисов
-    @app.route("/api/services")
-    def api_services():
-        return jsonify([{
+    # === ГЛАВНАЯ СТРАНИЦА ===
+    # Список сервисов после create_app() не меняется — страница и JSON рендерятся
+    # один раз, сжимаются заранее и отдаются с ETag/304.
+    assets.build()  # отпечатки и сжатие статики — один раз при старте
+    with app.app_context():
+        index_body = CachedBody(render_template("index.html", tiles=_tiles()))
+        api_body = CachedBody(app.json.dumps([{
             "id": s.id,
             "name": s.name,
             "description": s.description,
             "icon": s.icon,
-        } for s in services])
+        } for s in services]), content_type="application/json")
+
+    # Метрики Prometheus (текстовый формат)
+    @app.route("/metrics")
+    def metrics_endpoint():
+        return metrics.metrics_response()
+
+    # Профили запросов (кольцо .prof): доступ по тому же PROFILE_TOKEN
+    if profiling.enabled():
+        def _profile_auth():
+            if not profiling.check_token(request.headers.get("X-Profile-Token") or request.args.get("token")):
+                abort(404)
+
+        @app.route("/_profiles")
+        def profiles_list():
+            _profile_auth()
+            return jsonify(profiling.list_profiles())
+
+        @app.route("/_profiles/<name>")
+        def profiles_download(name):
+            _profile_auth()
+            path = profiling.profile_path(name)
+            if path is None:
+                abort(404)
+            return send_file(path, as_attachment=True, max_age=0)
+
+    @app.route("/assets/<path:name>")
+    def asset(name):
+        resp = assets.response(name)
+        if resp is None:
+            abort(404)
+        return resp
+
+    @app.route("/")
+    def index():
+        return index_body.response()
+
+    # Опционально: JSON-список сервисов
+    @app.route("/api/services")
+    def api_services():
+        return api_body.response()
 
 
     return app
@@ -72,13 +194,7 @@ def create_app():
         # Можно вернуть свой шаблон или редирект на нужный сервис
         return render_template(
             "index.html",
-            tiles=[{
-                "id": s.id,
-                "name": s.name,
-                "description": s.description,
-                "icon": s.icon,
-                "path": f"/services/{s.id}" if s.blueprint else None
-            } for s in app.extensions["services"]],
+            tiles=_tiles(),
             # Положи на страницу заметный баннер/алерт, если в шаблоне предусмотрено
         ), 413
 
@@ -0,0 +1,274 @@
+"""
+Воспроизводимые замеры выгрузок json_inspector: codes/sec и пиковый RSS.
+
+    python benchmarks/bench_json_inspector.py --sizes 10k,1m --json out.json
+    python benchmarks/bench_json_inspector.py --sizes 10k,1m,10m --compare baseline.json
+    python benchmarks/bench_json_inspector.py --compare baseline.json --against out.json   # без запуска
+
+Случаи (--cases):
+  parse       _parse_codes по файлу построчно
+  csv         _csv_stream(_parse_codes(...))
+  xml         _xml_stream(core, prod, _parse_codes(...))
+  http_csv    POST /download/csv (codes_file) через тестовый клиент Flask, тело читается до конца
+  http_xml    POST /download/xml (codes_file)
+  upload      POST /upload исходного JSON с N товарами (разбор core/prod + индекс товаров)
+
+Коды синтетические, варианты (--variant): plain, gs (<GS>), gs_raw (0x1D), gt (хвост <GT>),
+gt_escaped (&lt;GT&gt;), mixed — по очереди все. Входные файлы генерируются один раз
+в --data-dir и переиспользуются, так что генерация не попадает в замер.
+Каждый случай идёт в отдельном процессе: пиковый RSS — именно этого случая.
+Результаты — JSON; --compare сравнивает с прошлым прогоном и завершается с кодом 1,
+если codes/sec упал или пиковый RSS вырос больше чем на --threshold.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CASES = ("parse", "csv", "xml", "http_csv", "http_xml", "upload")
+VARIANTS = ("plain", "gs", "gs_raw", "gt", "gt_escaped", "mixed")
+FORM = {"producer_inn": "7700000000", "owner_inn": "7700000000", "production_date": "2025-01-01",
+        "production_type": "OWN_PRODUCTION", "tnved_code": "6403990000",
+        "certificate_type": "CONFORMITY_DECLARATION", "certificate_number": "RU-D-1",
+        "certificate_date": "2024-12-01", "fname": "bench"}
+CORE = {k: FORM[k] for k in ("producer_inn", "owner_inn", "production_date", "production_type")}
+PROD = {"tnved_code": "6403990000", "certificate_type": "CONFORMITY_DECLARATION",
+        "certificate_number": "RU-D-1", "certificate_date": "2024-12-01",
+        "vsd_number": "", "production_date": "2025-01-01"}
+
+
+# ---------- синтетические данные ----------
+
+def gen_code(i: int, variant: str) -> str:
+    if variant == "mixed":
+        variant = VARIANTS[i % (len(VARIANTS) - 1)]
+    base = f"0104600000000000215{i:013d}"
+    if variant == "gs":
+        return base + "<GS>93dGVz"
+    if variant == "gs_raw":
+        return base + "\x1d93dGVz"
+    if variant == "gt":
+        return base + "<GS>93dGVz<GT>91EE10"
+    if variant == "gt_escaped":
+        return base + "&lt;GS&gt;93dGVz&lt;GT&gt;91EE10"
+    return base
+
+
+def gen_codes(n: int, variant: str) -> Iterator[str]:
+    for i in range(n):
+        yield gen_code(i, variant)
+
+
+def _write_atomic(path: pathlib.Path, chunks: Iterator[str]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+
+
+def codes_file(data_dir: pathlib.Path, n: int, variant: str) -> pathlib.Path:
+    path = data_dir / f"codes_{variant}_{n}.txt"
+    if not path.exists():
+        _write_atomic(path, (c + "\n" for c in gen_codes(n, variant)))
+    return path
+
+
+def source_json_file(data_dir: pathlib.Path, n: int, variant: str) -> pathlib.Path:
+    """Исходный документ как у выгрузки из ГИС: шапка + products с ki."""
+    path = data_dir / f"source_{variant}_{n}.json"
+    if path.exists():
+        return path
+
+    def chunks() -> Iterator[str]:
+        head = dict(CORE, products=None)
+        yield json.dumps(head, ensure_ascii=False)[:-len('null}')] + "["
+        for i in range(n):
+            p = {"ki": gen_code(i, variant), "tnved_code": PROD["tnved_code"],
+                 "certificate_document": PROD["certificate_type"],
+                 "certificate_document_number": PROD["certificate_number"],
+                 "certificate_document_date": PROD["certificate_date"]}
+            yield ("," if i else "") + json.dumps(p, ensure_ascii=False)
+        yield "]}"
+
+    _write_atomic(path, chunks())
+    return path
+
+
+# ---------- один случай (в дочернем процессе) ----------
+
+def _peak_rss_mb() -> float:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _drain(chunks) -> int:
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+    return total
+
+
+def _http(path: str, case: str) -> int:
+    from app import create_app
+    client = create_app().test_client()
+    with open(path, "rb") as f:
+        if case == "upload":
+            data = {"json_file": (f, "source.json", "application/json")}
+            url = "/services/json-inspector/upload"
+        else:
+            data = dict(FORM, codes_file=(f, "codes.txt", "text/plain"))
+            url = "/services/json-inspector/download/" + case.split("_", 1)[1]
+        resp = client.post(url, data=data, content_type="multipart/form-data")
+    try:
+        if resp.status_code != 200:
+            raise RuntimeError(f"{url}: HTTP {resp.status_code}")
+        return _drain(resp.response)
+    finally:
+        resp.close()
+
+
+def run_case(case: str, path: str, repeat: int) -> Dict[str, Any]:
+    from services import json_inspector as ji
+    baseline = _peak_rss_mb()
+    best = None
+    out_bytes = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        if case == "parse":
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                out_bytes = sum(len(c) for c in ji._parse_codes(f))
+        elif case == "csv":
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                out_bytes = _drain(ji._csv_stream(ji._parse_codes(f), workers=1))
+        elif case == "xml":
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                out_bytes = _drain(ji._xml_stream(CORE, PROD, ji._parse_codes(f), workers=1))
+        else:
+            out_bytes = _http(path, case)
+        sec = time.perf_counter() - t0
+        best = sec if best is None else min(best, sec)
+    return {"seconds": round(best, 4), "bytes": out_bytes,
+            "peak_rss_mb": round(_peak_rss_mb(), 1), "baseline_rss_mb": round(baseline, 1)}
+
+
+# ---------- оркестрация ----------
+
+def parse_size(s: str) -> int:
+    s = s.strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+def _spawn(case: str, path: pathlib.Path, repeat: int) -> Dict[str, Any]:
+    env = dict(os.environ, EXPORT_WORKERS="1", STP_SERVICES="json-inspector", PYTHONHASHSEED="0")
+    proc = subprocess.run([sys.executable, __file__, "--child", case, str(path), "--repeat", str(repeat)],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{case}: {proc.stderr.strip().splitlines()[-1:] or proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(r: Dict[str, Any]) -> tuple:
+    return r["case"], r["variant"], r["codes"]
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> int:
+    prev = {_key(r): r for r in old["results"]}
+    regressions = 0
+    print(f"\n{'case':<10} {'variant':<11} {'codes':>10} {'codes/s было':>14} {'стало':>12} {'Δ':>7}"
+          f" {'RSS МБ было':>12} {'стало':>8} {'Δ':>7}")
+    for r in new["results"]:
+        p = prev.get(_key(r))
+        if p is None:
+            continue
+        d_rate = r["codes_per_sec"] / p["codes_per_sec"] - 1 if p["codes_per_sec"] else 0.0
+        d_rss = r["peak_rss_mb"] / p["peak_rss_mb"] - 1 if p["peak_rss_mb"] else 0.0
+        bad = d_rate < -threshold or d_rss > threshold
+        regressions += bad
+        print(f"{r['case']:<10} {r['variant']:<11} {r['codes']:>10,} {p['codes_per_sec']:>14,.0f} {r['codes_per_sec']:>12,.0f}"
+              f" {d_rate:>+7.1%} {p['peak_rss_mb']:>12.1f} {r['peak_rss_mb']:>8.1f} {d_rss:>+7.1%}"
+              + ("  << РЕГРЕССИЯ" if bad else ""))
+    print(f"\nрегрессий (порог {threshold:.0%}): {regressions}")
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10k,1m", help="числа кодов через запятую (10k, 1m, 10m)")
+    ap.add_argument("--cases", default=",".join(CASES))
+    ap.add_argument("--variant", action="append", dest="variants", choices=VARIANTS,
+                    help="вариант кодов (можно несколько), по умолчанию mixed")
+    ap.add_argument("--repeat", type=int, default=1, help="повторов в процессе случая (берётся лучший)")
+    ap.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "stp_bench_data"))
+    ap.add_argument("--json", dest="json_path", help="куда сохранить результаты")
+    ap.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    ap.add_argument("--against", help="сравнить --compare с этим JSON без запуска замеров")
+    ap.add_argument("--threshold", type=float, default=0.10, help="допустимое ухудшение (доля)")
+    ap.add_argument("--child", nargs=2, metavar=("CASE", "PATH"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child[0], args.child[1], args.repeat)))
+        return
+
+    if args.against:
+        if not args.compare:
+            ap.error("--against требует --compare")
+        with open(args.compare, encoding="utf-8") as f1, open(args.against, encoding="utf-8") as f2:
+            sys.exit(compare(json.load(f1), json.load(f2), args.threshold))
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        ap.error(f"неизвестные случаи: {', '.join(sorted(unknown))}")
+    data_dir = pathlib.Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    results: List[Dict[str, Any]] = []
+    print(f"{'case':<10} {'variant':<11} {'codes':>10} {'sec':>9} {'codes/s':>12} {'MB/s':>8} {'RSS МБ':>8}")
+    for size in [parse_size(s) for s in args.sizes.split(",") if s.strip()]:
+        for variant in args.variants or ["mixed"]:
+            for case in cases:
+                path = (source_json_file if case == "upload" else codes_file)(data_dir, size, variant)
+                r = _spawn(case, path, args.repeat)
+                r.update(case=case, variant=variant, codes=size,
+                         codes_per_sec=round(size / r["seconds"]) if r["seconds"] else 0)
+                results.append(r)
+                print(f"{case:<10} {variant:<11} {size:>10,} {r['seconds']:>9.3f} {r['codes_per_sec']:>12,}"
+                      f" {r['bytes'] / r['seconds'] / 1e6 if r['seconds'] else 0:>8.1f} {r['peak_rss_mb']:>8.1f}")
+
+    report = {
+        "meta": {"git": _git_rev(), "python": platform.python_version(), "platform": platform.platform(),
+                 "cpu_count": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat},
+        "results": results,
+    }
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            sys.exit(compare(json.load(f), report, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
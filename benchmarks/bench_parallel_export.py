@@ -0,0 +1,72 @@
+"""
+Кривая масштабирования генерации XML/CSV по числу процессов-воркеров.
+
+    python benchmarks/bench_parallel_export.py --codes 2000000 --workers 1,2,4,8
+
+Печатает таблицу codes/sec и ускорение относительно 1 воркера;
+с --json PATH сохраняет те же цифры в JSON.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from services import json_inspector as ji  # noqa: E402
+from services.export_parallel import shutdown_pool  # noqa: E402
+
+CORE = {"producer_inn": "7700000000", "owner_inn": "7700000000",
+        "production_date": "2025-01-01", "production_type": "OWN_PRODUCTION"}
+PROD = {"tnved_code": "6403990000", "certificate_type": "CONFORMITY_DECLARATION",
+        "certificate_number": "RU-D-1", "certificate_date": "2024-12-01",
+        "vsd_number": "", "production_date": "2025-01-01"}
+
+
+def gen_codes(n: int):
+    for i in range(n):
+        yield f"0104600000000000215{i:013d}<GS>93dGVz"
+
+
+def run(kind: str, n: int, workers: int) -> float:
+    t0 = time.perf_counter()
+    if kind == "xml":
+        stream = ji._xml_stream(CORE, PROD, gen_codes(n), workers=workers)
+    else:
+        stream = ji._csv_stream(gen_codes(n), workers=workers)
+    total = 0
+    for chunk in stream:
+        total += len(chunk)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--codes", type=int, default=1_000_000)
+    ap.add_argument("--workers", default=",".join(str(w) for w in (1, 2, 4, 8) if w <= (os.cpu_count() or 1)) or "1")
+    ap.add_argument("--kind", choices=["xml", "csv"], default="xml")
+    ap.add_argument("--json", dest="json_path")
+    args = ap.parse_args()
+
+    rows = []
+    base = None
+    for w in [int(x) for x in args.workers.split(",") if x.strip()]:
+        if w > 1:
+            run(args.kind, min(args.codes, 10_000), w)  # прогрев пула (spawn)
+        sec = run(args.kind, args.codes, w)
+        rate = args.codes / sec
+        base = base or rate
+        rows.append({"workers": w, "seconds": round(sec, 3), "codes_per_sec": round(rate), "speedup": round(rate / base, 2)})
+        print(f"{args.kind} workers={w:<3} {sec:8.2f} s  {rate:12,.0f} codes/s  x{rate / base:.2f}")
+        shutdown_pool()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"kind": args.kind, "codes": args.codes, "cpu_count": os.cpu_count(), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
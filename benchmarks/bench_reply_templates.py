@@ -0,0 +1,269 @@
+"""
+Замеры генератора ответов и хранилища шаблонов: ops/sec и перцентили задержки.
+
+    python benchmarks/bench_reply_templates.py --json out.json
+    python benchmarks/bench_reply_templates.py --library 10,1k,100k --compare baseline.json
+
+Рендер (render_template_obj) — на реалистичном шаблоне по умолчанию и на патологических:
+длинный список StaticText, Repeater на 10k элементов, широкая Table, глубокая вложенность Toggle.
+
+Хранилище — load_all/save_all и HTTP-ручки /list, /get, /save редактора и генератора
+(тестовый клиент Flask) на библиотеках из 10, 1k и 100k шаблонов. Если задан DATABASE_URL —
+против настоящего PostgreSQL (таблица reply_templates будет перезаписана!), иначе — против
+SQLite-заглушки в памяти с тем же SQL (только абсолютные цифры другие).
+
+Результаты — JSON (как у bench_json_inspector.py); --compare сравнивает ops/sec
+с прошлым прогоном и завершается с кодом 1 при падении больше --threshold.
+"""
+from __future__ import annotations
+import argparse
+import copy
+import datetime
+import json
+import logging
+import os
+import pathlib
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("STP_SERVICES", "reply-templates-runner,reply-templates-editor")
+
+from services import reply_templates_runner as runner  # noqa: E402
+from services import template_store as store  # noqa: E402
+
+NOW = datetime.datetime(2025, 1, 1, 10, 30)
+
+
+# ---------- шаблоны ----------
+
+def _realistic() -> Dict[str, Any]:
+    return store._default_data()[0]
+
+
+def render_cases(scale: int) -> Dict[str, tuple]:
+    """имя → (шаблон, значения); scale — размер «патологии» (по умолчанию 10k)."""
+    real = _realistic()
+    return {
+        "realistic": (real, {"req_number": "12345", "orders": "1, 2, 3", "signature": "Поддержка"}),
+        "static_long": ({"blocks": [{"type": "StaticText", "text": f"Строка {i}", "flags": {"newlineAfter": True}}
+                                    for i in range(scale)]}, {}),
+        "repeater": ({"blocks": [{"type": "Repeater", "name": "items", "children": [
+                         {"type": "InputField", "name": "value", "flags": {"spaceAfter": True}}]}]},
+                     {"items": [f"item-{i}" for i in range(scale)]}),
+        "table_wide": ({"blocks": [{"type": "Table", "name": "rows",
+                                    "headers": [f"col{j}" for j in range(50)]}]},
+                       {"rows": [{f"col{j}": f"{i}:{j}" for j in range(50)} for i in range(max(1, scale // 50))]}),
+        "toggle_deep": (_nested_toggle(min(scale, sys.getrecursionlimit() // 4)), {"on": True}),
+    }
+
+
+def _nested_toggle(depth: int) -> Dict[str, Any]:
+    block: Dict[str, Any] = {"type": "StaticText", "text": "дно"}
+    for i in range(depth):
+        block = {"type": "Toggle", "name": "on", "children": [{"type": "StaticText", "text": f"{i} "}, block]}
+    return {"blocks": [block]}
+
+
+def library(n: int) -> List[Dict[str, Any]]:
+    base = _realistic()
+    out = []
+    for i in range(n):
+        t = copy.deepcopy(base)
+        t["name"] = f"{base['name']} #{i}"
+        out.append(t)
+    return out
+
+
+# ---------- SQLite-заглушка PostgreSQL ----------
+
+class _Cursor:
+    def __init__(self, conn: sqlite3.Connection):
+        self._cur = conn.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cur.close()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    def execute(self, sql: str, params: Any = None):
+        sql = (sql.replace("%s", "?")
+                  .replace("SERIAL PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+                  .replace("TRUNCATE reply_templates RESTART IDENTITY;", "DELETE FROM reply_templates"))
+        return self._cur.execute(sql, params or ())
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+
+class _Conn:
+    def __init__(self):
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+
+    def cursor(self) -> _Cursor:
+        return _Cursor(self._conn)
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+
+def use_sqlite_stand_in() -> None:
+    conn = _Conn()
+
+    @contextmanager
+    def _get_conn() -> Iterator[_Conn]:
+        yield conn
+        conn.commit()
+
+    store._get_conn = _get_conn
+    store._table_ready = False
+
+
+# ---------- замер ----------
+
+def measure(fn: Callable[[], Any], duration: float, max_iter: int) -> Dict[str, float]:
+    fn()  # прогрев
+    lat: List[float] = []
+    stop = time.perf_counter() + duration
+    while len(lat) < max_iter and (not lat or time.perf_counter() < stop):
+        t0 = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t0)
+    lat.sort()
+
+    def pct(p: float) -> float:
+        return round(lat[min(len(lat) - 1, int(len(lat) * p))] * 1000, 3)
+
+    return {"iterations": len(lat), "ops_per_sec": round(len(lat) / sum(lat), 1),
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+            "mean_ms": round(statistics.mean(lat) * 1000, 3)}
+
+
+def _client():
+    from app import create_app
+    return create_app().test_client()
+
+
+def bench_render(scale: int, duration: float, max_iter: int) -> Iterator[Dict[str, Any]]:
+    for name, (tpl, values) in render_cases(scale).items():
+        r = measure(lambda: runner.render_template_obj(tpl, values, NOW), duration, max_iter)
+        yield {"group": "render", "case": name, "size": scale, **r}
+
+
+def bench_store(n: int, duration: float, max_iter: int) -> Iterator[Dict[str, Any]]:
+    store.save_all(library(n))
+    client = _client()
+    mid = n // 2
+
+    def http(method: str, url: str, **kw) -> Callable[[], None]:
+        def call() -> None:
+            resp = getattr(client, method)(url, **kw)
+            if resp.status_code != 200:
+                raise RuntimeError(f"{url}: HTTP {resp.status_code}")
+        return call
+
+    saved = dict(_realistic(), id=mid, name="изменён")
+    ops = {
+        "store_load_all": store.load_all,
+        "editor_list": http("get", "/services/reply-templates-editor/list"),
+        "editor_get": http("get", f"/services/reply-templates-editor/get?id={mid}"),
+        "runner_list": http("get", "/services/reply-templates-runner/list"),
+        "runner_get": http("get", f"/services/reply-templates-runner/get?id={mid}"),
+        "editor_save": http("post", "/services/reply-templates-editor/save", json=saved),
+    }
+    for name, fn in ops.items():
+        yield {"group": "store", "case": name, "size": n, **measure(fn, duration, max_iter)}
+
+
+def parse_size(s: str) -> int:
+    s = s.strip().lower().replace("_", "")
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> int:
+    prev = {(r["group"], r["case"], r["size"]): r for r in old["results"]}
+    regressions = 0
+    print(f"\n{'case':<16} {'size':>8} {'ops/s было':>12} {'стало':>12} {'Δ':>7}")
+    for r in new["results"]:
+        p = prev.get((r["group"], r["case"], r["size"]))
+        if p is None or not p["ops_per_sec"]:
+            continue
+        d = r["ops_per_sec"] / p["ops_per_sec"] - 1
+        bad = d < -threshold
+        regressions += bad
+        print(f"{r['case']:<16} {r['size']:>8,} {p['ops_per_sec']:>12,.1f} {r['ops_per_sec']:>12,.1f} {d:>+7.1%}"
+              + ("  << РЕГРЕССИЯ" if bad else ""))
+    print(f"\nрегрессий (порог {threshold:.0%}): {regressions}")
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scale", default="10k", help="размер патологических шаблонов (элементов/блоков)")
+    ap.add_argument("--library", default="10,1k,100k", help="размеры библиотеки шаблонов через запятую")
+    ap.add_argument("--only", choices=["render", "store"], help="только одна группа")
+    ap.add_argument("--duration", type=float, default=2.0, help="секунд на операцию")
+    ap.add_argument("--max-iter", type=int, default=100_000)
+    ap.add_argument("--json", dest="json_path")
+    ap.add_argument("--compare", help="JSON прошлого прогона")
+    ap.add_argument("--threshold", type=float, default=0.10)
+    args = ap.parse_args()
+
+    backend = "postgresql" if store.DB_URL else "sqlite-stand-in"
+    if not store.DB_URL:
+        use_sqlite_stand_in()
+    # предупреждения трассировки БД здесь только шумят
+    logging.getLogger("stp.db").setLevel(logging.ERROR)
+    results: List[Dict[str, Any]] = []
+    print(f"хранилище: {backend}")
+    print(f"{'group':<7} {'case':<16} {'size':>8} {'ops/s':>12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'iter':>7}")
+
+    groups = []
+    if args.only in (None, "render"):
+        groups.append(bench_render(parse_size(args.scale), args.duration, args.max_iter))
+    if args.only in (None, "store"):
+        groups.extend(bench_store(parse_size(n), args.duration, args.max_iter)
+                      for n in args.library.split(",") if n.strip())
+    for group in groups:
+        for r in group:
+            results.append(r)
+            print(f"{r['group']:<7} {r['case']:<16} {r['size']:>8,} {r['ops_per_sec']:>12,.1f} {r['p50_ms']:>9.3f}"
+                  f" {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['iterations']:>7}")
+
+    report = {
+        "meta": {"git": _git_rev(), "python": platform.python_version(), "platform": platform.platform(),
+                 "cpu_count": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "backend": backend},
+        "results": results,
+    }
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            sys.exit(compare(json.load(f), report, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
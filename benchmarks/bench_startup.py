@@ -0,0 +1,71 @@
+"""
+Время холодного старта create_app(): ленивые сервисы против загрузки всех сразу.
+
+    python benchmarks/bench_startup.py --runs 10
+
+Каждый замер — отдельный процесс Python (холодный импорт). Режимы:
+  lazy     — по умолчанию: манифест без импорта модулей сервисов;
+  preload  — STP_PRELOAD_SERVICES=1: все сервисы импортируются при старте (как раньше);
+  allow    — STP_SERVICES=json-inspector: один сервис.
+Для lazy дополнительно меряется первый запрос к сервису (импорт при обращении).
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+app = create_app()
+boot = time.perf_counter() - t0
+modules, psycopg2 = len(sys.modules), "psycopg2" in sys.modules
+first = None
+if sys.argv[1]:
+    client = app.test_client()
+    t1 = time.perf_counter()
+    client.get(sys.argv[1])
+    first = time.perf_counter() - t1
+print(json.dumps({"boot": boot, "first": first, "modules": modules, "psycopg2": psycopg2}))
+"""
+
+MODES = {
+    "lazy": {},
+    "preload": {"STP_PRELOAD_SERVICES": "1"},
+    "allow": {"STP_SERVICES": "json-inspector"},
+}
+
+
+def run(env_extra, url: str):
+    env = dict(os.environ, **env_extra)
+    env.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")  # только для импорта
+    out = subprocess.run([sys.executable, "-c", PROBE, url], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--url", default="/services/json-inspector/", help="первый запрос в режиме lazy")
+    args = ap.parse_args()
+
+    print(f"{'mode':<8} {'boot, ms (median)':>18} {'min':>8} {'modules':>8} {'psycopg2':>9} {'1st req, ms':>12}")
+    for mode, env_extra in MODES.items():
+        results = [run(env_extra, args.url if mode == "lazy" else "") for _ in range(args.runs)]
+        boots = [r["boot"] * 1000 for r in results]
+        firsts = [r["first"] * 1000 for r in results if r["first"] is not None]
+        first = f"{statistics.median(firsts):12.1f}" if firsts else f"{'—':>12}"
+        print(f"{mode:<8} {statistics.median(boots):18.1f} {min(boots):8.1f} "
+              f"{results[0]['modules']:8d} {str(results[0]['psycopg2']):>9} {first}")
+
+
+if __name__ == "__main__":
+    main()
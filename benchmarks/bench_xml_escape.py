@@ -0,0 +1,49 @@
+"""
+Стоимость экранирования в горячем цикле XML.
+
+    python benchmarks/bench_xml_escape.py --codes 1000000
+
+Сравнивает рендер товара без экранирования (склейка prefix + код + suffix,
+как до введения слоя экранирования) с текущим BoundDocument.render
+на «чистых» кодах (быстрый путь) и на кодах со спецсимволами.
+"""
+from __future__ import annotations
+import argparse
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from services import xml_schemas  # noqa: E402
+
+CORE = {"producer_inn": "7700000000", "owner_inn": "7700000000",
+        "production_date": "2025-01-01", "production_type": "OWN_PRODUCTION"}
+PROD = {"tnved_code": "6403990000", "certificate_number": "RU-D-1", "certificate_date": "2024-12-01"}
+
+
+def measure(label: str, fn, codes) -> None:
+    t0 = time.perf_counter()
+    for c in codes:
+        fn(c)
+    sec = time.perf_counter() - t0
+    print(f"{label:<28} {len(codes) / sec:12,.0f} codes/s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--codes", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    clean = [f"0104600000000008215{i:013d}" for i in range(args.codes)]
+    dirty = [f"0104600000000008215{i:07d}]]>&<" for i in range(args.codes)]
+    doc = xml_schemas.bind(CORE, PROD)
+    prefix, suffix = doc.item_parts
+
+    measure("baseline (без экранирования)", lambda c: prefix + c.encode("utf-8") + suffix, clean)
+    measure("render, чистые коды", doc.render, clean)
+    measure("render, коды со спецсимволами", doc.render, dirty)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Локальный нагрузочный тест: запросы/с и задержки для dev-сервера и gunicorn.
+
+    python benchmarks/load_test.py --compare                      # поднять оба сервера и сравнить
+    python benchmarks/load_test.py --url http://127.0.0.1:5000/   # уже запущенный сервер
+
+Клиент — потоки со своим keep-alive соединением (http.client), без сторонних зависимостей.
+По умолчанию бьёт по главной странице и странице json_inspector; --path можно повторять.
+"""
+from __future__ import annotations
+import argparse
+import http.client
+import os
+import pathlib
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from typing import Dict, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+DEFAULT_PATHS = ["/", "/services/json-inspector/"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(host: str, port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"сервер на {host}:{port} не поднялся за {timeout} с")
+
+
+def _worker(host: str, port: int, paths: List[str], stop_at: float,
+            latencies: List[float], errors: List[int]) -> None:
+    conn: Optional[http.client.HTTPConnection] = None
+    i = 0
+    while time.monotonic() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+            conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 400:
+                errors.append(resp.status)
+            if resp.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            errors.append(0)
+            if conn is not None:
+                conn.close()
+            conn = None
+            continue
+        latencies.append(time.perf_counter() - t0)
+    if conn is not None:
+        conn.close()
+
+
+def run_load(host: str, port: int, paths: List[str], concurrency: int, duration: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors: List[int] = []
+    # прогрев: ленивые сервисы, кэши
+    _worker(host, port, paths, time.monotonic() + 1.0, [], [])
+    stop_at = time.monotonic() + duration
+    threads = [threading.Thread(target=_worker, args=(host, port, paths, stop_at, latencies, errors))
+               for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    lat = sorted(latencies) or [0.0]
+
+    def pct(p: float) -> float:
+        return lat[min(len(lat) - 1, int(len(lat) * p))] * 1000
+
+    return {"requests": len(latencies), "errors": len(errors), "rps": len(latencies) / wall,
+            "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "mean": statistics.mean(lat) * 1000}
+
+
+def _print_row(label: str, r: Dict[str, float]) -> None:
+    print(f"{label:<22} {r['rps']:9.0f} {r['p50']:8.1f} {r['p95']:8.1f} {r['p99']:8.1f} "
+          f"{int(r['requests']):9d} {int(r['errors']):7d}")
+
+
+def _spawn(kind: str, port: int, workers: int, threads: int) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    if kind == "dev":
+        # как python app.py: встроенный сервер Flask, debug, без перезапуска по файлам
+        code = ("from app import create_app; "
+                f"create_app().run(debug=True, use_reloader=False, host='127.0.0.1', port={port})")
+        cmd = [sys.executable, "-c", code]
+    else:
+        env.update(GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads), GUNICORN_ACCESSLOG="")
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}", "wsgi:app"]
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="базовый URL запущенного сервера")
+    ap.add_argument("--compare", action="store_true", help="поднять dev-сервер и gunicorn и сравнить")
+    ap.add_argument("--path", action="append", dest="paths", help="путь запроса (можно несколько)")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="воркеры gunicorn в --compare")
+    ap.add_argument("--threads", type=int, default=4, help="потоки gunicorn в --compare")
+    args = ap.parse_args()
+    paths = args.paths or DEFAULT_PATHS
+
+    print(f"{'server':<22} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'requests':>9} {'errors':>7}")
+    if args.url:
+        u = urllib.parse.urlsplit(args.url)
+        base = u.path.rstrip("/")
+        _print_row(u.netloc, run_load(u.hostname, u.port or 80, [base + p for p in paths],
+                                      args.concurrency, args.duration))
+        return
+    if not args.compare:
+        ap.error("нужен --url или --compare")
+    kinds = ["dev"]
+    if shutil.which("gunicorn") or _has_module("gunicorn"):
+        kinds.append("gunicorn")
+    else:
+        print("gunicorn не установлен — сравнение только с dev-сервером", file=sys.stderr)
+    for kind in kinds:
+        port = _free_port()
+        proc = _spawn(kind, port, args.workers, args.threads)
+        try:
+            _wait_ready("127.0.0.1", port)
+            label = kind if kind == "dev" else f"gunicorn {args.workers}w×{args.threads}t"
+            _print_row(label, run_load("127.0.0.1", port, paths, args.concurrency, args.duration))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+def _has_module(name: str) -> bool:
+    import importlib.util
+    return importlib.util.find_spec(name) is not None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Выгрузка XML/CSV из JSON + файлов кодов без веб-интерфейса (ночные пакетные задачи).
+Тот же конвейер, что и в json_inspector: _normalize_core, _extract_product_template,
+_parse_codes, _xml_stream / _csv_stream.
+
+    python export_cli.py xml --json source.json codes.txt -o introduce.xml
+    python export_cli.py xml --json source.json a.txt b.txt c.txt --out-dir out/ --workers 3
+    cat codes.txt | python export_cli.py csv - -o - > codes.csv
+
+--json принимает исходный документ (как при загрузке в UI) или выгрузку
+«Скачать JSON (ядро+шаблон)» с ключами core/product_template.
+В конце в stderr печатаются пропускная способность и пиковый RSS.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.json_inspector import (
+    _csv_stream, _extract_product_template, _normalize_core, _parse_codes,
+    _sanitize_fname, _xml_export,
+)
+from services import xml_schemas
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def load_core_prod(path: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    if path == "-":
+        raw = json.load(sys.stdin)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    if not isinstance(raw, dict):
+        raise ValueError(f"{path}: ожидался JSON-объект (dict) на корне")
+    if isinstance(raw.get("core"), dict):
+        return raw["core"], raw.get("product_template") or {}
+    core = _normalize_core(raw)
+    return core, _extract_product_template(raw, core_prod_date=core.get("production_date", ""))
+
+
+def _counted(codes: Iterable[str], stats: Dict[str, Any]) -> Iterator[str]:
+    n = 0
+    try:
+        for c in codes:
+            n += 1
+            yield c
+    finally:
+        stats["codes"] = n
+
+
+def export_one(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Одна выгрузка: файл кодов (или stdin) → файл (или stdout). Выполняется в воркере.
+    """
+    t0 = time.perf_counter()
+    stats: Dict[str, Any] = {"input": task["input"], "output": task["output"], "codes": 0, "bytes": 0}
+    src = sys.stdin if task["input"] == "-" else open(task["input"], "r", encoding="utf-8", newline=None)
+    dst = sys.stdout.buffer if task["output"] == "-" else open(task["output"], "wb")
+    try:
+        codes = _counted(_parse_codes(src), stats)
+        if task["format"] == "csv":
+            chunks: Iterable[bytes] = _csv_stream(codes, workers=1)
+        else:
+            chunks, _, _ = _xml_export(task["core"], task["prod"], task["fname"], codes, **task["xml_opts"])
+        for chunk in chunks:
+            dst.write(chunk)
+            stats["bytes"] += len(chunk)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout.buffer:
+            dst.close()
+        else:
+            dst.flush()
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+
+def _output_for(inp: str, args: argparse.Namespace, ext: str) -> str:
+    if args.output:
+        return args.output
+    stem = "stdin" if inp == "-" else os.path.splitext(os.path.basename(inp))[0]
+    return os.path.join(args.out_dir or ".", f"{_sanitize_fname(stem)}.{ext}")
+
+
+def _dedupe_output(out: str, used: set) -> str:
+    # a/x.json и b/x.json в одном --out-dir дали бы один x.xml: второму — x-2.xml и т.д.
+    if out == "-":
+        return out
+    stem, ext = os.path.splitext(out)
+    n = 1
+    while os.path.normcase(os.path.abspath(out)) in used:
+        n += 1
+        out = f"{stem}-{n}{ext}"
+    used.add(os.path.normcase(os.path.abspath(out)))
+    return out
+
+
+def _peak_rss_mb() -> Optional[Tuple[float, float]]:
+    if resource is None:
+        return None
+    # ru_maxrss — КБ на Linux, байты на macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return own, children
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("format", choices=["xml", "csv"])
+    ap.add_argument("inputs", nargs="+", help="файлы кодов (по одному в строку); '-' — stdin")
+    ap.add_argument("--json", dest="json_path", help="исходный JSON (core/prod); обязателен для xml")
+    ap.add_argument("-o", "--output", help="файл результата ('-' — stdout); только для одного входа")
+    ap.add_argument("--out-dir", help="каталог результатов для нескольких входов")
+    ap.add_argument("--workers", type=int, default=1, help="параллельных процессов по входам")
+    ap.add_argument("--doc-type", choices=sorted(xml_schemas.SCHEMAS), help="тип XML-документа (по умолчанию — авто)")
+    ap.add_argument("--split-products", type=int, help="товаров в части (xml → zip)")
+    ap.add_argument("--split-mb", type=int, help="МБ в части (xml → zip)")
+    ap.add_argument("--validate", action="store_true", help="добавить validation.json в zip частей")
+    args = ap.parse_args(argv)
+
+    if args.output and len(args.inputs) > 1:
+        ap.error("-o/--output допустим только для одного входа; для нескольких используйте --out-dir")
+    if args.inputs.count("-") > 1 or (args.json_path == "-" and "-" in args.inputs):
+        ap.error("stdin ('-') можно использовать только один раз")
+    if args.format == "xml" and not args.json_path:
+        ap.error("для xml нужен --json")
+
+    core, prod = load_core_prod(args.json_path) if args.json_path else ({}, {})
+    split_bytes = args.split_mb * 1024 * 1024 if args.split_mb else None
+    ext = "csv" if args.format == "csv" else ("zip" if (args.split_products or split_bytes) else "xml")
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    tasks = []
+    used: set = set()
+    for inp in args.inputs:
+        base = _output_for(inp, args, ext)
+        out = _dedupe_output(base, used)
+        if out != base:
+            print(f"{inp}: {base} уже занят другим входом — пишу в {out}", file=sys.stderr)
+        tasks.append({
+            "format": args.format, "input": inp, "output": out,
+            "fname": _sanitize_fname(os.path.splitext(os.path.basename(out))[0] if out != "-" else "introduce"),
+            "core": core, "prod": prod,
+            "xml_opts": {"split_products": args.split_products, "split_bytes": split_bytes,
+                         "validate": args.validate, "doc_type": args.doc_type},
+        })
+
+    t0 = time.perf_counter()
+    # stdin/stdout не передать в дочерний процесс — такие задачи выполняем здесь
+    local = [t for t in tasks if t["input"] == "-" or t["output"] == "-"]
+    remote = [t for t in tasks if t not in local]
+    results: List[Dict[str, Any]] = []
+    failed = 0
+
+    def collect(t: Dict[str, Any], run: Callable[[], Dict[str, Any]]) -> None:
+        # ошибка одного входа — не повод бросать остальные
+        nonlocal failed
+        try:
+            results.append(run())
+        except Exception as e:
+            failed += 1
+            print(f"ОШИБКА {t['input']}: {e}", file=sys.stderr)
+
+    for t in local:
+        collect(t, lambda t=t: export_one(t))
+    if remote:
+        if args.workers > 1 and len(remote) > 1:
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                futures = [(t, pool.submit(export_one, t)) for t in remote]
+                for t, fut in futures:
+                    collect(t, fut.result)
+        else:
+            for t in remote:
+                collect(t, lambda t=t: export_one(t))
+    wall = time.perf_counter() - t0
+
+    total_codes = sum(r["codes"] for r in results)
+    total_bytes = sum(r["bytes"] for r in results)
+    for r in results:
+        rate = r["codes"] / r["seconds"] if r["seconds"] else 0
+        print(f"{r['input']} → {r['output']}: {r['codes']:,} кодов, {r['bytes'] / 1048576:.1f} МБ, "
+              f"{r['seconds']:.2f} с ({rate:,.0f} кодов/с)", file=sys.stderr)
+    print(f"Итого: {total_codes:,} кодов за {wall:.2f} с ({total_codes / wall if wall else 0:,.0f} кодов/с), "
+          f"{total_bytes / 1048576:.1f} МБ", file=sys.stderr)
+    rss = _peak_rss_mb()
+    if rss is not None:
+        print(f"Пиковый RSS: {rss[0]:.1f} МБ (процесс), {rss[1]:.1f} МБ (макс. воркер)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# Конфиг gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
+# Все значения настраиваются переменными окружения.
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.environ.get(name, "") or default)
+
+
+bind = os.environ.get("BIND") or f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Воркеры — процессы (CPU-работа выгрузок), потоки — ожидание I/O и длинные стримы.
+# WEB_CONCURRENCY — стандартная переменная Render/Heroku.
+workers = _int("GUNICORN_WORKERS", _int("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = _int("GUNICORN_THREADS", 4)
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Модули сервисов грузятся один раз в мастере и делятся воркерами (copy-on-write)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") not in ("0", "")
+
+# gthread шлёт heartbeat из главного цикла, так что длинный стрим выгрузки не считается зависанием.
+timeout = _int("GUNICORN_TIMEOUT", 120)
+# При SIGTERM/деплое воркер перестаёт принимать запросы и ждёт столько,
+# сколько нужно текущим выгрузкам, чтобы дописать ответ.
+graceful_timeout = _int("GUNICORN_GRACEFUL_TIMEOUT", 600)
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+
+# Перезапуск воркера после N запросов (0 — выключено) — страховка от роста памяти
+max_requests = _int("GUNICORN_MAX_REQUESTS", 0)
+max_requests_jitter = _int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None   # пусто — без access-лога
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+# /metrics суммирует снимки всех воркеров из этого каталога (services/metrics.py)
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "stp_metrics"))
+
+
+def on_starting(server):
+    # счётчики — с нуля на каждый запуск мастера
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+
+
+def post_fork(server, worker):
+    from wsgi import init_worker
+    init_worker()
+
+
+def worker_exit(server, worker):
+    from wsgi import shutdown_worker
+    shutdown_worker()
@@ -0,0 +1,171 @@
+"""
+Пакетный рендер шаблонов ответов из скриптов (без веб-интерфейса).
+Рендер — reply_templates_runner.render_template_obj, шаблоны — template_store или файл.
+
+    python reply_cli.py --template-id 0 --values rows.csv --out-dir replies/
+    python reply_cli.py --template-file tpl.json --values rows.ndjson -o all.txt --workers 4
+    cat rows.ndjson | python reply_cli.py --template-file tpl.json --values - -o - --format ndjson
+
+Значения: CSV (заголовок — имена полей; ячейка, начинающаяся с [ или {, читается как JSON —
+для Repeater/Table) или NDJSON (объект на строку). Шаблон загружается один раз на процесс.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from services.export_parallel import ordered_map, shards
+from services.reply_templates_runner import _now_in_tz, render_template_obj
+
+BATCH_ROWS = 256
+
+# Шаблон и таймзона воркера — задаются один раз в инициализаторе процесса
+_tpl: Dict[str, Any] = {}
+_tz: Optional[str] = None
+
+
+def _init_worker(tpl: Dict[str, Any], tz: Optional[str]) -> None:
+    global _tpl, _tz
+    _tpl, _tz = tpl, tz
+
+
+def render_rows(batch: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, str]]:
+    return [(n, render_template_obj(_tpl, values, _now_in_tz(_tz))) for n, values in batch]
+
+
+def load_template(template_id: Optional[int], template_file: Optional[str]) -> Dict[str, Any]:
+    if template_file:
+        with open(template_file, "r", encoding="utf-8") as f:
+            tpl = json.load(f)
+    else:
+        from services.template_store import load_all
+        data = load_all()
+        if not (template_id is not None and 0 <= template_id < len(data)):
+            raise SystemExit(f"Шаблон с id={template_id} не найден (всего {len(data)})")
+        tpl = data[template_id]
+    if not isinstance(tpl, dict) or not isinstance(tpl.get("blocks"), list):
+        raise SystemExit("Шаблон должен быть объектом с массивом blocks")
+    return tpl
+
+
+def _csv_cell(v: str) -> Any:
+    s = (v or "").strip()
+    if s[:1] in ("[", "{"):
+        try:
+            return json.loads(s)
+        except ValueError:
+            pass
+    return v
+
+
+def read_rows(path: str, fmt: Optional[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Строки значений по одной, без чтения файла целиком.
+    """
+    if fmt is None:
+        fmt = "csv" if path.lower().endswith(".csv") else "ndjson"
+    fh = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig") if path == "-" else open(path, "r", encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            for n, row in enumerate(csv.DictReader(fh), start=1):
+                yield n, {k: _csv_cell(v) for k, v in row.items() if k}
+        else:
+            n = 0
+            for line in fh:
+                if not line.strip():
+                    continue
+                n += 1
+                values = json.loads(line)
+                if not isinstance(values, dict):
+                    raise ValueError(f"строка {n}: ожидался JSON-объект")
+                yield n, values
+    finally:
+        if path != "-":
+            fh.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--template-id", type=int, help="id шаблона в template_store")
+    src.add_argument("--template-file", help="JSON-файл шаблона")
+    ap.add_argument("--values", required=True, help="CSV или NDJSON со значениями; '-' — stdin")
+    ap.add_argument("--values-format", choices=["csv", "ndjson"], help="по умолчанию — по расширению")
+    ap.add_argument("--timezone", help="IANA-таймзона для Greeting/DateTime, например Europe/Moscow")
+    ap.add_argument("--workers", type=int, default=1, help="процессов для рендера")
+    out = ap.add_mutually_exclusive_group(required=True)
+    out.add_argument("--out-dir", help="по файлу на строку: <out-dir>/<n>.txt")
+    out.add_argument("-o", "--output", help="общий поток ('-' — stdout)")
+    ap.add_argument("--format", choices=["text", "ndjson"], default="text", help="формат общего потока")
+    ap.add_argument("--separator", default="\n\n", help="разделитель ответов в текстовом потоке")
+    ap.add_argument("--name-field", help="колонка/ключ для имени файла в --out-dir (повторы — с суффиксом -2, -3…)")
+    args = ap.parse_args(argv)
+
+    tpl = load_template(args.template_id, args.template_file)
+    rows = read_rows(args.values, args.values_format)
+    names: Dict[int, str] = {}
+    if args.name_field:
+        def remember(it):
+            for n, values in it:
+                names[n] = str(values.get(args.name_field) or n)
+                yield n, values
+        rows = remember(rows)
+
+    if args.workers > 1:
+        # пачки строк по 256, в полёте — ограниченное окно (память не растёт с размером входа)
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(tpl, args.timezone))
+        batches = ordered_map(render_rows, shards(rows, BATCH_ROWS), workers=args.workers, executor=pool)
+    else:
+        pool = None
+        _init_worker(tpl, args.timezone)
+        batches = map(render_rows, shards(rows, BATCH_ROWS))
+    results = (r for batch in batches for r in batch)
+
+    stream = None
+    if args.output:
+        stream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="\n")
+    else:
+        os.makedirs(args.out_dir, exist_ok=True)
+    count = 0
+    used: set = set()        # имена файлов (без учёта регистра — как на Windows/macOS)
+    renamed = 0
+    try:
+        for n, text in results:
+            if stream is None:
+                name = names.pop(n, None) or f"{n:06d}"
+                safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)[:128] or f"{n:06d}"
+                # одинаковые значения --name-field не должны затирать друг друга: x, x-2, x-3…
+                base, k = safe, 1
+                while safe.casefold() in used:
+                    k += 1
+                    safe = f"{base}-{k}"
+                if k > 1:
+                    renamed += 1
+                used.add(safe.casefold())
+                with open(os.path.join(args.out_dir, f"{safe}.txt"), "w", encoding="utf-8", newline="\n") as f:
+                    f.write(text)
+            elif args.format == "ndjson":
+                stream.write(json.dumps({"row": n, "text": text}, ensure_ascii=False) + "\n")
+            else:
+                stream.write((args.separator if count else "") + text)
+            count += 1
+        if stream is not None and args.format == "text" and count:
+            stream.write("\n")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if stream is not None and stream is not sys.stdout:
+            stream.close()
+    print(f"Отрендерено: {count}", file=sys.stderr)
+    if renamed:
+        print(f"Повторяющихся имён: {renamed} — такие файлы записаны с суффиксом -2, -3…", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
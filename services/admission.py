@@ -0,0 +1,195 @@
+from __future__ import annotations
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict
+
+from flask import current_app, jsonify, request
+
+from . import metrics
+
+# Контроль допуска тяжёлых запросов (загрузки/выгрузки json_inspector).
+# Одновременно выполняется не больше MAX_ACTIVE запросов, и их суммарный объём
+# (Content-Length) не превышает BYTE_BUDGET. Остальные ждут в очереди FIFO
+# до QUEUE_TIMEOUT_SEC; при переполнении очереди или по таймауту — 503 с Retry-After.
+# Счётчики — на процесс (у каждого воркера gunicorn свой контроллер).
+
+# ---------- конфиг ----------
+MAX_ACTIVE = int(os.environ.get("ADMISSION_MAX_ACTIVE", str(max(2, os.cpu_count() or 1))) or 0)
+BYTE_BUDGET = int(os.environ.get("ADMISSION_BYTE_BUDGET", str(1024 ** 3)) or 0)  # 0 — без бюджета
+MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "16") or 0)
+QUEUE_TIMEOUT_SEC = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_SEC", "15") or 0)
+# оценка стоимости запроса без Content-Length (chunked)
+DEFAULT_COST = 16 * 1024 * 1024
+
+# отказы — обычный счётчик: сбрасывается в снимки воркеров и суммируется по всем
+REJECTED = metrics.REGISTRY.counter("stp_admission_rejected_total", "Отказы 503 контроля допуска", ("reason",))
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """
+    Допуск одного запроса; release() идемпотентен (его зовут и из call_on_close, и при ошибке).
+    """
+    __slots__ = ("_ctl", "cost", "admitted_at", "_released")
+
+    def __init__(self, ctl: "AdmissionController", cost: int):
+        self._ctl = ctl
+        self.cost = cost
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._ctl._release(self)
+
+
+class AdmissionController:
+    def __init__(self, max_active: int = MAX_ACTIVE, byte_budget: int = BYTE_BUDGET,
+                 max_queue: int = MAX_QUEUE, queue_timeout: float = QUEUE_TIMEOUT_SEC):
+        self.max_active = max(1, max_active)
+        self.byte_budget = byte_budget
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._waiters: Deque[object] = deque()
+        self._active = 0
+        self._bytes = 0
+        # метрики
+        self._admitted = 0
+        self._rejected = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+        self._queue_peak = 0
+        self._hold_avg = 0.0    # EWMA длительности запроса — для Retry-After
+
+    def _fits(self, cost: int) -> bool:
+        if self._active >= self.max_active:
+            return False
+        # запрос больше всего бюджета пускаем только в одиночку, иначе он не пройдёт никогда
+        return not self.byte_budget or self._active == 0 or self._bytes + cost <= self.byte_budget
+
+    def _retry_after(self) -> int:
+        hold = self._hold_avg or 5.0
+        return max(1, math.ceil(hold * (len(self._waiters) + 1) / self.max_active))
+
+    def acquire(self, cost: int = 0) -> Ticket:
+        """
+        Ждёт своей очереди и возвращает Ticket; Overloaded — если ждать нельзя или слишком долго.
+        """
+        cost = max(0, cost)
+        t0 = time.monotonic()
+        with self._cond:
+            if not self._waiters and self._fits(cost):
+                return self._admit(cost, 0.0)
+            if self.max_queue and len(self._waiters) >= self.max_queue:
+                self._rejected += 1
+                REJECTED.inc(reason="queue_full")
+                raise Overloaded("Очередь тяжёлых запросов переполнена", self._retry_after())
+            me = object()
+            self._waiters.append(me)
+            self._queue_peak = max(self._queue_peak, len(self._waiters))
+            deadline = t0 + self.queue_timeout
+            try:
+                while not (self._waiters[0] is me and self._fits(cost)):
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        self._rejected += 1
+                        REJECTED.inc(reason="timeout")
+                        raise Overloaded("Сервер занят другими выгрузками", self._retry_after())
+                    self._cond.wait(left)
+            finally:
+                self._waiters.remove(me)
+                # следующий в очереди мог стать первым
+                self._cond.notify_all()
+            return self._admit(cost, time.monotonic() - t0)
+
+    def _admit(self, cost: int, waited: float) -> Ticket:
+        self._active += 1
+        self._bytes += cost
+        self._admitted += 1
+        self._wait_sum += waited
+        self._wait_max = max(self._wait_max, waited)
+        return Ticket(self, cost)
+
+    def _release(self, ticket: Ticket) -> None:
+        held = time.monotonic() - ticket.admitted_at
+        with self._cond:
+            self._active -= 1
+            self._bytes -= ticket.cost
+            self._hold_avg = held if not self._hold_avg else 0.8 * self._hold_avg + 0.2 * held
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "active": self._active,
+                "max_active": self.max_active,
+                "bytes_in_flight": self._bytes,
+                "byte_budget": self.byte_budget,
+                "queue_depth": len(self._waiters),
+                "queue_depth_peak": self._queue_peak,
+                "max_queue": self.max_queue,
+                "admitted_total": self._admitted,
+                "rejected_total": self._rejected,
+                "wait_seconds_total": round(self._wait_sum, 3),
+                "wait_seconds_max": round(self._wait_max, 3),
+                "wait_seconds_avg": round(self._wait_sum / self._admitted, 3) if self._admitted else 0.0,
+                "hold_seconds_avg": round(self._hold_avg, 3),
+            }
+
+
+def heavy(ctl: AdmissionController) -> Callable:
+    """
+    Декоратор вьюхи: допуск ДО чтения тела (форма во Flask парсится лениво),
+    освобождение — по закрытию ответа, т.е. после отдачи всего стрима.
+    """
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any):
+            cost = request.content_length
+            try:
+                ticket = ctl.acquire(DEFAULT_COST if cost is None else cost)
+            except Overloaded as e:
+                resp = jsonify({"error": e.reason, "retry_after": e.retry_after})
+                resp.status_code = 503
+                resp.headers["Retry-After"] = str(e.retry_after)
+                return resp
+            try:
+                resp = current_app.make_response(view(*args, **kwargs))
+            except BaseException:
+                ticket.release()
+                raise
+            resp.call_on_close(ticket.release)
+            return resp
+        return wrapper
+    return decorator
+
+
+controller = AdmissionController()
+
+
+def _collect() -> list:
+    # мгновенное состояние — только процесса, отдающего /metrics: снимки завершённых
+    # воркеров остаются в METRICS_DIR, и сумма gauge по ним была бы неверной
+    snap = controller.snapshot()
+    scope = " (воркер, ответивший на /metrics)"
+    return [
+        ("stp_admission_active", "gauge", "Тяжёлые запросы в работе" + scope, {}, snap["active"]),
+        ("stp_admission_queue_depth", "gauge", "Тяжёлые запросы в очереди допуска" + scope, {}, snap["queue_depth"]),
+        ("stp_admission_bytes_in_flight", "gauge",
+         "Заявленный объём тел тяжёлых запросов в работе" + scope, {}, snap["bytes_in_flight"]),
+    ]
+
+
+metrics.REGISTRY.add_collector(_collect)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+import hashlib
+import mimetypes
+import os
+import pathlib
+import threading
+from typing import Dict, Optional
+
+from flask import Response
+
+from .cached_response import CachedBody
+
+# Статика с отпечатком содержимого: static/<путь>/<имя>.css → /assets/<путь>/<имя>.<хэш>.css.
+# Файлы читаются и сжимаются один раз при первом обращении; URL меняется вместе
+# с содержимым, поэтому ответы кэшируются браузером навсегда (immutable).
+# Старые адреса /static/... продолжают работать через стандартный обработчик Flask.
+
+STATIC_DIR = pathlib.Path(__file__).resolve().parent.parent / "static"
+URL_PREFIX = "/assets/"
+IMMUTABLE = "public, max-age=31536000, immutable"
+HASH_LEN = 12
+
+_lock = threading.Lock()
+_urls: Optional[Dict[str, str]] = None       # логический путь → URL с отпечатком
+_bodies: Dict[str, CachedBody] = {}          # имя с отпечатком → тело
+
+
+def _fingerprinted(logical: str, digest: str) -> str:
+    stem, ext = os.path.splitext(logical)
+    return f"{stem}.{digest[:HASH_LEN]}{ext}"
+
+
+def _content_type(path: str) -> str:
+    mt = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if mt.startswith("text/") or mt in ("application/javascript", "application/json", "image/svg+xml"):
+        mt += "; charset=utf-8"
+    return mt
+
+
+def build(static_dir: pathlib.Path = STATIC_DIR) -> Dict[str, str]:
+    """
+    Обходит static/, считает отпечатки и готовит сжатые варианты. Возвращает манифест.
+    """
+    urls: Dict[str, str] = {}
+    bodies: Dict[str, CachedBody] = {}
+    for root, _, files in os.walk(static_dir):
+        for fname in sorted(files):
+            path = os.path.join(root, fname)
+            logical = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            name = _fingerprinted(logical, hashlib.sha256(data).hexdigest())
+            bodies[name] = CachedBody(data, content_type=_content_type(fname), cache_control=IMMUTABLE)
+            urls[logical] = URL_PREFIX + name
+    global _urls, _bodies
+    with _lock:
+        _urls, _bodies = urls, bodies
+    return urls
+
+
+def url(logical: str) -> str:
+    """
+    URL ассета с отпечатком (для шаблонов — asset_url). Неизвестный файл → обычный /static/.
+    """
+    urls = _urls if _urls is not None else build()
+    return urls.get(logical) or f"/static/{logical}"
+
+
+def response(name: str) -> Optional[Response]:
+    if _urls is None:
+        build()
+    body = _bodies.get(name)
+    return None if body is None else body.response()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+import gzip
+import hashlib
+from typing import Any, Dict, Optional, Tuple, Union
+
+from flask import Response, current_app, render_template, request
+from jinja2 import Environment, Template
+
+try:
+    import brotli  # опционально: pip install brotli
+except ImportError:
+    brotli = None
+
+# Страницы без повторной работы на каждый запрос:
+#   CachedBody     — готовые байты (+ gzip/br заранее) с ETag и 304;
+#   InlineTemplate — встроенный HTML-шаблон, скомпилированный один раз на окружение Jinja.
+
+MIN_COMPRESS_BYTES = 512
+
+
+class CachedBody:
+    """
+    Неизменяемое тело ответа: сжимается один раз, отдаётся по Accept-Encoding.
+    У каждого кодирования свой ETag — это разные представления ресурса.
+    """
+    def __init__(self, body: Union[str, bytes], content_type: str = "text/html; charset=utf-8",
+                 cache_control: str = "no-cache"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        # полный Content-Type: mimetype= у Response дописал бы второй charset
+        self.content_type = content_type
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = digest
+        # кодирование → (байты, ETag)
+        self.variants: Dict[str, Tuple[bytes, str]] = {"identity": (body, digest)}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            gz = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gz) < len(body):
+                self.variants["gzip"] = (gz, f"{digest}-gz")
+            if brotli is not None:
+                br = brotli.compress(body, quality=11)
+                if len(br) < len(body):
+                    self.variants["br"] = (br, f"{digest}-br")
+
+    def _encoding(self) -> str:
+        offered = [e for e in ("br", "gzip") if e in self.variants]
+        best = request.accept_encodings.best_match(offered) if offered else None
+        return best or "identity"
+
+    def response(self, status: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+        encoding = self._encoding()
+        body, etag = self.variants[encoding]
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(body, status=status, content_type=self.content_type)
+            if encoding != "identity":
+                resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = self.cache_control
+        if len(self.variants) > 1:
+            resp.vary.add("Accept-Encoding")
+        if headers:
+            resp.headers.update(headers)
+        return resp
+
+
+class InlineTemplate:
+    """
+    Шаблон из строки, скомпилированный один раз (а не на каждый запрос, как
+    render_template_string). Рендер идёт через render_template — с контекст-процессорами.
+    """
+    def __init__(self, source: str):
+        self.source = source
+        self._env: Optional[Environment] = None
+        self._template: Optional[Template] = None
+
+    def get(self) -> Template:
+        env = current_app.jinja_env
+        # окружение своё у каждого приложения (create_app в тестах/бенчмарках)
+        if self._env is not env:
+            self._template = env.from_string(self.source)
+            self._env = env
+        return self._template
+
+    def render(self, **context: Any) -> str:
+        return render_template(self.get(), **context)
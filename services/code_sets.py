@@ -0,0 +1,225 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .code_validation import normalize_codes
+
+# Сравнение двух списков кодов как множеств: A−B, B−A и счётчики.
+# Коды нормализуются по тем же правилам, что и в выгрузках json_inspector.
+# Пока оба множества помещаются в MEMORY_ITEMS кодов — всё в памяти, порядок
+# вывода — порядок первого появления. Больше — оба входа раскладываются по хешу
+# кода на PARTITIONS файлов-разделов; каждая пара разделов сравнивается в памяти
+# (слишком большая пара делится ещё раз по другим битам хеша), так что RAM не
+# зависит от размера входов. Порядок вывода тогда — по разделам.
+
+# ---------- конфиг ----------
+MEMORY_ITEMS = int(os.environ.get("CODE_SET_MEMORY_ITEMS", "1000000") or 1000000)
+PARTITIONS = int(os.environ.get("CODE_SET_PARTITIONS", "64") or 64)
+MAX_DEPTH = 3
+READ_BUF = 1024 * 1024
+WRITE_BATCH = 4096
+
+
+class SetDiff:
+    """
+    Сравнение файлов-списков (код на строку). Вывод — итераторы байтов:
+    a_minus_b() считает всё и отдаёт A−B потоком (B−A попутно пишется в work_dir),
+    затем b_minus_a() и summary(). Вызывать строго в этом порядке (как записи zip_stream).
+    """
+
+    def __init__(self, path_a: str, path_b: str, work_dir: Optional[str] = None,
+                 memory_items: int = MEMORY_ITEMS, partitions: int = PARTITIONS,
+                 progress: Optional[Callable[[int], None]] = None,
+                 spilled: Optional[Callable[[int], None]] = None, stats: Optional[Dict[str, Any]] = None):
+        # progress(n) — обработано ещё n байт; spilled(n) — разделы на диске заняли n байт
+        # (второй проход по ним — ещё столько же работы)
+        self.path_a, self.path_b = path_a, path_b
+        self.memory_items = max(1, memory_items)
+        self.partitions = max(2, partitions)
+        self.progress = progress
+        self.spilled = spilled
+        self.stats = stats if stats is not None else {}
+        self.stats.update(a_total=0, b_total=0, a_unique=0, b_unique=0,
+                          a_only=0, b_only=0, common=0, partitioned=False, partitions=0)
+        self._work_dir = tempfile.mkdtemp(prefix="stp_sets_", dir=work_dir)
+        self._b_out_path = os.path.join(self._work_dir, "b_minus_a.txt")
+
+    # ---------- чтение ----------
+
+    def _lines(self, path: str) -> Iterator[str]:
+        # построчно в байтах — чтобы считать прогресс; BOM (CSV из json_inspector) срезается
+        pending = 0
+        first = True
+        with open(path, "rb", buffering=READ_BUF) as f:
+            for raw in f:
+                pending += len(raw)
+                if pending >= READ_BUF and self.progress is not None:
+                    self.progress(pending)
+                    pending = 0
+                line = raw.decode("utf-8", errors="replace")
+                if first:
+                    line = line.lstrip("﻿")
+                    first = False
+                yield line
+        if pending and self.progress is not None:
+            self.progress(pending)
+
+    def _codes(self, path: str, key: str) -> Iterator[str]:
+        for code in normalize_codes(self._lines(path)):
+            self.stats[key] += 1
+            yield code
+
+    # ---------- разделы ----------
+
+    def _partition(self, codes: Iterable[str], files: List[Any], depth: int) -> None:
+        p = self.partitions
+        shift = p ** depth
+        batches: List[List[str]] = [[] for _ in range(p)]
+        for code in codes:
+            i = (hash(code) // shift) % p
+            batch = batches[i]
+            batch.append(code)
+            if len(batch) >= WRITE_BATCH:
+                files[i].write("\n".join(batch) + "\n")
+                batch.clear()
+        for i, batch in enumerate(batches):
+            if batch:
+                files[i].write("\n".join(batch) + "\n")
+
+    def _open_parts(self, prefix: str) -> List[Any]:
+        return [open(f"{prefix}{i:03d}", "w", encoding="utf-8", newline="\n") for i in range(self.partitions)]
+
+    @staticmethod
+    def _read_part(path: str) -> Iterator[str]:
+        with open(path, "r", encoding="utf-8", newline="\n", buffering=READ_BUF) as f:
+            for line in f:
+                yield line[:-1]
+
+    def _split(self, path_a: str, path_b: str, depth: int) -> List[tuple]:
+        """Пара разделов → PARTITIONS пар поменьше (по следующим битам хеша)."""
+        base = os.path.join(self._work_dir, f"{os.path.basename(path_a)}_")
+        files_a, files_b = self._open_parts(base + "a"), self._open_parts(base + "b")
+        try:
+            self._partition(self._read_part(path_a), files_a, depth)
+            self._partition(self._read_part(path_b), files_b, depth)
+        finally:
+            for f in files_a + files_b:
+                f.close()
+        os.remove(path_a)
+        os.remove(path_b)
+        return [(fa.name, fb.name, depth + 1) for fa, fb in zip(files_a, files_b)]
+
+    # ---------- сравнение ----------
+
+    def _compare(self, a: Dict[str, None], b: Dict[str, None], out_b) -> Iterator[bytes]:
+        self.stats["a_unique"] += len(a)
+        self.stats["b_unique"] += len(b)
+        batch: List[str] = []
+        common = 0
+        for code in a:
+            if code in b:
+                common += 1
+                continue
+            batch.append(code)
+            if len(batch) >= WRITE_BATCH:
+                yield ("\n".join(batch) + "\n").encode("utf-8")
+                self.stats["a_only"] += len(batch)
+                batch.clear()
+        if batch:
+            yield ("\n".join(batch) + "\n").encode("utf-8")
+            self.stats["a_only"] += len(batch)
+        self.stats["common"] += common
+        b_only = [code for code in b if code not in a]
+        if b_only:
+            out_b.write("\n".join(b_only) + "\n")
+        self.stats["b_only"] += len(b_only)
+
+    def _load_pair(self, path_a: str, path_b: str) -> tuple:
+        a = dict.fromkeys(self._read_part(path_a))
+        b = dict.fromkeys(self._read_part(path_b))
+        os.remove(path_a)
+        os.remove(path_b)
+        return a, b
+
+    def a_minus_b(self) -> Iterator[bytes]:
+        with open(self._b_out_path, "w", encoding="utf-8", newline="\n") as out_b:
+            # сначала пробуем целиком в памяти
+            a: Dict[str, None] = {}
+            b: Dict[str, None] = {}
+            src_a = self._codes(self.path_a, "a_total")
+            src_b = self._codes(self.path_b, "b_total")
+            for code in src_a:
+                a[code] = None
+                if len(a) > self.memory_items:
+                    break
+            else:
+                for code in src_b:
+                    b[code] = None
+                    if len(a) + len(b) > self.memory_items:
+                        break
+                else:
+                    yield from self._compare(a, b, out_b)
+                    return
+
+            # не поместилось: оба входа — по разделам на диск (дочитываются потоком)
+            self.stats["partitioned"] = True
+            base = os.path.join(self._work_dir, "p")
+            files_a, files_b = self._open_parts(base + "a"), self._open_parts(base + "b")
+            try:
+                self._partition(a, files_a, 0)
+                a.clear()
+                self._partition(src_a, files_a, 0)
+                self._partition(b, files_b, 0)
+                b.clear()
+                self._partition(src_b, files_b, 0)
+            finally:
+                for f in files_a + files_b:
+                    f.close()
+
+            if self.spilled is not None:
+                self.spilled(sum(os.path.getsize(f.name) for f in files_a + files_b))
+
+            pending = [(fa.name, fb.name, 1) for fa, fb in zip(files_a, files_b)]
+            pending.reverse()
+            while pending:
+                path_a, path_b, depth = pending.pop()
+                size = os.path.getsize(path_a) + os.path.getsize(path_b)
+                if size > self._part_bytes_limit() and depth <= MAX_DEPTH:
+                    pending.extend(reversed(self._split(path_a, path_b, depth)))
+                    continue
+                a, b = self._load_pair(path_a, path_b)
+                self.stats["partitions"] += 1
+                yield from self._compare(a, b, out_b)
+                a = b = None
+                if self.progress is not None:
+                    self.progress(size)
+
+    def _part_bytes_limit(self) -> int:
+        # грубая оценка «влезает ли пара в бюджет»: ~64 байта на код в файле раздела
+        return self.memory_items * 64
+
+    def b_minus_a(self) -> Iterator[bytes]:
+        try:
+            with open(self._b_out_path, "rb") as f:
+                while True:
+                    chunk = f.read(READ_BUF)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            self.close()
+
+    def summary(self) -> Iterator[bytes]:
+        yield json.dumps(self.stats, ensure_ascii=False, indent=2).encode("utf-8")
+
+    def entries(self) -> Iterator[tuple]:
+        """Записи для zip_stream: A−B, B−A, сводка."""
+        yield "a_minus_b.txt", self.a_minus_b()
+        yield "b_minus_a.txt", self.b_minus_a()
+        yield "summary.json", self.summary()
+
+    def close(self) -> None:
+        shutil.rmtree(self._work_dir, ignore_errors=True)
@@ -0,0 +1,339 @@
+from __future__ import annotations
+import hashlib
+import math
+import os
+import re
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Проверка кодов маркировки (КИ) до отправки: дубли + структура GS1.
+# Рассчитано на потоки в десятки миллионов кодов: дубли ищутся по 16-байтным
+# дайджестам, а при превышении порога дайджесты сбрасываются на диск по разделам.
+
+# ---------- конфиг ----------
+DUP_MEMORY_ITEMS = int(os.environ.get("CODE_DUP_MEMORY_ITEMS", "1000000") or 1000000)
+DUP_PARTITIONS = 64
+# потолок ёмкости фильтра Блума (~1,7 МБ на миллион кодов; по умолчанию ~14 МБ).
+# Больше кодов — фильтр насыщается: при fp 0,1% на потолке ложных «возможно был»
+# ~6% при 2×, ~50% при 4×, почти все при 10× — результат остаётся точным
+# (всё подтверждается множеством/разделами), растёт только доля проверок.
+DUP_BLOOM_MAX_ITEMS = int(os.environ.get("CODE_DUP_BLOOM_MAX_ITEMS", str(8 * DUP_MEMORY_ITEMS)) or 8 * DUP_MEMORY_ITEMS)
+SAMPLE_LIMIT = 20
+MIN_CODE_BYTES = 32   # короче КИ не бывает (01 + GTIN + 21 + серийный): оценка числа кодов по объёму
+
+GS = "\x1D"
+
+# Набор символов GS1 (AI encodable character set 82)
+_CSET82 = r"!\"%&'()*+,\-./0-9:;<=>?A-Z_a-z"
+_CSET82_RE = re.compile(f"[{_CSET82}]+")
+_DIGITS_RE = re.compile(r"\d+")
+
+# Типичный КИ: 01 + GTIN(14) + 21 + серийный номер, дальше криптохвост 91/92/93/94 через GS
+_FAST_KI = re.compile(rf"01(\d{{14}})21[{_CSET82}]{{1,20}}(?:\x1D9[1-4][{_CSET82}]{{1,90}})*")
+
+# AI → (длина, только цифры). Длина None — переменная, до GS или конца строки.
+_AI_FIXED: Dict[str, Tuple[int, bool]] = {
+    "00": (18, True), "01": (14, True), "02": (14, True),
+    "11": (6, True), "12": (6, True), "13": (6, True), "15": (6, True), "16": (6, True), "17": (6, True),
+    "20": (2, True), "7003": (10, True), "8005": (6, True),
+    **{f"310{n}": (6, True) for n in range(10)},
+    **{f"330{n}": (6, True) for n in range(10)},
+}
+_AI_VAR: Dict[str, int] = {
+    "10": 20, "21": 20, "22": 20, "240": 30, "241": 30, "250": 30,
+    "91": 90, "92": 90, "93": 90, "94": 90, "95": 90, "96": 90, "97": 90, "98": 90, "99": 90,
+}
+
+
+# ---------- нормализация ----------
+
+def normalize_codes(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Строки → коды: пробелы по краям срезаются, пустые строки пропускаются,
+    текстовые маркеры <GS>, &lt;GS&gt; и \\x1D заменяются на символ GS (0x1D).
+    Единые правила для выгрузок json_inspector и сравнения списков.
+    """
+    for line in lines:
+        s = line.strip()
+        if not s:
+            continue
+        s = s.replace("<GS>", "\\x1D").replace("&lt;GS&gt;", "\\x1D")
+        yield s.replace("\\x1D", GS)
+
+
+# ---------- GS1 ----------
+
+def gtin_check_ok(gtin: str) -> bool:
+    """
+    Контрольная цифра GTIN (mod 10, веса 3/1 справа налево).
+    """
+    if not gtin.isdigit():
+        return False
+    total = 0
+    for i, ch in enumerate(reversed(gtin[:-1])):
+        total += int(ch) * (3 if i % 2 == 0 else 1)
+    return (10 - total % 10) % 10 == int(gtin[-1])
+
+
+def _match_ai(s: str, pos: int) -> Optional[str]:
+    for n in (2, 3, 4):
+        ai = s[pos:pos + n]
+        if ai in _AI_FIXED or ai in _AI_VAR:
+            return ai
+    return None
+
+
+def gs1_error(code: str) -> Optional[str]:
+    """
+    Разбор строки КИ по AI. None — код корректен, иначе краткая причина.
+    Требуется 01 (GTIN) первым и 21 (серийный номер) где-то в коде.
+    """
+    if not code.startswith("01"):
+        return "no_gtin"
+    pos, seen = 0, set()
+    n = len(code)
+    while pos < n:
+        if code[pos] == GS:
+            pos += 1
+            continue
+        ai = _match_ai(code, pos)
+        if ai is None:
+            return "unknown_ai"
+        pos += len(ai)
+        if ai in _AI_FIXED:
+            length, digits = _AI_FIXED[ai]
+            value = code[pos:pos + length]
+            if len(value) != length or (digits and not _DIGITS_RE.fullmatch(value)):
+                return f"bad_ai_{ai}"
+            pos += length
+        else:
+            end = code.find(GS, pos)
+            end = n if end < 0 else end
+            value = code[pos:end]
+            if not value or len(value) > _AI_VAR[ai]:
+                return f"bad_ai_{ai}"
+            if not _CSET82_RE.fullmatch(value):
+                return "bad_chars"
+            pos = end
+        if ai == "01" and not gtin_check_ok(value):
+            return "gtin_check_digit"
+        seen.add(ai)
+    if "21" not in seen:
+        return "no_serial"
+    return None
+
+
+# ---------- дубли ----------
+
+class BloomFilter:
+    """
+    Фильтр Блума фиксированного размера (двойное хеширование по blake2b).
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.bits = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.fp_rate = fp_rate
+        self._arr = bytearray((self.bits + 7) // 8)
+
+    def add(self, digest: bytes) -> bool:
+        """
+        Добавляет элемент; True — элемент «возможно уже был».
+        """
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        arr, bits = self._arr, self.bits
+        present = True
+        for i in range(self.hashes):
+            b = (h1 + i * h2) % bits
+            byte, mask = b >> 3, 1 << (b & 7)
+            if not arr[byte] & mask:
+                present = False
+                arr[byte] |= mask
+        return present
+
+
+class DuplicateDetector:
+    """
+    Потоковый точный поиск дублей.
+      - Множество дайджестов в памяти; после memory_items всё сбрасывается
+        на диск по разделам (hex-дайджест + код в строке), а дубли
+        досчитываются в finish() раздел за разделом.
+      - bloom=True: фильтр Блума перед множеством/разделами. «Точно новый»
+        код не проверяется по множеству, а в разделах помечается как таковой;
+        finish() строит множество только из «возможных» дублей раздела и
+        пропускает разделы без них. Ложные срабатывания фильтра отсеиваются
+        точной проверкой; bloom_capacity — ожидаемое число кодов (не больше
+        DUP_BLOOM_MAX_ITEMS).
+    """
+
+    def __init__(self, memory_items: int = DUP_MEMORY_ITEMS, partitions: int = DUP_PARTITIONS,
+                 spill_dir: Optional[str] = None, bloom: bool = False,
+                 bloom_capacity: Optional[int] = None, sample_limit: int = SAMPLE_LIMIT):
+        self.memory_items = memory_items
+        self.partitions = partitions
+        self.sample_limit = sample_limit
+        self._spill_parent = spill_dir
+        self._spill_dir: Optional[str] = None
+        self._files: List[Any] = []
+        self._maybe: List[int] = []   # раздел → сколько в нём «возможных» дублей
+        self._seen: set = set()
+        self._bloom = BloomFilter(min(bloom_capacity or memory_items, DUP_BLOOM_MAX_ITEMS)) if bloom else None
+        self.duplicates = 0
+        self.samples: List[str] = []
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill_dir is not None
+
+    def _hit(self, code: str) -> None:
+        self.duplicates += 1
+        if len(self.samples) < self.sample_limit:
+            self.samples.append(code)
+
+    def _spill(self) -> None:
+        self._spill_dir = tempfile.mkdtemp(prefix="ki_dups_", dir=self._spill_parent)
+        self._files = [open(os.path.join(self._spill_dir, f"{i:03d}.part"), "w", encoding="utf-8", newline="\n")
+                       for i in range(self.partitions)]
+        # всё, что уже в памяти, — первые вхождения (повторы посчитаны в add)
+        self._maybe = [0] * self.partitions
+        for d in self._seen:
+            self._files[d[0] % self.partitions].write("-" + d.hex() + "\n")
+        self._seen = set()
+
+    def add(self, code: str) -> None:
+        digest = hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest()
+        maybe = self._bloom is None or self._bloom.add(digest)
+        if self._files:
+            # «+» — возможный дубль (проверяется в finish), «-» — точно первое вхождение
+            i = digest[0] % self.partitions
+            if maybe:
+                self._maybe[i] += 1
+                self._files[i].write("+" + digest.hex() + code + "\n")
+            else:
+                self._files[i].write("-" + digest.hex() + "\n")
+            return
+        if maybe and digest in self._seen:
+            self._hit(code)
+            return
+        self._seen.add(digest)
+        if len(self._seen) > self.memory_items:
+            self._spill()
+
+    def finish(self) -> Tuple[int, List[str]]:
+        """
+        Досчитывает дубли в сброшенных разделах. Вызывать один раз в конце.
+        """
+        if self._files:
+            for f in self._files:
+                f.close()
+            for f, maybe in zip(self._files, self._maybe):
+                if maybe:
+                    self._finish_part(f.name)
+            self._files = []
+        self.close()
+        return self.duplicates, self.samples
+
+    def _finish_part(self, path: str) -> None:
+        candidates = None
+        if self._bloom is not None:
+            # в памяти — только дайджесты «возможных» дублей
+            with open(path, "r", encoding="utf-8", newline="\n") as fh:
+                candidates = {line[1:33] for line in fh if line[0] == "+"}
+        seen = set()
+        with open(path, "r", encoding="utf-8", newline="\n") as fh:
+            for line in fh:
+                d = line[1:33]
+                if candidates is not None and d not in candidates:
+                    continue
+                if d in seen:
+                    self._hit(line[33:].rstrip("\n"))
+                else:
+                    seen.add(d)
+
+    def close(self) -> None:
+        for f in self._files:
+            f.close()
+        self._files = []
+        self._seen = set()
+        if self._spill_dir:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+
+# ---------- валидатор ----------
+
+class CodeValidator:
+    """
+    Стадия конвейера кодов: wrap() пропускает коды дальше без изменений,
+    попутно собирая отчёт; report() — итог после исчерпания потока.
+    """
+
+    def __init__(self, bloom: bool = False, sample_limit: int = SAMPLE_LIMIT, **dup_opts: Any):
+        self.sample_limit = sample_limit
+        self.total = 0
+        self.invalid = 0
+        self.errors: Dict[str, int] = {}
+        self.error_samples: List[Dict[str, Any]] = []
+        self.dups = DuplicateDetector(bloom=bloom, sample_limit=sample_limit, **dup_opts)
+        self._gtin_cache: Dict[str, bool] = {}
+        self._report: Optional[Dict[str, Any]] = None
+
+    def _gtin_ok(self, gtin: str) -> bool:
+        # GTIN-ов в выгрузке единицы, а кодов — миллионы: кэшируем
+        ok = self._gtin_cache.get(gtin)
+        if ok is None:
+            if len(self._gtin_cache) > 100_000:
+                self._gtin_cache.clear()
+            ok = self._gtin_cache[gtin] = gtin_check_ok(gtin)
+        return ok
+
+    def feed(self, raw_code: str) -> None:
+        code = (raw_code or "").strip().replace("<GT>", GS).replace("&lt;GT&gt;", GS)
+        if not code:
+            return
+        self.total += 1
+        m = _FAST_KI.fullmatch(code)
+        if m is not None:
+            err = None if self._gtin_ok(m.group(1)) else "gtin_check_digit"
+        else:
+            err = gs1_error(code)
+        if err is not None:
+            self.invalid += 1
+            self.errors[err] = self.errors.get(err, 0) + 1
+            if len(self.error_samples) < self.sample_limit:
+                self.error_samples.append({"n": self.total, "code": code.replace(GS, "<GS>"), "error": err})
+        self.dups.add(code)
+
+    def wrap(self, codes_iter: Iterable[str]) -> Iterator[str]:
+        try:
+            for c in codes_iter:
+                self.feed(c)
+                yield c
+        except GeneratorExit:
+            self.dups.close()
+            raise
+
+    def report(self) -> Dict[str, Any]:
+        if self._report is None:
+            dup_count, dup_samples = self.dups.finish()
+            self._report = {
+                "total": self.total,
+                "valid": self.total - self.invalid,
+                "invalid": self.invalid,
+                "errors": self.errors,
+                "error_samples": self.error_samples,
+                "duplicates": dup_count,
+                "duplicate_samples": [c.replace(GS, "<GS>") for c in dup_samples],
+                "ok": self.invalid == 0 and dup_count == 0,
+            }
+        return self._report
+
+
+def validate_codes(codes_iter: Iterable[str], bloom: bool = False,
+                   expected_items: Optional[int] = None) -> Dict[str, Any]:
+    v = CodeValidator(bloom=bloom, bloom_capacity=expected_items)
+    for c in codes_iter:
+        v.feed(c)
+    return v.report()
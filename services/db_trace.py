@@ -0,0 +1,75 @@
+from __future__ import annotations
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from flask import Flask, Response, current_app, g, has_request_context, request
+
+from . import profiling
+
+# Трассировка запросов к БД в рамках HTTP-запроса: template_store._execute сообщает
+# сюда о каждом запросе, здесь они суммируются на запрос, медленные пишутся в лог.
+# Заголовки X-DB-Queries / X-DB-Time-Ms и Server-Timing (вкладка Network браузера) —
+# только для диагностики: при DB_TRACE_HEADERS=1, в debug или по X-Profile-Token
+# (тот же PROFILE_TOKEN, что у профилировщика). Модуль без psycopg2 — подключается
+# к приложению через add_app_hook.
+
+# ---------- конфиг ----------
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "200") or 0)       # 0 — не логировать
+# больше запросов на один HTTP-запрос — предупреждение в лог (N+1, построчные вставки)
+MANY_QUERIES = int(os.environ.get("DB_MANY_QUERIES", "20") or 0)
+HEADERS = os.environ.get("DB_TRACE_HEADERS", "0") not in ("0", "")
+
+SQL_LOG_CHARS = 300
+
+log = logging.getLogger("stp.db")
+
+
+def _short(sql: str) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= SQL_LOG_CHARS else sql[:SQL_LOG_CHARS] + "…"
+
+
+def record(sql: str, op: str, seconds: float, rows: Optional[int] = None) -> None:
+    """Учёт одного запроса к БД: в сумму текущего HTTP-запроса и в лог, если медленный."""
+    ms = seconds * 1000
+    if SLOW_QUERY_MS and ms >= SLOW_QUERY_MS:
+        where = f" [{request.method} {request.script_root}{request.path}]" if has_request_context() else ""
+        log.warning("медленный запрос %.1f мс%s: %s (строк: %s)", ms, where, _short(sql),
+                    "?" if rows is None or rows < 0 else rows)
+    if not has_request_context():
+        return
+    trace: Optional[Dict[str, Any]] = g.get("_db_trace")
+    if trace is None:
+        trace = g._db_trace = {"count": 0, "ms": 0.0, "ops": {}}
+    trace["count"] += 1
+    trace["ms"] += ms
+    trace["ops"][op] = trace["ops"].get(op, 0) + 1
+
+
+def current() -> Optional[Dict[str, Any]]:
+    """Сводка запросов к БД текущего HTTP-запроса: {count, ms, ops} или None."""
+    return g.get("_db_trace") if has_request_context() else None
+
+
+def _after_request(response: Response) -> Response:
+    trace = g.get("_db_trace")
+    if trace is None:
+        return response
+    if MANY_QUERIES and trace["count"] > MANY_QUERIES:
+        log.warning("%s %s%s: %d запросов к БД за %.1f мс %s", request.method, request.script_root, request.path,
+                    trace["count"], trace["ms"], trace["ops"])
+    if _headers_allowed():
+        response.headers["X-DB-Queries"] = str(trace["count"])
+        response.headers["X-DB-Time-Ms"] = f"{trace['ms']:.1f}"
+        response.headers.add("Server-Timing", f'db;dur={trace["ms"]:.1f};desc="{trace["count"]} queries"')
+    return response
+
+
+def _headers_allowed() -> bool:
+    # число и время запросов к БД наружу не отдаём: это внутренности сервера
+    return HEADERS or current_app.debug or profiling.check_token(request.headers.get("X-Profile-Token"))
+
+
+def instrument(app: Flask) -> None:
+    app.after_request(_after_request)
@@ -0,0 +1,270 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+# Фоновые выгрузки: задача пишет артефакт на диск, прогресс лежит рядом в job.json.
+# HTTP-соединение держится только на время скачивания готового файла.
+
+# ---------- конфиг ----------
+JOBS_DIR = os.environ.get("EXPORT_JOBS_DIR") or os.path.join(tempfile.gettempdir(), "stp_export_jobs")
+JOB_WORKERS = int(os.environ.get("EXPORT_JOB_WORKERS", "2") or 2)
+JOB_TTL_SEC = int(os.environ.get("EXPORT_JOB_TTL_SEC", str(24 * 3600)) or 24 * 3600)
+PROGRESS_EVERY_SEC = 1.0
+# задача в статусе queued/running, чей процесс столько не обновлял job.json, считается прерванной
+STALE_AFTER_SEC = 10 * PROGRESS_EVERY_SEC
+
+# Билдер: итератор строк кодов → итератор байтов артефакта
+Builder = Callable[[Iterable[str]], Iterable[bytes]]
+# Общая задача: (состояние, каталог задачи) → итератор байтов артефакта;
+# прогресс задача отмечает сама в state["done"] (из state["total"])
+Producer = Callable[[Dict[str, Any], str], Iterable[bytes]]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_live: Dict[str, Dict[str, Any]] = {}   # состояние задач этого процесса
+# последний снимок job.json живой задачи: status() читает его, а не _live,
+# который поток задачи меняет без блокировки
+_published: Dict[str, str] = {}
+_write_lock = threading.Lock()
+_heartbeat: Optional[threading.Thread] = None
+_HOST = socket.gethostname()
+
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _write_state(state: Dict[str, Any]) -> None:
+    # pid/host/updated_at — пульс: по ним другие воркеры отличают живую задачу от прерванной
+    snapshot = dict(state, pid=os.getpid(), host=_HOST, updated_at=time.time())
+    text = json.dumps(snapshot, ensure_ascii=False)
+    path = os.path.join(_job_dir(state["id"]), "job.json")
+    tmp = path + ".tmp"
+    with _write_lock:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+        if state["id"] in _live:   # запоздалый пульс уже снятой задачи не публикуем
+            _published[state["id"]] = text
+
+
+def _beat() -> None:
+    # пульс и для задач в очереди, и для долгих шагов без вывода (сортировка, разбиение)
+    while True:
+        time.sleep(PROGRESS_EVERY_SEC)
+        with _lock:
+            states = list(_live.values())
+        for state in states:
+            try:
+                _write_state(state)
+            except (OSError, RuntimeError, ValueError):
+                continue
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="export-job")
+        global _heartbeat
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_beat, name="export-job-heartbeat", daemon=True)
+            _heartbeat.start()
+        return _executor
+
+
+def shutdown(wait: bool = True) -> None:
+    """
+    Останов пула задач; wait=True — дождаться уже запущенных выгрузок.
+    """
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _after_fork() -> None:
+    # потоки пула не переживают fork — в дочернем процессе пул создаётся заново
+    global _executor, _heartbeat
+    _executor = None
+    _heartbeat = None
+    _live.clear()
+    _published.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _cleanup_expired() -> None:
+    if not os.path.isdir(JOBS_DIR):
+        return
+    deadline = time.time() - JOB_TTL_SEC
+    for name in os.listdir(JOBS_DIR):
+        path = _job_dir(name)
+        try:
+            if os.path.getmtime(path) < deadline and name not in _live:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            continue
+
+
+def _counted(lines: Iterable[str], state: Dict[str, Any]) -> Iterator[str]:
+    n = 0
+    for line in lines:
+        if line.strip():
+            n += 1
+            state["codes_done"] = state["done"] = n
+        yield line
+
+
+def _codes_producer(build: Builder) -> Producer:
+    def produce(state: Dict[str, Any], jdir: str) -> Iterator[bytes]:
+        with open(os.path.join(jdir, "codes.txt"), "r", encoding="utf-8", newline=None) as src:
+            yield from build(_counted(src, state))
+    return produce
+
+
+def _run(job_id: str, produce: Producer) -> None:
+    state = _live[job_id]
+    jdir = _job_dir(job_id)
+    part = os.path.join(jdir, "artifact.part")
+    state.update(status="running", started_at=time.time())
+    _write_state(state)
+    try:
+        last_flush = 0.0
+        with open(part, "wb") as out:
+            # пустой чанк — задача жива, но пока ничего не вывела: только сброс прогресса
+            for chunk in produce(state, jdir):
+                out.write(chunk)
+                state["bytes"] += len(chunk)
+                now = time.monotonic()
+                if now - last_flush >= PROGRESS_EVERY_SEC:
+                    _write_state(state)
+                    last_flush = now
+        os.replace(part, os.path.join(jdir, "artifact"))
+        state.update(status="done", finished_at=time.time())
+    except Exception as e:
+        state.update(status="failed", error=str(e), finished_at=time.time())
+    finally:
+        _write_state(state)
+        with _lock:
+            _live.pop(job_id, None)
+        with _write_lock:
+            _published.pop(job_id, None)
+
+
+def create() -> Tuple[str, str]:
+    """
+    Новая задача: (id, каталог). Входные файлы кладутся в каталог до start().
+    """
+    _cleanup_expired()
+    job_id = uuid.uuid4().hex
+    jdir = _job_dir(job_id)
+    os.makedirs(jdir, exist_ok=True)
+    return job_id, jdir
+
+
+def start(job_id: str, produce: Producer, download_name: str, mimetype: str,
+          meta: Optional[Dict[str, Any]] = None, total: int = 0, **extra: Any) -> None:
+    """
+    Ставит задачу из create() в очередь; total — объём работы в единицах state["done"].
+    """
+    state = {
+        "id": job_id,
+        "status": "queued",
+        "created_at": time.time(),
+        "total": total,
+        "done": 0,
+        "bytes": 0,
+        "download_name": download_name,
+        "mimetype": mimetype,
+        "meta": meta or {},
+        **extra,
+    }
+    with _lock:
+        _live[job_id] = state
+    _write_state(state)
+    _get_executor().submit(_run, job_id, produce)
+
+
+def submit(lines: Iterable[str], build: Builder, download_name: str, mimetype: str,
+           meta: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Ставит выгрузку в очередь. Строки кодов сразу уходят на диск (потоком,
+    с попутным подсчётом), так что память запроса освобождается до начала генерации.
+    """
+    job_id, jdir = create()
+    total = 0
+    with open(os.path.join(jdir, "codes.txt"), "w", encoding="utf-8", newline="\n") as f:
+        for line in lines:
+            line = line.rstrip("\r\n")
+            f.write(line + "\n")
+            if line.strip():
+                total += 1
+    start(job_id, _codes_producer(build), download_name, mimetype, meta,
+          total=total, codes_total=total, codes_done=0)
+    return job_id
+
+
+def _alive(state: Dict[str, Any]) -> bool:
+    if time.time() - state.get("updated_at", 0) > STALE_AFTER_SEC:
+        return False
+    pid = state.get("pid")
+    if pid and state.get("host") == _HOST:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+    return True
+
+
+def status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Состояние задачи + ETA. Задача другого воркера жива, пока её процесс
+    обновляет job.json; без пульса дольше STALE_AFTER_SEC (или если процесса
+    на этой машине уже нет) она считается прерванной.
+    """
+    if not job_id.isalnum():
+        return None
+    with _write_lock:
+        text = _published.get(job_id)
+    if text is not None:
+        # своя задача: целостный снимок, записанный потоком задачи или пульсом
+        state = json.loads(text)
+    else:
+        try:
+            with open(os.path.join(_job_dir(job_id), "job.json"), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("status") in ("queued", "running") and not _alive(state):
+            state.update(status="failed", error="Задача прервана перезапуском сервера")
+    eta = None
+    started = state.get("started_at")
+    done, total = state.get("done") or 0, state.get("total") or 0
+    if state["status"] == "running" and started and done > 0:
+        eta = max(0.0, (time.time() - started) * (total - done) / done)
+    state["eta_sec"] = None if eta is None else round(eta, 1)
+    if total > 0:
+        state["progress"] = round(min(1.0, done / total), 4)
+    else:
+        state["progress"] = 1.0 if state["status"] == "done" else 0.0
+    return state
+
+
+def artifact_path(job_id: str) -> Optional[str]:
+    if not job_id.isalnum():
+        return None
+    path = os.path.join(_job_dir(job_id), "artifact")
+    return path if os.path.exists(path) else None
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# ---------- конфиг ----------
+# Число процессов-воркеров для генерации выгрузок. 0/1 — всё в потоке запроса.
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", "0") or 0)
+# Сколько кодов в одном шарде (одна задача для воркера)
+SHARD_CODES = int(os.environ.get("EXPORT_SHARD_CODES", "50000") or 50000)
+
+# пулы по размеру: пул, которым может пользоваться другой поток, не закрывается
+# до shutdown_pool(); размеров на практике один-два (EXPORT_WORKERS, --workers CLI)
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Общий пул процессов на workers воркеров на весь процесс приложения. Создаётся лениво.
+    spawn вместо fork: пул поднимается из потока запроса многопоточного сервера.
+    """
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def shutdown_pool() -> None:
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def _after_fork() -> None:
+    # процессы и служебные потоки пулов остались у родителя
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def shards(items: Iterable[Any], size: int = SHARD_CODES) -> Iterator[List[Any]]:
+    """
+    Режет поток на списки по size элементов (последний может быть короче).
+    """
+    buf: List[Any] = []
+    for it in items:
+        buf.append(it)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def ordered_map(fn: Callable[..., Any], items: Iterable[Any], *args: Any,
+                workers: Optional[int] = None,
+                executor: Optional[Executor] = None) -> Iterator[Any]:
+    """
+    Как map(fn, items, *args), но задачи уходят в пул процессов.
+    Результаты отдаются строго в исходном порядке; в полёте не больше
+    2 × workers задач, так что память ограничена несколькими шардами.
+    fn — функция верхнего уровня модуля (её нужно уметь пиклить).
+    """
+    workers = EXPORT_WORKERS if workers is None else workers
+    if executor is None and workers <= 1:
+        for it in items:
+            yield fn(it, *args)
+        return
+
+    pool = executor or get_pool(workers)
+    window = max(2, 2 * workers)
+    inflight: deque = deque()
+    try:
+        for it in items:
+            inflight.append(pool.submit(fn, it, *args))
+            if len(inflight) >= window:
+                yield inflight.popleft().result()
+        while inflight:
+            yield inflight.popleft().result()
+    finally:
+        # Клиент оборвал загрузку — не держим воркеры на лишних шардах
+        for fut in inflight:
+            fut.cancel()
@@ -1,62 +1,221 @@
-# from __future__ import annotations
-# from flask import Blueprint, request, jsonify, render_template_string
-# from .base import ServiceBase
-#
-# bp = Blueprint("file_compare", __name__, template_folder="../templates")
-#
-# HTML = """
-# <!doctype html>
-# <meta charset="utf-8">
-# <title>Сравнение файлов</title>
-# <link rel="stylesheet" href="/static/style.css">
-# <div class="container">
-#   <h2>Сравнение файлов</h2>
-#   <p class="muted">Загрузите два файла для сравнения. Возвращается отчёт о различиях по строкам.</p>
-#   <form id="cmpForm">
-#     <input type="file" name="a" required>
-#     <input type="file" name="b" required>
-#     <button type="submit">Сравнить</button>
-#   </form>
-#   <pre id="out" class="pre"></pre>
-# </div>
-# <script>
-# document.getElementById('cmpForm').addEventListener('submit', async (e) => {
-#   e.preventDefault();
-#   const fd = new FormData(e.target);
-#   const res = await fetch('diff', { method:'POST', body: fd });
-#   const data = await res.json();
-#   document.getElementById('out').textContent = data.report || data.error;
-# });
-# </script>
-# """
-#
-# @bp.route("/", methods=["GET"])
-# def page():
-#     return render_template_string(HTML)
-#
-# @bp.route("/diff", methods=["POST"])
-# def diff():
-#     a = request.files.get("a")
-#     b = request.files.get("b")
-#     if not a or not b:
-#         return jsonify({"error": "Нужно выбрать оба файла"}), 400
-#     a_lines = a.read().decode("utf-8", "ignore").splitlines()
-#     b_lines = b.read().decode("utf-8", "ignore").splitlines()
-#     report = []
-#     max_len = max(len(a_lines), len(b_lines))
-#     for i in range(max_len):
-#         la = a_lines[i] if i < len(a_lines) else ""
-#         lb = b_lines[i] if i < len(b_lines) else ""
-#         if la != lb:
-#             report.append(f"Строка {i+1}: A={la!r} | B={lb!r}")
-#     if not report:
-#         report.append("Файлы идентичны ✅")
-#     return jsonify({"report": "\n".join(report)})
-#
-# service = ServiceBase(
-#     id="file-compare",
-#     name="Сравнение файлов",
-#     description="Сравнивает два загруженных файла и показывает отличия по строкам.",
-#     icon="📄",
-#     blueprint=bp
-# )
+from __future__ import annotations
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterator, Optional
+
+from flask import Blueprint, Response, jsonify, request, send_file, stream_with_context
+from .base import ServiceBase
+from . import admission, assets, export_jobs
+from .cached_response import CachedBody
+from .code_sets import SetDiff
+from .line_diff import CONTEXT_LINES, READ_BUF, unified_diff
+from .zipstream import remove_on_close, zip_stream
+
+bp = Blueprint("file_compare", __name__)
+
+# Оба файла сначала пишутся на диск, diff считается в фоне (line_diff: окна хешей,
+# patience) и сразу пишется в файл отчёта; страница опрашивает прогресс и показывает
+# начало отчёта. ?stream=1 — отчёт потоком в ответ на тот же запрос (для curl/скриптов).
+# /sets — сравнение списков кодов КИ как множеств (code_sets): ZIP с A−B, B−A и сводкой.
+
+# ---------- конфиг ----------
+PREVIEW_BYTES = 256 * 1024
+MAX_CONTEXT = 50
+
+HTML = """
+<!doctype html>
+<html lang="ru"><meta charset="utf-8">
+<title>Сравнение файлов</title>
+<link rel="stylesheet" href="{base_css}">
+<link rel="stylesheet" href="{css}">
+<body><div class="container">
+  <h2>📄 Сравнение файлов</h2>
+  <p class="muted">Построчный diff двух файлов любого размера: отчёт в формате unified diff
+    (как <code>diff -u</code>). Вставка строки не сдвигает остальные различия.
+    Режим «списки кодов» сравнивает файлы как множества КИ (порядок и повторы не важны):
+    архив с кодами только в A, только в B и сводкой.</p>
+  <form id="cmpForm" class="card">
+    <div class="row">
+      <label>A: <input type="file" name="a" required></label>
+      <label>B: <input type="file" name="b" required></label>
+    </div>
+    <div class="row">
+      <label><input type="radio" name="mode" value="diff" checked> построчный diff</label>
+      <label><input type="radio" name="mode" value="sets"> списки кодов</label>
+    </div>
+    <div class="row">
+      <label class="diff-only"><input type="checkbox" name="ignore_space" value="1"> игнорировать пробелы</label>
+      <label class="diff-only">контекст, строк: <input type="number" name="context" value="3" min="0" max="50"></label>
+      <button type="submit">Сравнить</button>
+    </div>
+  </form>
+  <div id="status" class="muted"></div>
+  <pre id="out" class="diff"></pre>
+</div>
+<script src="{js}"></script>
+</body></html>
+"""
+
+PAGE = CachedBody(HTML.format(
+    base_css=assets.url("style.css"),
+    css=assets.url("services/file_compare.css"),
+    js=assets.url("services/file_compare.js"),
+))
+
+
+def _spool(storage, path: str) -> int:
+    with open(path, "wb") as out:
+        shutil.copyfileobj(storage.stream, out, READ_BUF)
+    return os.path.getsize(path)
+
+
+def _options(form) -> Dict[str, Any]:
+    try:
+        context = int(form.get("context") or CONTEXT_LINES)
+    except ValueError:
+        context = CONTEXT_LINES
+    return {"context": max(0, min(context, MAX_CONTEXT)), "ignore_space": bool(form.get("ignore_space"))}
+
+
+def _labels(a, b) -> Dict[str, str]:
+    return {"label_a": f"a/{a.filename or 'A'}", "label_b": f"b/{b.filename or 'B'}"}
+
+
+@bp.route("/", methods=["GET"])
+def page():
+    return PAGE.response()
+
+
+@bp.route("/diff", methods=["POST"])
+@admission.heavy(admission.controller)
+def diff():
+    a = request.files.get("a")
+    b = request.files.get("b")
+    if not a or not b:
+        return jsonify({"error": "Нужно выбрать оба файла"}), 400
+    opts = {**_options(request.form), **_labels(a, b)}
+
+    if request.args.get("stream"):
+        tmp_dir = tempfile.mkdtemp(prefix="stp_diff_")
+        path_a, path_b = os.path.join(tmp_dir, "a"), os.path.join(tmp_dir, "b")
+        _spool(a, path_a)
+        _spool(b, path_b)
+        return remove_on_close(Response(stream_with_context(unified_diff(path_a, path_b, **opts)),
+                                        mimetype="text/x-diff"), tmp_dir)
+
+    job_id, jdir = export_jobs.create()
+    path_a, path_b = os.path.join(jdir, "a"), os.path.join(jdir, "b")
+    total = _spool(a, path_a) + _spool(b, path_b)
+
+    def produce(state: Dict[str, Any], _jdir: str) -> Iterator[bytes]:
+        def progress(n: int) -> None:
+            state["done"] += n
+        try:
+            yield from unified_diff(path_a, path_b, progress=progress, stats=state["stats"], **opts)
+        finally:
+            # входные файлы больше не нужны — в каталоге задачи остаётся только отчёт
+            for path in (path_a, path_b):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    export_jobs.start(job_id, produce, "diff.patch", "text/x-diff",
+                      meta={"a": a.filename, "b": b.filename, **_options(request.form)},
+                      total=total, kind="diff", stats={})
+    return jsonify({"id": job_id, "status_url": f"jobs/{job_id}", "download_url": f"jobs/{job_id}/download",
+                    "preview_url": f"jobs/{job_id}/preview"}), 202
+
+
+@bp.route("/sets", methods=["POST"])
+@admission.heavy(admission.controller)
+def sets():
+    a = request.files.get("a")
+    b = request.files.get("b")
+    if not a or not b:
+        return jsonify({"error": "Нужно выбрать оба файла"}), 400
+
+    if request.args.get("stream"):
+        tmp_dir = tempfile.mkdtemp(prefix="stp_sets_")
+        path_a, path_b = os.path.join(tmp_dir, "a"), os.path.join(tmp_dir, "b")
+        _spool(a, path_a)
+        _spool(b, path_b)
+        sd = SetDiff(path_a, path_b, work_dir=tmp_dir)
+        return remove_on_close(Response(stream_with_context(zip_stream(sd.entries())), mimetype="application/zip",
+                                        headers={"Content-Disposition": "attachment; filename=set_diff.zip"}),
+                               tmp_dir)
+
+    job_id, jdir = export_jobs.create()
+    path_a, path_b = os.path.join(jdir, "a"), os.path.join(jdir, "b")
+    total = _spool(a, path_a) + _spool(b, path_b)
+
+    def produce(state: Dict[str, Any], _jdir: str) -> Iterator[bytes]:
+        def progress(n: int) -> None:
+            state["done"] += n
+
+        def spilled(n: int) -> None:
+            state["total"] += n
+        sd = SetDiff(path_a, path_b, work_dir=jdir, progress=progress, spilled=spilled, stats=state["stats"])
+        try:
+            yield from zip_stream(sd.entries())
+        finally:
+            sd.close()
+            for path in (path_a, path_b):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    export_jobs.start(job_id, produce, "set_diff.zip", "application/zip",
+                      meta={"a": a.filename, "b": b.filename},
+                      total=total, kind="sets", stats={})
+    return jsonify({"id": job_id, "status_url": f"jobs/{job_id}", "download_url": f"jobs/{job_id}/download"}), 202
+
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    state = export_jobs.status(job_id)
+    if state is None:
+        return jsonify({"error": "Задача не найдена"}), 404
+    return jsonify(state)
+
+
+def _artifact(job_id: str) -> Optional[tuple]:
+    path = export_jobs.artifact_path(job_id)
+    state = export_jobs.status(job_id) if path is not None else None
+    return (path, state) if state is not None else None
+
+
+@bp.route("/jobs/<job_id>/download", methods=["GET"])
+def job_download(job_id: str):
+    found = _artifact(job_id)
+    if found is None:
+        return jsonify({"error": "Отчёт ещё не готов или задача не найдена"}), 404
+    path, state = found
+    return send_file(path, mimetype=state.get("mimetype") or "text/x-diff", as_attachment=True,
+                     download_name=state.get("download_name") or "diff.patch", conditional=True)
+
+
+@bp.route("/jobs/<job_id>/preview", methods=["GET"])
+def job_preview(job_id: str):
+    found = _artifact(job_id)
+    if found is None:
+        return jsonify({"error": "Отчёт ещё не готов или задача не найдена"}), 404
+    path, state = found
+    if state.get("kind") != "diff":
+        return jsonify({"error": "Просмотр есть только у diff-отчёта"}), 400
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(PREVIEW_BYTES)
+    return jsonify({"text": head.decode("utf-8", errors="replace"), "size": size,
+                    "truncated": size > len(head)})
+
+
+service = ServiceBase(
+    id="file-compare",
+    name="Сравнение файлов",
+    description="Построчный diff двух файлов любого размера и сравнение списков кодов КИ как множеств.",
+    icon="📄",
+    blueprint=bp
+)
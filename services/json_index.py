@@ -0,0 +1,168 @@
+from __future__ import annotations
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from typing import Any, List, Optional, Tuple
+
+# Индекс смещений по массиву товаров (products / products_list) в загруженном JSON.
+# Строится одним потоковым проходом по mmap и лежит рядом с файлом (<файл>.idx):
+#   заголовок: MAGIC, размер исходного файла, число товаров (Q, little-endian),
+#   затем пары (start, end) — байтовые границы каждого товара.
+# Страница товаров читается прямым доступом через mmap, без полного парсинга.
+
+INDEX_SUFFIX = ".idx"
+MAGIC = b"JIDX0001"
+_HEADER = struct.Struct("<8sQQ")
+_PAIR = struct.Struct("<QQ")
+PRODUCT_KEYS = (b'"products"', b'"products_list"')
+
+# Строковые литералы целиком (вместе с экранированием) и скобки.
+# «:» и «,» не токенизируем — ключ верхнего уровня опознаём по «:» после строки.
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}]', re.S)
+_WS = b" \t\r\n"
+
+# Элемент массива целиком одним совпадением (вложенность до 3 уровней) —
+# регэксп работает в C, и обычный товар не разбирается на токены в Python.
+# Серии «обычных» символов берутся только целиком (lookahead на границу),
+# поэтому разбиение однозначно и при несовпадении нет экспоненциального отката.
+_STR = rb'"(?:[^"\\]+(?=["\\])|\\.)*"'
+_PLAIN = rb'[^"{}\[\]]+(?=["{}\[\]])'
+_FLAT = rb'(?:' + _PLAIN + rb'|' + _STR + rb')*'
+_L1 = rb'(?:' + _PLAIN + rb'|' + _STR + rb'|\{' + _FLAT + rb'\}|\[' + _FLAT + rb'\])*'
+_L2 = rb'(?:' + _PLAIN + rb'|' + _STR + rb'|\{' + _L1 + rb'\}|\[' + _L1 + rb'\])*'
+_ELEMENT = re.compile(rb'\{' + _L2 + rb'\}|\[' + _L2 + rb'\]', re.S)
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def _scan(mm) -> Tuple[Optional[bytes], array]:
+    """
+    Один проход по токенам. Возвращает (ключ массива, плоский массив start/end).
+    Приоритет как в _extract_product_template: непустой products, иначе products_list.
+    Скалярные элементы массива (числа/true/null) не индексируются.
+    """
+    found = {}
+    depth = 0
+    key = None
+    target = None       # ключ индексируемого массива
+    arr_depth = 0       # глубина внутри этого массива
+    elem_start = -1
+    offsets = array("Q")
+    n = len(mm)
+
+    pos = 0
+    while True:
+        m = _TOKEN.search(mm, pos)
+        if m is None:
+            break
+        pos = m.end()
+        tok = m.group()
+        c = tok[:1]
+        if c == b'"':
+            if target is not None and depth == arr_depth:
+                offsets.append(m.start())
+                offsets.append(m.end())
+            elif depth == 1:
+                p = m.end()
+                while p < n and mm[p:p + 1] in _WS:
+                    p += 1
+                if mm[p:p + 1] == b":":
+                    key = tok
+            continue
+        if c in b"[{":
+            if target is not None and depth == arr_depth:
+                em = _ELEMENT.match(mm, m.start())
+                if em is not None:
+                    offsets.append(em.start())
+                    offsets.append(em.end())
+                    pos = em.end()
+                    continue
+                elem_start = m.start()
+            depth += 1
+            if c == b"[" and depth == 2 and target is None and key in PRODUCT_KEYS and key not in found:
+                target, arr_depth, offsets = key, depth, array("Q")
+            continue
+        # закрывающая скобка
+        depth -= 1
+        if target is not None:
+            if depth == arr_depth:
+                offsets.append(elem_start)
+                offsets.append(m.end())
+            elif depth == arr_depth - 1:
+                found[target] = offsets
+                if target == PRODUCT_KEYS[0] and offsets:
+                    break  # непустой products важнее products_list — дальше не читаем
+                target = None
+        if depth == 1:
+            key = None
+
+    for k in PRODUCT_KEYS:
+        if found.get(k):
+            return k, found[k]
+    return None, array("Q")
+
+
+def build(path: str) -> int:
+    """
+    Строит индекс рядом с файлом; возвращает число товаров.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        offsets = array("Q")
+    else:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            _, offsets = _scan(mm)
+    if offsets.itemsize != 8:
+        raise RuntimeError("array('Q') должен быть 64-битным")
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    tmp = index_path(path) + ".tmp"
+    with open(tmp, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, size, len(offsets) // 2))
+        offsets.tofile(out)
+    os.replace(tmp, index_path(path))
+    return len(offsets) // 2
+
+
+def count(path: str) -> Optional[int]:
+    """
+    Число товаров по заголовку индекса; None — индекса нет или он устарел.
+    """
+    try:
+        with open(index_path(path), "rb") as f:
+            magic, size, total = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    if magic != MAGIC or size != os.path.getsize(path):
+        return None
+    return total
+
+
+def ensure(path: str) -> int:
+    total = count(path)
+    return build(path) if total is None else total
+
+
+def read_page(path: str, offset: int, limit: int) -> Tuple[int, List[Any]]:
+    """
+    Товары [offset, offset+limit) — прямым доступом к байтам через mmap.
+    """
+    total = ensure(path)
+    offset = max(0, offset)
+    stop = min(total, offset + max(0, limit))
+    items: List[Any] = []
+    if offset >= stop:
+        return total, items
+    with open(index_path(path), "rb") as fi, open(path, "rb") as fd, \
+            mmap.mmap(fi.fileno(), 0, access=mmap.ACCESS_READ) as idx, \
+            mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(offset, stop):
+            start, end = _PAIR.unpack_from(idx, _HEADER.size + i * _PAIR.size)
+            items.append(json.loads(mm[start:end]))
+    return total, items
@@ -1,51 +1,46 @@
 from __future__ import annotations
+import codecs
 import io
+import itertools
 import json
 import os
 import re
+import shutil
 import tempfile
-from typing import Any, Dict, List, Iterable, Optional
+from array import array
+from typing import Any, Callable, Dict, List, Iterable, Iterator, Optional, Tuple, Union
 
-from flask import Blueprint, request, render_template_string, session, Response, stream_with_context
+from flask import Blueprint, request, session, Response, stream_with_context, jsonify, send_file
 
+from . import admission, export_jobs, metrics
+from .cached_response import InlineTemplate
+from . import json_index, upload_cache
 from .base import ServiceBase
+from .code_validation import MIN_CODE_BYTES, CodeValidator, normalize_codes, validate_codes
+from .export_parallel import EXPORT_WORKERS, ordered_map, shards
+from . import xml_schemas
+from .zipstream import remove_on_close, zip_stream
 
 bp = Blueprint("json_inspector", __name__)
 
 # --- настройки/ключи сессии ---
 # Чтобы убрать лимит — оставьте MAX_BYTES = None
 MAX_BYTES: Optional[int] = None  # например: 2 * 1024 * 1024 * 1024 для 2 ГБ
+# значения лежат в серверной сессии (services/session_store), в cookie — только id
 SESSION_PATH = "json_inspector_tmp"    # путь к загруженному файлу (не обязателен для логики)
 SESSION_CORE = "json_inspector_core"   # ядро (producer/owner/date/type)
 SESSION_PROD = "json_inspector_prod"   # поля продукта (tnved/cert*/vsd/production_date)
 
+CODES_EXPORTED = metrics.REGISTRY.counter(
+    "stp_json_inspector_codes_exported_total", "Коды, прошедшие через выгрузку", ("format",))
+
 HTML = """
 <!doctype html>
 <html lang="ru">
 <meta charset="utf-8">
 <title>JSON Инспектор</title>
-<link rel="stylesheet" href="/static/style.css">
-<style>
-  .row{margin:12px 0}
-  .muted{color:#9aa0a6}
-  .ok{color:#15a34a}
-  .err{color:#b00020}
-  .grid2{display:grid; grid-template-columns: 1fr auto; gap:10px; align-items:end}
-  table{width:100%; border-collapse:collapse; margin-top:8px}
-  th,td{border:1px solid #262b33; padding:6px; vertical-align:top}
-  th{width:260px; text-align:left; background:#10141c}
-  textarea{width:100%; min-height:180px; font-family:ui-monospace,Menlo,Consolas,monospace}
-  .actions{display:flex; gap:8px; flex-wrap:wrap; margin-top:12px}
-  .badge{display:inline-block; padding:2px 8px; border:1px solid #334155; border-radius:999px; font-size:12px; color:#cbd5e1}
-  .grid-form{display:grid; grid-template-columns: 1fr 300px; gap:12px; align-items:start}
-  .stack{display:flex; flex-direction:column; gap:8px}
-  input[type="text"], input[type="date"]{width:100%; padding:8px 10px; border-radius:10px; border:1px solid #262b33; background:#0e1116; color:#e6e6e6}
-  .grid2cols{display:grid; grid-template-columns: 1fr 1fr; gap:10px}
-  .card{border:1px solid #262b33; border-radius:12px; padding:12px}
-  .hstack{display:flex; gap:8px; align-items:center; flex-wrap:wrap}
-  .btn-row{display:flex; flex-direction:column; gap:8px}
-  button{padding:8px 12px}
-</style>
+<link rel="stylesheet" href="{{ asset_url('style.css') }}">
+<link rel="stylesheet" href="{{ asset_url('services/json_inspector.css') }}">
 <body>
 <div class="container">
   <h2>JSON Инспектор</h2>
@@ -66,11 +61,28 @@ HTML = """
     </div>
   </form>
 
+  <!-- Пакетная конвертация (без сессии): много документов → ZIP с XML -->
+  <form class="row card" method="POST" action="batch" enctype="multipart/form-data">
+    <b>Пакетная конвертация</b>
+    <div class="muted">Несколько JSON-файлов и/или NDJSON (документ на строку). Коды берутся из товаров документа (ki / uit_code / uitu_code / cis).</div>
+    <div class="hstack" style="margin-top:8px">
+      <input type="file" name="json_files" accept=".json,application/json" multiple>
+      <input type="file" name="ndjson_file" accept=".ndjson,.jsonl">
+      <button type="submit">Скачать ZIP с XML</button>
+    </div>
+  </form>
+
   {% if file_info %}
     <div class="row">
       <span class="badge">Файл загружен</span>
-      <span class="muted">Имя: <b>{{ file_info.name }}</b>, размер: <b>{{ file_info.size_h }}</b></span>
+      <span class="muted">Имя: <b>{{ file_info.name }}</b>, размер: <b>{{ file_info.size_h }}</b>{% if file_info.products is not none %}, товаров: <b>{{ file_info.products }}</b>{% endif %}</span>
     </div>
+    <div class="row hstack">
+      <label class="muted">Товар №</label>
+      <input type="text" id="prodOffset" inputmode="numeric" value="1" style="width:140px">
+      <button type="button" id="prodBtn">Показать 20 товаров</button>
+    </div>
+    <pre id="prodPage" class="pre" style="display:none"></pre>
   {% endif %}
 
   {% if message %}
@@ -79,7 +91,7 @@ HTML = """
 
   {% if core %}
     <!-- Одна большая форма: редактируемые поля + коды + имя файла + кнопки действия -->
-    <form method="POST">
+    <form method="POST" enctype="multipart/form-data">
       <div class="grid-form">
 
         <div class="stack">
@@ -143,10 +155,17 @@ HTML = """
             <h3>Коды</h3>
             <label class="muted">Коды (по одному в строку)</label>
             <textarea name="codes" placeholder="вставьте сюда коды (KI)…"></textarea>
+            <label class="muted">…или файл с кодами (.txt, по одному в строку) — для больших списков</label>
+            <input type="file" name="codes_file" accept=".txt,.csv,text/plain">
             <div class="muted" style="margin-top:8px">
               Для XML: всё после &lt;GT&gt; в коде отбрасывается (и сам маркер тоже).<br>
               Поддерживается <code>&lt;GS&gt;</code> → символ 0x1D.
             </div>
+            <div class="hstack" style="margin-top:10px">
+              <button type="submit" formaction="validate" id="validateBtn">Проверить коды</button>
+              <span class="muted">Дубли и структура GS1 (GTIN, AI).</span>
+            </div>
+            <pre id="validation" class="pre" style="display:none"></pre>
           </div>
 
         </div>
@@ -157,7 +176,21 @@ HTML = """
             <input type="text" name="fname" placeholder="например: introduce_2025-11-02">
             <button type="submit" formaction="download/json">Скачать JSON (ядро+шаблон)</button>
             <button type="submit" formaction="download/csv">Скачать CSV (коды)</button>
+            <label class="muted">Тип документа XML</label>
+            <select name="doc_type">
+              <option value="">авто (по production_type)</option>
+              {% for s in doc_types %}<option value="{{ s.name }}">{{ s.title or s.name }}</option>{% endfor %}
+            </select>
             <button type="submit" formaction="download/xml">Скачать XML (ввод в оборот)</button>
+            <label class="muted">Разбить XML на части (ZIP)</label>
+            <div class="grid2cols">
+              <input type="text" name="split_products" inputmode="numeric" placeholder="товаров в части">
+              <input type="text" name="split_mb" inputmode="numeric" placeholder="МБ в части">
+            </div>
+            <span class="muted">Пусто — один документ. Каждая часть получает свою шапку и хвост.</span>
+            <label class="muted"><input type="checkbox" name="validate" value="1"> Добавить в ZIP отчёт проверки кодов</label>
+            <button type="submit" formaction="jobs" id="jobBtn">Выгрузить XML в фоне</button>
+            <div id="jobStatus" class="muted"></div>
           </div>
         </div>
 
@@ -165,10 +198,13 @@ HTML = """
     </form>
   {% endif %}
 </div>
+<script src="{{ asset_url('services/json_inspector.js') }}"></script>
 </body>
 </html>
 """
 
+PAGE = InlineTemplate(HTML)
+
 # ---------- helpers ----------
 
 def _humansize(n: int) -> str:
@@ -180,22 +216,6 @@ def _humansize(n: int) -> str:
         i += 1
     return f"{val:.1f} {units[i]}"
 
-def _read_limited(file_storage, limit: Optional[int] = MAX_BYTES) -> bytes:
-    """
-    Читаем поток файла порциями. Если limit=None, лимит отключён.
-    """
-    total = 0
-    chunks = []
-    while True:
-        chunk = file_storage.stream.read(1024 * 1024)  # 1 МБ
-        if not chunk:
-            break
-        total += len(chunk)
-        if limit is not None and total > limit:
-            raise ValueError(f"Размер файла превышает лимит {limit} байт")
-        chunks.append(chunk)
-    return b"".join(chunks)
-
 def _coalesce_str(d: Dict[str, Any], key: str, default: str = "") -> str:
     v = d.get(key, default)
     if isinstance(v, str):
@@ -209,12 +229,31 @@ def _sanitize_fname(name: str, default: str = "export") -> str:
     """
     if not name:
         return default
-    name = re.sub(r'[\\/:*?"<>|\\r\\n\\t]+', "_", name)
+    name = re.sub(r'[\\/:*?"<>|\r\n\t]+', "_", name)
     name = name.strip(" .") or default
     if len(name) > 128:
         name = name[:128]
     return name
 
+def _file_info(path: Optional[str], name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    if not path or not os.path.exists(path):
+        return None
+    return {
+        "name": name or os.path.basename(path),
+        "size_h": _humansize(os.path.getsize(path)),
+        "products": json_index.count(path),
+    }
+
+def _form_int(form, key: str) -> Optional[int]:
+    """
+    Положительное целое из поля формы; пусто/мусор/≤0 → None.
+    """
+    try:
+        v = int((form.get(key) or "").strip())
+    except ValueError:
+        return None
+    return v if v > 0 else None
+
 def _extract_product_template(raw: Dict[str, Any], core_prod_date: str) -> Dict[str, str]:
     """
     Шаблон полей продукта:
@@ -257,22 +296,33 @@ def _normalize_core(raw: Dict[str, Any]) -> Dict[str, Any]:
         "production_type": _coalesce_str(raw, "production_type") or _coalesce_str(raw, "production_order") or "OWN_PRODUCTION",
     }
 
-def _parse_codes(text: str) -> Iterable[str]:
+def _iter_lines(text: str) -> Iterator[str]:
+    """
+    Строки текста по одной без копии всего списка. Делим только по \n:
+    str.splitlines() режет и по 0x1D (GS) — разделителю внутри кода маркировки.
+    """
+    pos = 0
+    n = len(text)
+    while pos < n:
+        end = text.find("\n", pos)
+        if end < 0:
+            end = n
+        yield text[pos:end]
+        pos = end + 1
+
+def _parse_codes(text: Union[str, Iterable[str]]) -> Iterable[str]:
     """
     Возвращает ИТЕРАТОР по кодам (без загрузки всех строк в память).
+    Принимает текст целиком или итератор строк (например, открытый файл).
     Поддержка <GS> → \x1D.
     Пустые строки пропускаются.
     """
     if not text:
         return []
-    for line in text.splitlines():
-        s = line.strip()
-        if not s:
-            continue
-        s = s.replace("<GS>", "\\x1D").replace("&lt;GS&gt;", "\\x1D")
-        # заменим текстовый маркер на реальный символ для внутренней обработки,
-        # он всё равно будет очищен для XML и заменён для CSV
-        yield s.replace("\\x1D", "\x1D")
+    lines = _iter_lines(text) if isinstance(text, str) else text
+    # текстовые маркеры → реальный символ для внутренней обработки,
+    # он всё равно будет очищен для XML и заменён для CSV
+    yield from normalize_codes(lines)
 
 _GT_SPLIT = re.compile(r"(?:<GT>|&lt;GT&gt;)")
 _GS_SPLIT = re.compile(r"(?:<GS>|&lt;GS&gt;|\x1D)")
@@ -297,75 +347,255 @@ def _xml_prepare_code(raw_code: str) -> str:
     s = s.replace("\x1D", "").replace("<GS>", "").replace("&lt;GS&gt;", "")
     return s
 
-def _csv_stream(codes_iter: Iterable[str]) -> Iterable[bytes]:
+def _csv_line(c: str) -> str:
+    c = (c or "")
+    c = c.replace("<GT>", "\x1D").replace("&lt;GT&gt;", "\x1D")
+    c = c.replace("\r", "")
+    return c + "\n"
+
+def _csv_render_shard(codes: List[str]) -> bytes:
+    """
+    Воркер-задача: шард кодов → CSV-строки без BOM.
+    """
+    return "".join(map(_csv_line, codes)).encode("utf-8")
+
+def _csv_stream(codes_iter: Iterable[str], workers: Optional[int] = None) -> Iterable[bytes]:
     """
     Стриминг CSV: одна колонка, одна строка на код.
     <GT>/&lt;GT&gt; → \x1D, хвост сохраняется (как и работало ранее).
+    При workers > 1 шарды форматируются в пуле процессов, порядок сохраняется.
     """
+    workers = EXPORT_WORKERS if workers is None else workers
+    codes_iter = metrics.count_iter(codes_iter, CODES_EXPORTED, format="csv")
+    if workers > 1:
+        first_yielded = False
+        for data in ordered_map(_csv_render_shard, shards(codes_iter), workers=workers):
+            if not data:
+                continue
+            if not first_yielded:
+                data = codecs.BOM_UTF8 + data
+                first_yielded = True
+            yield data
+        return
+
     first_yielded = False
     for c in codes_iter:
-        c = (c or "")
-        c = c.replace("<GT>", "\x1D").replace("&lt;GT&gt;", "\x1D")
-        c = c.replace("\r", "")
-        line = (c + "\n").encode("utf-8-sig") if not first_yielded else (c + "\n").encode("utf-8")
+        line = _csv_line(c)
+        line = line.encode("utf-8-sig") if not first_yielded else line.encode("utf-8")
         first_yielded = True
         yield line
 
-def _xml_stream(core: Dict[str, Any], prod: Dict[str, Any], codes_iter: Iterable[str]) -> Iterable[bytes]:
+def _xml_document_parts(core: Dict[str, Any], prod: Dict[str, Any],
+                        doc_type: Optional[str] = None) -> Tuple[bytes, Callable[[str], bytes], bytes]:
     """
-    Стриминг XML: не буферим весь документ.
+    Раскладка документа на части: (шапка, рендер одного товара, хвост).
+    Разметку задаёт схема из xml_schemas (по умолчанию — по production_type).
+    Рендер возвращает b"" для кодов, которые после подготовки оказались пустыми.
     """
-    is_contract = (core.get("production_type") == "CONTRACT_PRODUCTION")
-    tnved_code  = (prod.get("tnved_code") or "").strip()
-    cert_type   = (prod.get("certificate_type") or "CONFORMITY_DECLARATION").strip()
-    cert_num    = (prod.get("certificate_number") or "").strip()
-    cert_date   = (prod.get("certificate_date") or "").strip()
-    vsd_number  = (prod.get("vsd_number") or "").strip()
-    prod_date_fallback = (core.get("production_date") or "").strip()
-    per_item_prod_date = (prod.get("production_date") or prod_date_fallback or "").strip()
-
-    if is_contract:
-        head = [
-            '<introduce_contract version="7">',
-            f'  <producer_inn>{core.get("producer_inn","")}</producer_inn>',
-            f'  <owner_inn>{core.get("owner_inn","")}</owner_inn>',
-            f'  <production_date>{core.get("production_date","")}</production_date>',
-            f'  <production_order>{core.get("production_type","")}</production_order>',
-            '  <products_list>',
-        ]
-        tail = ['  </products_list>', '</introduce_contract>']
-    else:
-        head = [
-            '<introduce_rf version="9">',
-            f'  <trade_participant_inn>{core.get("producer_inn","")}</trade_participant_inn>',
-            f'  <producer_inn>{core.get("producer_inn","")}</producer_inn>',
-            f'  <owner_inn>{core.get("owner_inn","")}</owner_inn>',
-            f'  <production_date>{core.get("production_date","")}</production_date>',
-            f'  <production_order>{core.get("production_type","")}</production_order>',
-            '  <products_list>',
-        ]
-        tail = ['  </products_list>', '</introduce_rf>']
-
-    yield ("\n".join(head) + "\n").encode("utf-8")
-
-    for raw_code in codes_iter:
+    doc = xml_schemas.bind(core, prod, doc_type)
+    render_code = doc.render
+
+    def render(raw_code: str) -> bytes:
         code = _xml_prepare_code(raw_code)
         if not code:
+            return b""
+        return render_code(code)
+
+    return doc.head, render, doc.tail
+
+def _xml_render_shard(codes: List[str], core: Dict[str, Any], prod: Dict[str, Any],
+                      doc_type: Optional[str] = None) -> Tuple[bytes, array]:
+    """
+    Воркер-задача: шард кодов → (склеенные блоки <product>, длины блоков).
+    Длины нужны режиму разбиения, чтобы резать части по границам товаров.
+    """
+    _, render, _ = _xml_document_parts(core, prod, doc_type)
+    blocks = [b for b in map(render, codes) if b]
+    return b"".join(blocks), array("Q", map(len, blocks))
+
+def _xml_blocks(core: Dict[str, Any], prod: Dict[str, Any], codes_iter: Iterable[str],
+                workers: Optional[int] = None, doc_type: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Поток блоков <product> (по одному на непустой код) — последовательно
+    или из пула процессов, в исходном порядке.
+    """
+    workers = EXPORT_WORKERS if workers is None else workers
+    if workers <= 1:
+        _, render, _ = _xml_document_parts(core, prod, doc_type)
+        return (b for b in map(render, codes_iter) if b)
+
+    def gen() -> Iterator[bytes]:
+        for data, lengths in ordered_map(_xml_render_shard, shards(codes_iter), core, prod, doc_type, workers=workers):
+            mv = memoryview(data)
+            pos = 0
+            for n in lengths:
+                yield mv[pos:pos + n]
+                pos += n
+    return gen()
+
+def _xml_stream(core: Dict[str, Any], prod: Dict[str, Any], codes_iter: Iterable[str],
+                workers: Optional[int] = None, doc_type: Optional[str] = None) -> Iterable[bytes]:
+    """
+    Стриминг XML: не буферим весь документ.
+    При workers > 1 товары форматируются шардами в пуле процессов.
+    """
+    workers = EXPORT_WORKERS if workers is None else workers
+    head, render, tail = _xml_document_parts(core, prod, doc_type)
+    yield head
+    if workers > 1:
+        for data, _ in ordered_map(_xml_render_shard, shards(codes_iter), core, prod, doc_type, workers=workers):
+            if data:
+                yield data
+    else:
+        for raw_code in codes_iter:
+            block = render(raw_code)
+            if block:
+                yield block
+    yield tail
+
+def _xml_split_documents(core: Dict[str, Any], prod: Dict[str, Any], codes_iter: Iterable[str],
+                         max_products: Optional[int] = None,
+                         max_bytes: Optional[int] = None,
+                         workers: Optional[int] = None,
+                         doc_type: Optional[str] = None) -> Iterator[Iterator[bytes]]:
+    """
+    Режем выгрузку на самостоятельные документы: новый документ начинается
+    каждые max_products товаров или до превышения max_bytes (с учётом шапки и хвоста).
+    Каждая часть — генератор байтов со своей шапкой/хвостом.
+    Части делят один итератор кодов, поэтому потреблять их нужно строго
+    по очереди, дочитывая каждую до конца (так делает zip_stream).
+    """
+    head, _, tail = _xml_document_parts(core, prod, doc_type)
+    blocks = _xml_blocks(core, prod, codes_iter, workers, doc_type)
+    state = {"pending": next(blocks, None)}
+    overhead = len(head) + len(tail)
+
+    def part() -> Iterator[bytes]:
+        yield head
+        size, count = overhead, 0
+        block = state["pending"]
+        while block is not None:
+            if count and ((max_products and count >= max_products) or
+                          (max_bytes and size + len(block) > max_bytes)):
+                break
+            yield block
+            size += len(block)
+            count += 1
+            block = next(blocks, None)
+        state["pending"] = block
+        yield tail
+
+    # Первая часть есть всегда (пустой документ, если кодов нет)
+    yield part()
+    while state["pending"] is not None:
+        yield part()
+
+def _json_report_chunks(validator: CodeValidator) -> Iterator[bytes]:
+    yield json.dumps(validator.report(), ensure_ascii=False, indent=2).encode("utf-8")
+
+# --- пакетная конвертация: много JSON-документов → ZIP с XML на каждый ---
+
+DOC_CODE_KEYS = ("ki", "uit_code", "uitu_code", "cis")
+
+def _document_codes(raw: Dict[str, Any]) -> Iterator[str]:
+    """
+    Коды из товаров документа: первое непустое из ki/uit_code/uitu_code/cis.
+    """
+    products = raw.get("products")
+    if not (isinstance(products, list) and products):
+        products = raw.get("products_list")
+    for p in products if isinstance(products, list) else []:
+        if not isinstance(p, dict):
             continue
-        block = [
-            '    <product>',
-            f'      <ki><![CDATA[{code}]]></ki>',
-            f'      <production_date>{per_item_prod_date}</production_date>',
-            f'      <tnved_code>{tnved_code}</tnved_code>',
-            f'      <certificate_type>{cert_type or "CONFORMITY_DECLARATION"}</certificate_type>',
-            f'      <certificate_number>{cert_num}</certificate_number>',
-            f'      <certificate_date>{cert_date}</certificate_date>',
-            f'      <vsd_number>{vsd_number}</vsd_number>',
-            '    </product>',
-        ]
-        yield ("\n".join(block) + "\n").encode("utf-8")
-
-    yield ("\n".join(tail)).encode("utf-8")
+        for key in DOC_CODE_KEYS:
+            v = p.get(key)
+            if isinstance(v, str) and v.strip():
+                yield v
+                break
+
+def _document_xml(raw: Any) -> Iterator[bytes]:
+    """
+    Один исходный документ → XML той же нормализацией, что и при ручной загрузке.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("Ожидался JSON-объект (dict) на корне")
+    core = _normalize_core(raw)
+    prod = _extract_product_template(raw, core_prod_date=core.get("production_date", ""))
+    codes = metrics.count_iter(_parse_codes(_document_codes(raw)), CODES_EXPORTED, format="xml")
+    return _xml_stream(core, prod, codes, workers=1)
+
+def _lazy_document(load: Callable[[], Any]) -> Iterator[bytes]:
+    # документ читается и парсится только когда ZIP дошёл до его записи
+    yield from _document_xml(load())
+
+def _batch_sources(files: List[str], ndjson_files: List[str]) -> Iterator[Tuple[str, Callable[[], Any]]]:
+    """
+    Пары (базовое имя, загрузчик документа) — по одной на файл или строку NDJSON.
+    NDJSON читается построчно, без буферизации файла целиком.
+    """
+    for path in files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        def load(path=path):
+            with open(path, "rb") as fh:
+                return json.loads(fh.read().decode("utf-8"))
+        yield name, load
+    for path in ndjson_files:
+        base = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "rb") as fh:
+            for n, line in enumerate(fh, start=1):
+                line = line.strip()
+                if line:
+                    yield f"{base}_{n:06d}", (lambda line=line: json.loads(line.decode("utf-8")))
+
+def _spool_uploads(storages, tmp_dir: str) -> List[str]:
+    """
+    Загрузки сохраняются на диск до ответа: Flask закрывает файлы запроса,
+    как только view вернул Response, а ZIP стримится уже после этого.
+    """
+    paths = []
+    for f in storages:
+        name = _sanitize_fname(os.path.basename(f.filename or ""), "document")
+        # отдельный подкаталог на файл — исходные имена сохраняются и не конфликтуют
+        path = os.path.join(tempfile.mkdtemp(dir=tmp_dir), name)
+        f.save(path)
+        paths.append(path)
+    return paths
+
+def _request_codes() -> Tuple[Iterable[str], Optional[str]]:
+    """
+    Строки кодов запроса: из файла codes_file (если выбран) или из textarea.
+    Файл спулится на диск и читается построчно; второй элемент — каталог для уборки.
+    """
+    f = request.files.get("codes_file")
+    if f and f.filename:
+        tmp_dir = tempfile.mkdtemp(prefix="json_codes_")
+        path = _spool_uploads([f], tmp_dir)[0]
+        return _file_lines(path), tmp_dir
+    return _iter_lines(request.form.get("codes", "")), None
+
+def _file_lines(path: str) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8-sig", newline=None) as fh:
+        yield from fh
+
+def _batch_entries(sources: Iterable[Tuple[str, Callable[[], Any]]]) -> Iterator[Tuple[str, Iterable[bytes]]]:
+    """
+    Записи ZIP по документам; ошибка в одном документе → <имя>.error.txt вместо XML.
+    """
+    used: Dict[str, int] = {}
+    for name, load in sources:
+        name = _sanitize_fname(name, "document")
+        k = used.get(name, 0)
+        used[name] = k + 1
+        if k:
+            name = f"{name}_{k}"
+        try:
+            # шапку считаем сразу, чтобы ошибку разбора поймать до начала записи
+            chunks = _lazy_document(load)
+            first = next(chunks)
+        except Exception as e:
+            yield f"{name}.error.txt", [f"Ошибка: {e}\n".encode("utf-8")]
+            continue
+        yield f"{name}.xml", itertools.chain([first], chunks)
 
 def _build_core_from_form(form) -> Dict[str, Any]:
     return {
@@ -388,16 +618,16 @@ def _build_prod_from_form(form, core_prod_date: str) -> Dict[str, Any]:
 
 # ---------- маршруты ----------
 
+@bp.context_processor
+def _inject_doc_types():
+    return {"doc_types": list(xml_schemas.SCHEMAS.values())}
+
 @bp.route("/", methods=["GET"])
 def page():
-    info = None
-    path = session.get(SESSION_PATH)
-    if path and os.path.exists(path):
-        info = {"name": os.path.basename(path), "size_h": _humansize(os.path.getsize(path))}
+    info = _file_info(session.get(SESSION_PATH))
     core = session.get(SESSION_CORE)
     prod = session.get(SESSION_PROD) or {}
-    return render_template_string(
-        HTML,
+    return PAGE.render(
         file_info=info,
         message=None,
         ok=False,
@@ -407,6 +637,7 @@ def page():
     )
 
 @bp.route("/upload", methods=["POST"])
+@admission.heavy(admission.controller)
 def upload():
     """
     Загружаем файл, проверяем тип, ПАРСИМ СРАЗУ:
@@ -421,46 +652,59 @@ def upload():
 
     if not f:
         message = "Файл не выбран"
-        return render_template_string(HTML, file_info=None, message=message, ok=ok, core=session.get(SESSION_CORE), prod=session.get(SESSION_PROD) or {}, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+        return PAGE.render(file_info=None, message=message, ok=ok, core=session.get(SESSION_CORE), prod=session.get(SESSION_PROD) or {}, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
 
     filename = (f.filename or "").lower()
     mimetype = (f.mimetype or "").lower()
     if not (filename.endswith(".json") or "json" in mimetype):
         message = "Можно загрузить только JSON (.json)"
-        return render_template_string(HTML, file_info=None, message=message, ok=ok, core=session.get(SESSION_CORE), prod=session.get(SESSION_PROD) or {}, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+        return PAGE.render(file_info=None, message=message, ok=ok, core=session.get(SESSION_CORE), prod=session.get(SESSION_PROD) or {}, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
 
     try:
-        data_bytes = _read_limited(f, MAX_BYTES)
+        spool_path, digest, size = upload_cache.spool(f.stream, MAX_BYTES)
     except Exception as e:
         message = f"Ошибка чтения файла: {e}"
-        return render_template_string(HTML, file_info=None, message=message, ok=ok, core=session.get(SESSION_CORE), prod=session.get(SESSION_PROD) or {}, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+        return PAGE.render(file_info=None, message=message, ok=ok, core=session.get(SESSION_CORE), prod=session.get(SESSION_PROD) or {}, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+
+    # То же содержимое уже разбирали — берём core/prod из кэша, файл не парсим
+    cached = upload_cache.lookup(digest)
+    if cached is not None:
+        os.unlink(spool_path)
+        core, prod = cached["core"], cached["prod"]
+        session[SESSION_CORE] = core
+        session[SESSION_PROD] = prod
+        session[SESSION_PATH] = cached["path"]
+        session.modified = True
+        json_index.ensure(cached["path"])
+        info = _file_info(cached["path"], os.path.basename(filename or "file.json"))
+        message = "Файл загружен (уже разбирался ранее — данные взяты из кэша)"
+        return PAGE.render(file_info=info, message=message, ok=True, core=core, prod=prod, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
 
     try:
-        text = data_bytes.decode("utf-8", errors="strict")
+        with open(spool_path, "rb") as fh:
+            text = fh.read().decode("utf-8", errors="strict")
         raw = json.loads(text)
+        del text
         if not isinstance(raw, dict):
             raise ValueError("Ожидался JSON-объект (dict) на корне")
 
         core = _normalize_core(raw)
         prod = _extract_product_template(raw, core_prod_date=core.get("production_date",""))
+        del raw
 
         session[SESSION_CORE] = core
         session[SESSION_PROD] = prod
+        path = upload_cache.store(digest, spool_path, core, prod)
+        session[SESSION_PATH] = path
         session.modified = True
-
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as tmp:
-                tmp.write(data_bytes)
-                tmp_path = tmp.name
-            session[SESSION_PATH] = tmp_path
-        except Exception:
-            pass
+        # индекс смещений товаров — пока файл горячий в page cache
+        json_index.build(path)
+        info = _file_info(path, os.path.basename(filename or "file.json"))
 
         ok = True
-        info = {"name": os.path.basename(filename or "file.json"), "size_h": _humansize(len(data_bytes))}
         message = "Файл загружен и распарсен"
 
-        return render_template_string(HTML, file_info=info, message=message, ok=ok, core=core, prod=prod, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+        return PAGE.render(file_info=info, message=message, ok=ok, core=core, prod=prod, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
     except UnicodeDecodeError:
         message = "Файл не в UTF-8 или содержит некорректные байты"
     except json.JSONDecodeError as e:
@@ -468,7 +712,9 @@ def upload():
     except Exception as e:
         message = f"Ошибка парсинга: {e}"
 
-    return render_template_string(HTML, file_info=None, message=message, ok=False, core=None, prod=None, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+    if os.path.exists(spool_path):
+        os.unlink(spool_path)
+    return PAGE.render(file_info=None, message=message, ok=False, core=None, prod=None, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
 
 @bp.route("/update", methods=["POST"])
 def update_data():
@@ -482,13 +728,9 @@ def update_data():
     session[SESSION_PROD] = prod_form
     session.modified = True
 
-    info = None
-    path = session.get(SESSION_PATH)
-    if path and os.path.exists(path):
-        info = {"name": os.path.basename(path), "size_h": _humansize(os.path.getsize(path))}
+    info = _file_info(session.get(SESSION_PATH))
 
-    return render_template_string(
-        HTML,
+    return PAGE.render(
         file_info=info,
         message="Данные обновлены",
         ok=True,
@@ -518,38 +760,190 @@ def download_json():
     )
 
 @bp.route("/download/csv", methods=["POST"])
+@admission.heavy(admission.controller)
 def download_csv():
-    codes_iter = _parse_codes(request.form.get("codes", ""))
+    lines, tmp_dir = _request_codes()
     fname = _sanitize_fname(request.form.get("fname", "") or "codes")
-    generator = _csv_stream(codes_iter)
+    generator = _csv_stream(_parse_codes(lines))
     # Первая строка отдаётся UTF-8-SIG для BOM совместимости с Excel
-    return Response(
+    return remove_on_close(Response(
         stream_with_context(generator),
-        mimetype="text/csv; charset=utf-8",
+        mimetype="text/csv",
         headers={"Content-Disposition": f'attachment; filename="{fname}.csv"'}
-    )
+    ), tmp_dir)
 
-@bp.route("/download/xml", methods=["POST"])
-def download_xml():
+def _xml_export_options(form) -> Dict[str, Any]:
+    split_mb = _form_int(form, "split_mb")
+    return {
+        "split_products": _form_int(form, "split_products"),
+        "split_bytes": split_mb * 1024 * 1024 if split_mb else None,
+        "validate": bool(form.get("validate")),
+        "doc_type": (form.get("doc_type") or "").strip() or None,
+    }
+
+def _xml_export_target(fname: str, split_products: Optional[int] = None,
+                       split_bytes: Optional[int] = None, **_: Any) -> Tuple[str, str]:
+    if split_products or split_bytes:
+        return f"{fname}.zip", "application/zip"
+    return f"{fname}.xml", "application/xml; charset=utf-8"
+
+def _xml_export(core: Dict[str, Any], prod: Dict[str, Any], fname: str, codes_iter: Iterable[str],
+                split_products: Optional[int] = None, split_bytes: Optional[int] = None,
+                validate: bool = False, doc_type: Optional[str] = None) -> Tuple[Iterable[bytes], str, str]:
+    """
+    Генератор XML-выгрузки → (поток байтов, имя файла, mimetype).
+    Режим разбиения (N товаров и/или M байт на документ) отдаёт ZIP из частей.
+    """
+    download_name, mimetype = _xml_export_target(fname, split_products, split_bytes)
+    codes_iter = metrics.count_iter(codes_iter, CODES_EXPORTED, format="xml")
+    if not (split_products or split_bytes):
+        return _xml_stream(core, prod, codes_iter, doc_type=doc_type), download_name, mimetype
+
+    validator = CodeValidator() if validate else None
+    if validator is not None:
+        codes_iter = validator.wrap(codes_iter)
+    parts = _xml_split_documents(core, prod, codes_iter, split_products, split_bytes, doc_type=doc_type)
+    entries = ((f"{fname}_{i:04d}.xml", part) for i, part in enumerate(parts, start=1))
+    if validator is not None:
+        # Отчёт — последней записью архива, когда все коды уже прошли через валидатор
+        entries = itertools.chain(entries, [("validation.json", _json_report_chunks(validator))])
+    return zip_stream(entries), download_name, mimetype
+
+def _export_core_prod(form) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
     # core/prod из формы (приоритет) или из сессии
-    core = _build_core_from_form(request.form)
+    core = _build_core_from_form(form)
     if not any(core.values()):
         core = session.get(SESSION_CORE)
-    prod = _build_prod_from_form(request.form, (core or {}).get("production_date","") if core else "")
+    prod = _build_prod_from_form(form, (core or {}).get("production_date","") if core else "")
     if not any(prod.values()):
         prod = session.get(SESSION_PROD) or {}
+    return core, prod
 
+@bp.route("/download/xml", methods=["POST"])
+@admission.heavy(admission.controller)
+def download_xml():
+    core, prod = _export_core_prod(request.form)
     if not core:
-        return render_template_string(HTML, file_info=None, message="Нет данных: загрузите JSON или заполните поля", ok=False, core=None, prod=None, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+        return PAGE.render(file_info=None, message="Нет данных: загрузите JSON или заполните поля", ok=False, core=None, prod=None, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+
+    opts = _xml_export_options(request.form)
+    if opts["doc_type"] and opts["doc_type"] not in xml_schemas.SCHEMAS:
+        return PAGE.render(file_info=None, message=f"Неизвестный тип документа: {opts['doc_type']}", ok=False, core=core, prod=prod, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
 
-    codes_iter = _parse_codes(request.form.get("codes", ""))
+    lines, tmp_dir = _request_codes()
     fname = _sanitize_fname(request.form.get("fname", "") or "introduce")
-    generator = _xml_stream(core, prod or {}, codes_iter)
-    return Response(
+    generator, download_name, mimetype = _xml_export(core, prod or {}, fname, _parse_codes(lines), **opts)
+    return remove_on_close(Response(
         stream_with_context(generator),
-        mimetype="application/xml; charset=utf-8",
-        headers={"Content-Disposition": f'attachment; filename="{fname}.xml"'}
-    )
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{download_name}"'}
+    ), tmp_dir)
+
+# --- фоновые выгрузки: очередь → файл на диске → скачивание с докачкой (Range) ---
+
+@bp.route("/jobs", methods=["POST"])
+@admission.heavy(admission.controller)
+def job_submit():
+    kind = request.form.get("kind", "xml")
+    if kind == "csv":
+        fname = _sanitize_fname(request.form.get("fname", "") or "codes")
+        build = lambda lines: _csv_stream(_parse_codes(lines))
+        download_name, mimetype, meta = f"{fname}.csv", "text/csv", None
+    else:
+        core, prod = _export_core_prod(request.form)
+        if not core:
+            return jsonify({"error": "Нет данных: загрузите JSON или заполните поля"}), 400
+        fname = _sanitize_fname(request.form.get("fname", "") or "introduce")
+        opts = _xml_export_options(request.form)
+        if opts["doc_type"] and opts["doc_type"] not in xml_schemas.SCHEMAS:
+            return jsonify({"error": f"Неизвестный тип документа: {opts['doc_type']}"}), 400
+        download_name, mimetype = _xml_export_target(fname, **opts)
+        build = lambda lines: _xml_export(core, prod or {}, fname, _parse_codes(lines), **opts)[0]
+        meta = {"kind": "xml", **opts}
+    lines, tmp_dir = _request_codes()
+    try:
+        job_id = export_jobs.submit(lines, build, download_name, mimetype, meta=meta)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return jsonify({"id": job_id, "status_url": f"jobs/{job_id}", "download_url": f"jobs/{job_id}/download"}), 202
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    state = export_jobs.status(job_id)
+    if state is None:
+        return jsonify({"error": "Задача не найдена"}), 404
+    return jsonify(state)
+
+@bp.route("/jobs/<job_id>/download", methods=["GET"])
+def job_download(job_id: str):
+    path = export_jobs.artifact_path(job_id)
+    state = export_jobs.status(job_id)
+    if path is None or state is None:
+        return jsonify({"error": "Файл ещё не готов или задача не найдена"}), 404
+    # conditional=True: ETag/Last-Modified и Range → 206 для докачки
+    return send_file(path, mimetype=state["mimetype"], as_attachment=True,
+                     download_name=state["download_name"], conditional=True)
+
+@bp.route("/batch", methods=["POST"])
+@admission.heavy(admission.controller)
+def batch():
+    """
+    Пакетный режим: несколько JSON-файлов и/или NDJSON → один ZIP, по XML на документ.
+    Документы обрабатываются конвейером по одному, память не растёт с их числом.
+    """
+    files = [f for f in request.files.getlist("json_files") if f and f.filename]
+    ndjson_files = [f for f in request.files.getlist("ndjson_file") if f and f.filename]
+    if not files and not ndjson_files:
+        return PAGE.render(file_info=None, message="Не выбраны файлы для пакетной конвертации", ok=False, core=session.get(SESSION_CORE), prod=session.get(SESSION_PROD) or {}, max_mb=None if MAX_BYTES is None else MAX_BYTES // (1024*1024))
+    fname = _sanitize_fname(request.form.get("fname", "") or "batch")
+    tmp_dir = tempfile.mkdtemp(prefix="json_batch_")
+    try:
+        sources = _batch_sources(_spool_uploads(files, tmp_dir), _spool_uploads(ndjson_files, tmp_dir))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return remove_on_close(Response(
+        zip_stream(_batch_entries(sources)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{fname}.zip"'}
+    ), tmp_dir)
+
+@bp.route("/products", methods=["GET"])
+def products_page():
+    """
+    Страница товаров загруженного файла по индексу смещений: ?offset=&limit=
+    """
+    path = session.get(SESSION_PATH)
+    if not path or not os.path.exists(path):
+        return jsonify({"error": "Файл не загружен"}), 404
+    offset = request.args.get("offset", 0, type=int)
+    limit = min(request.args.get("limit", 20, type=int), 500)
+    total, items = json_index.read_page(path, offset, limit)
+    return jsonify({"total": total, "offset": offset, "items": items})
+
+@bp.route("/validate", methods=["POST"])
+@admission.heavy(admission.controller)
+def validate():
+    """
+    Проверка кодов до выгрузки: дубли + структура GS1 (GTIN, AI). Ответ — JSON-отчёт.
+    """
+    lines, tmp_dir = _request_codes()
+    try:
+        # фильтр Блума — по размеру запроса, а не на «максимальный» поток
+        expected = (request.content_length or 0) // MIN_CODE_BYTES + 1
+        return jsonify(validate_codes(_parse_codes(lines), bloom=bool(request.form.get("bloom")),
+                                      expected_items=expected))
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+@bp.route("/admission", methods=["GET"])
+def admission_stats():
+    """
+    Метрики контроля допуска: активные запросы, байты в работе, глубина очереди, ожидание.
+    """
+    return jsonify(admission.controller.snapshot())
 
 # экспорт сервиса
 service = ServiceBase(
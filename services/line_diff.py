@@ -0,0 +1,364 @@
+from __future__ import annotations
+import bisect
+import os
+import tempfile
+from collections import deque
+from difflib import SequenceMatcher
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Построчный diff больших файлов в ограниченной памяти.
+# Строки сравниваются по 64-битным хешам (текст в памяти не держится): хеши идут
+# потоком, общий префикс проматывается без накопления, расхождения разбираются
+# окнами по WINDOW_LINES строк с каждой стороны алгоритмом patience (якоря —
+# строки, уникальные в обоих окнах; участки без якорей — SequenceMatcher, если малы).
+# Окно разбирается до последнего совпавшего блока, хвост переносится в следующее.
+# Текст строк для отчёта читается вторым последовательным проходом по файлам —
+# порядок вывода совпадает с порядком строк, так что seek не нужен.
+# Совпадение хешей считается совпадением строк (вероятность коллизии ~ n²/2⁶⁴).
+
+# ---------- конфиг ----------
+WINDOW_LINES = int(os.environ.get("DIFF_WINDOW_LINES", "100000") or 100000)
+CONTEXT_LINES = 3
+FALLBACK_MAX_CELLS = 1_000_000          # SequenceMatcher — только на участках до N×M строк
+HUNK_SPOOL_BYTES = 4 * 1024 * 1024      # ханк больше — уходит во временный файл
+READ_BUF = 1024 * 1024
+EQUAL_REPORT_EVERY = 1_000_000          # длинное совпадение отдаётся частями (прогресс)
+
+Op = Tuple[str, int]                    # ("equal" | "delete" | "insert", число строк)
+Block = Tuple[int, int, int]            # (позиция в A, позиция в B, длина)
+
+_END = object()
+
+
+def _normalize(line: bytes, ignore_space: bool) -> bytes:
+    # строка сравнивается вместе с концом строки: CRLF ≠ LF, нет \n в конце файла ≠ есть
+    return b" ".join(line.split()) if ignore_space else line
+
+
+def line_hashes(path: str, ignore_space: bool = False,
+                progress: Optional[Callable[[int], None]] = None) -> Iterator[int]:
+    """
+    Хеши строк файла по порядку; progress(прочитано_байт_с_прошлого_вызова) — примерно раз в мегабайт.
+    """
+    pending = 0
+    with open(path, "rb", buffering=READ_BUF) as f:
+        for line in f:
+            pending += len(line)
+            if progress is not None and pending >= READ_BUF:
+                progress(pending)
+                pending = 0
+            yield hash(_normalize(line, ignore_space))
+    if progress is not None and pending:
+        progress(pending)
+
+
+# ---------- сопоставление внутри окна ----------
+
+def _unique_anchors(a: List[int], alo: int, ahi: int, b: List[int], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """Пары строк, уникальных в обеих половинах, — по наибольшей возрастающей подпоследовательности."""
+    ua: Dict[int, int] = {}
+    for i in range(alo, ahi):
+        h = a[i]
+        ua[h] = -1 if h in ua else i
+    ub: Dict[int, int] = {}
+    for j in range(blo, bhi):
+        h = b[j]
+        if ua.get(h, -1) >= 0:
+            ub[h] = -1 if h in ub else j
+    pairs = sorted((ua[h], j) for h, j in ub.items() if j >= 0)
+    if not pairs:
+        return []
+    # patience sorting: tails[k] — наименьший конец возрастающей цепочки длины k+1
+    tails: List[int] = []
+    tails_at: List[int] = []
+    prev = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        p = bisect.bisect_left(tails, j)
+        if p == len(tails):
+            tails.append(j)
+            tails_at.append(k)
+        else:
+            tails[p] = j
+            tails_at[p] = k
+        prev[k] = tails_at[p - 1] if p else -1
+    out = []
+    k = tails_at[-1]
+    while k >= 0:
+        out.append(pairs[k])
+        k = prev[k]
+    out.reverse()
+    return out
+
+
+def matching_blocks(a: List[int], b: List[int]) -> List[Block]:
+    """
+    Совпадающие блоки (i, j, n) по возрастанию i и j — patience diff без рекурсии.
+    """
+    found: List[Block] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        n = 0
+        while alo + n < ahi and blo + n < bhi and a[alo + n] == b[blo + n]:
+            n += 1
+        if n:
+            found.append((alo, blo, n))
+            alo += n
+            blo += n
+        n = 0
+        while alo < ahi - n and blo < bhi - n and a[ahi - n - 1] == b[bhi - n - 1]:
+            n += 1
+        if n:
+            found.append((ahi - n, bhi - n, n))
+            ahi -= n
+            bhi -= n
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            i0, j0 = alo, blo
+            for i, j in anchors:
+                found.append((i, j, 1))
+                if i > i0 and j > j0:
+                    stack.append((i0, i, j0, j))
+                i0, j0 = i + 1, j + 1
+            if i0 < ahi and j0 < bhi:
+                stack.append((i0, ahi, j0, bhi))
+        elif (ahi - alo) * (bhi - blo) <= FALLBACK_MAX_CELLS:
+            sm = SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            found.extend((alo + i, blo + j, k) for i, j, k in sm.get_matching_blocks() if k)
+    found.sort()
+    merged: List[Block] = []
+    for i, j, n in found:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            pi, pj, pn = merged[-1]
+            merged[-1] = (pi, pj, pn + n)
+        else:
+            merged.append((i, j, n))
+    return merged
+
+
+def _ops_for(blocks: List[Block], a_len: int, b_len: int) -> Iterator[Op]:
+    ia = ib = 0
+    for i, j, n in blocks:
+        if i > ia:
+            yield "delete", i - ia
+        if j > ib:
+            yield "insert", j - ib
+        yield "equal", n
+        ia, ib = i + n, j + n
+    if a_len > ia:
+        yield "delete", a_len - ia
+    if b_len > ib:
+        yield "insert", b_len - ib
+
+
+def diff_ops(ha: Iterator[int], hb: Iterator[int], window: int = WINDOW_LINES) -> Iterator[Op]:
+    """
+    Поток операций по двум потокам хешей строк; в памяти — не больше window хешей с каждой стороны.
+    """
+    a: List[int] = []
+    b: List[int] = []
+    a_eof = b_eof = False
+    while True:
+        if not a and not b and not (a_eof or b_eof):
+            # общий участок — потоком, без окон
+            n = 0
+            while True:
+                x = next(ha, _END)
+                y = next(hb, _END)
+                if x is _END or y is _END or x != y:
+                    break
+                n += 1
+                if n == EQUAL_REPORT_EVERY:
+                    yield "equal", n
+                    n = 0
+            if n:
+                yield "equal", n
+            if x is _END:
+                a_eof = True
+            else:
+                a.append(x)
+            if y is _END:
+                b_eof = True
+            else:
+                b.append(y)
+        if not a_eof and len(a) < window:
+            a.extend(_take(ha, window - len(a)))
+            a_eof = len(a) < window
+        if not b_eof and len(b) < window:
+            b.extend(_take(hb, window - len(b)))
+            b_eof = len(b) < window
+        if not a and not b:
+            return
+
+        blocks = matching_blocks(a, b)
+        if a_eof and b_eof:
+            yield from _ops_for(blocks, len(a), len(b))
+            return
+        if blocks:
+            # до конца последнего совпадения всё решено; дальше может найтись лучшая пара
+            i, j, n = blocks[-1]
+            cut_a, cut_b = i + n, j + n
+            yield from _ops_for(blocks, cut_a, cut_b)
+        elif len(b) >= window > len(a):
+            # в целом окне B нет ни одной строки из A — окно B вставлено целиком
+            cut_a, cut_b = 0, len(b)
+            yield "insert", cut_b
+        elif len(a) >= window > len(b):
+            cut_a, cut_b = len(a), 0
+            yield "delete", cut_a
+        else:
+            # оба окна полные и общих строк нет — замена целиком (не минимально, но верно)
+            cut_a, cut_b = len(a), len(b)
+            yield "delete", cut_a
+            yield "insert", cut_b
+        del a[:cut_a]
+        del b[:cut_b]
+
+
+def _take(it: Iterator[int], n: int) -> List[int]:
+    out = []
+    for x in it:
+        out.append(x)
+        if len(out) >= n:
+            break
+    return out
+
+
+# ---------- unified diff ----------
+
+def _coalesce(ops: Iterator[Op]) -> Iterator[Op]:
+    # соседние операции одного вида (стык окон) — одной; совпадения — не длиннее EQUAL_REPORT_EVERY
+    tag, n = None, 0
+    for t, k in ops:
+        if t == tag and not (t == "equal" and n >= EQUAL_REPORT_EVERY):
+            n += k
+            continue
+        if tag is not None:
+            yield tag, n
+        tag, n = t, k
+    if tag is not None:
+        yield tag, n
+
+def _format_range(start: int, length: int) -> str:
+    # как в GNU diff: «N» для одной строки, «N-1,0» для пустого диапазона
+    beginning = start + 1
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+class _Hunk:
+    def __init__(self, a_start: int, b_start: int):
+        self.a_start, self.b_start = a_start, b_start
+        self.a_len = self.b_len = 0
+        self.buf = tempfile.SpooledTemporaryFile(max_size=HUNK_SPOOL_BYTES)
+
+    def add(self, prefix: bytes, line: bytes) -> None:
+        # строка — как в файле (с \r, если он был); последняя без \n — с пометкой, как у diff -u
+        if line.endswith(b"\n"):
+            self.buf.write(prefix + line)
+        else:
+            self.buf.write(prefix + line + b"\n\\ No newline at end of file\n")
+
+    def chunks(self) -> Iterator[bytes]:
+        try:
+            yield (f"@@ -{_format_range(self.a_start, self.a_len)} "
+                   f"+{_format_range(self.b_start, self.b_len)} @@\n").encode("ascii")
+            self.buf.seek(0)
+            while True:
+                chunk = self.buf.read(READ_BUF)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.buf.close()
+
+
+def format_unified(ops: Iterator[Op], fa: BinaryIO, fb: BinaryIO, label_a: str, label_b: str,
+                   context: int = CONTEXT_LINES, stats: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    """
+    Операции → байты unified diff. Текст строк читается из fa/fb последовательно.
+    Пустые чанки отдаются на длинных совпадениях — чтобы потребитель мог отметить прогресс.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(hunks=0, added=0, removed=0)
+    ops = _coalesce(ops)
+    nxt = next(ops, None)
+    ctx: Deque[bytes] = deque(maxlen=context)
+    a_pos = b_pos = 0
+    hunk: Optional[_Hunk] = None
+    header = (f"--- {label_a}\n+++ {label_b}\n").encode("utf-8")
+
+    while nxt is not None:
+        (tag, n), nxt = nxt, next(ops, None)
+        if tag == "equal":
+            if hunk is not None:
+                keep = n if nxt is not None and n <= 2 * context else min(n, context)
+                for _ in range(keep):
+                    hunk.add(b" ", fa.readline())
+                    fb.readline()
+                hunk.a_len += keep
+                hunk.b_len += keep
+                a_pos += keep
+                b_pos += keep
+                n -= keep
+                if n or nxt is None:
+                    stats["hunks"] += 1
+                    if header:
+                        yield header
+                        header = b""
+                    yield from hunk.chunks()
+                    hunk = None
+                ctx.clear()
+            for i in range(n):
+                line = fa.readline()
+                fb.readline()
+                if n - i <= context:
+                    ctx.append(line)
+            a_pos += n
+            b_pos += n
+            if n:
+                yield b""
+            continue
+
+        if hunk is None:
+            hunk = _Hunk(a_pos - len(ctx), b_pos - len(ctx))
+            for line in ctx:
+                hunk.add(b" ", line)
+            hunk.a_len = hunk.b_len = len(ctx)
+            ctx.clear()
+        if tag == "delete":
+            for _ in range(n):
+                hunk.add(b"-", fa.readline())
+            hunk.a_len += n
+            a_pos += n
+            stats["removed"] += n
+        else:
+            for _ in range(n):
+                hunk.add(b"+", fb.readline())
+            hunk.b_len += n
+            b_pos += n
+            stats["added"] += n
+
+    if hunk is not None:
+        stats["hunks"] += 1
+        if header:
+            yield header
+        yield from hunk.chunks()
+
+
+def unified_diff(path_a: str, path_b: str, label_a: str = "a", label_b: str = "b",
+                 context: int = CONTEXT_LINES, ignore_space: bool = False, window: int = WINDOW_LINES,
+                 progress: Optional[Callable[[int], None]] = None,
+                 stats: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    """
+    Unified diff двух файлов потоком байтов; progress(байт) — по мере чтения обоих файлов.
+    Одинаковые файлы — пустой вывод (как у diff -u).
+    """
+    ops = diff_ops(line_hashes(path_a, ignore_space, progress), line_hashes(path_b, ignore_space, progress), window)
+    with open(path_a, "rb", buffering=READ_BUF) as fa, open(path_b, "rb", buffering=READ_BUF) as fb:
+        yield from format_unified(ops, fa, fb, label_a, label_b, context, stats)
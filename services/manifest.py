@@ -0,0 +1,107 @@
+from __future__ import annotations
+import ast
+import importlib
+import os
+import pathlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Манифест сервисов без импорта модулей: метаданные берутся из AST присваивания
+# `service = ServiceBase(id=..., name=..., ...)` на верхнем уровне модуля.
+# Модуль (и его зависимости — psycopg2, template_store и т.п.) импортируется
+# только когда сервис реально нужен.
+
+SERVICES_DIR = pathlib.Path(__file__).resolve().parent
+SKIP_MODULES = {"base", "manifest", "__init__"}
+_FIELDS = ("id", "name", "description", "icon")
+
+
+@dataclass(frozen=True)
+class ServiceInfo:
+    id: str
+    name: str
+    description: str
+    module: str                 # имя модуля в пакете services
+    icon: str = "🧩"
+    has_blueprint: bool = False
+
+    @property
+    def path(self) -> Optional[str]:
+        return f"/services/{self.id}" if self.has_blueprint else None
+
+
+def _service_call(tree: ast.Module) -> Optional[ast.Call]:
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or not isinstance(node.value, ast.Call):
+            continue
+        if not any(isinstance(t, ast.Name) and t.id == "service" for t in node.targets):
+            continue
+        func = node.value.func
+        name = func.id if isinstance(func, ast.Name) else getattr(func, "attr", None)
+        if name == "ServiceBase":
+            return node.value
+    return None
+
+
+def _from_ast(module: str, source: str) -> Optional[ServiceInfo]:
+    """
+    ServiceInfo из исходника; None — сервиса нет или метаданные не литералы.
+    """
+    call = _service_call(ast.parse(source))
+    if call is None or call.args:
+        return None
+    kwargs: Dict[str, object] = {}
+    has_blueprint = False
+    for kw in call.keywords:
+        if kw.arg == "blueprint":
+            has_blueprint = not (isinstance(kw.value, ast.Constant) and kw.value.value is None)
+        elif kw.arg in _FIELDS:
+            if not isinstance(kw.value, ast.Constant) or not isinstance(kw.value.value, str):
+                return None
+            kwargs[kw.arg] = kw.value.value
+    if not all(k in kwargs for k in ("id", "name", "description")):
+        return None
+    return ServiceInfo(module=module, has_blueprint=has_blueprint, **kwargs)
+
+
+def _from_import(module: str) -> Optional[ServiceInfo]:
+    # фолбэк для сервисов с вычисляемыми метаданными
+    from .base import ServiceBase
+    svc = getattr(importlib.import_module(f"services.{module}"), "service", None)
+    if not isinstance(svc, ServiceBase):
+        return None
+    return ServiceInfo(id=svc.id, name=svc.name, description=svc.description, icon=svc.icon,
+                       module=module, has_blueprint=svc.blueprint is not None)
+
+
+def discover(services_dir: pathlib.Path = SERVICES_DIR, allow: Optional[List[str]] = None) -> List[ServiceInfo]:
+    """
+    Сервисы из services/*.py, отсортированные по имени. allow — список id (None — все).
+    """
+    found: List[ServiceInfo] = []
+    for entry in sorted(os.listdir(services_dir)):
+        module, ext = os.path.splitext(entry)
+        if ext != ".py" or module in SKIP_MODULES:
+            continue
+        with open(services_dir / entry, "r", encoding="utf-8") as f:
+            source = f.read()
+        if "ServiceBase(" not in source:
+            continue
+        info = _from_ast(module, source)
+        if info is None and "\nservice = " in source:
+            info = _from_import(module)
+        if info is not None and (allow is None or info.id in allow):
+            found.append(info)
+    found.sort(key=lambda s: s.name.lower())
+    return found
+
+
+def load_service(info: ServiceInfo):
+    """
+    Импортирует модуль сервиса и возвращает его ServiceBase.
+    """
+    from .base import ServiceBase
+    svc = getattr(importlib.import_module(f"services.{info.module}"), "service", None)
+    if not isinstance(svc, ServiceBase) or svc.id != info.id:
+        raise RuntimeError(f"services.{info.module}: сервис {info.id!r} не найден после импорта")
+    return svc
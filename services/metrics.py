@@ -0,0 +1,338 @@
+from __future__ import annotations
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+# Метрики в текстовом формате Prometheus без внешних зависимостей.
+# Счётчики и гистограммы с метками живут в памяти процесса; инкремент — словарь
+# под одной блокировкой, так что их можно держать включёнными в продакшене.
+# Несколько воркеров gunicorn: при METRICS_DIR каждый процесс раз в METRICS_FLUSH_SEC
+# сбрасывает снимок в <METRICS_DIR>/<pid>.json, а /metrics суммирует все снимки.
+
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+FLUSH_SEC = float(os.environ.get("METRICS_FLUSH_SEC", "5") or 5)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = (1024, 16 * 1024, 128 * 1024, 1024 ** 2, 16 * 1024 ** 2, 128 * 1024 ** 2, 1024 ** 3)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(k, "")) for k in self.labels)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # метки → [счётчики по корзинам (последняя — +Inf), сумма]
+        self._values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            slot = self._values.get(key)
+            if slot is None:
+                slot = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            slot[0][i] += 1
+            slot[1] += value
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return {k: [list(v[0]), v[1]] for k, v in self._values.items()}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args: Any, **kwargs: Any):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets)
+
+    def add_collector(self, fn: Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]) -> None:
+        """
+        fn() → [(имя, тип, help, метки, значение)] — снимается в момент запроса /metrics (gauge и т.п.).
+        """
+        self._collectors.append(fn)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: {"kind": m.kind, "help": m.help, "labels": list(m.labels),
+                         "buckets": list(getattr(m, "buckets", ())),
+                         "values": [[list(k), v] for k, v in m.snapshot().items()]}
+                for m in metrics}
+
+    def render(self) -> str:
+        snap = _merge([self.snapshot()] + _read_peer_snapshots())
+        out: List[str] = []
+        for name in sorted(snap):
+            _render_metric(out, name, snap[name])
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception:
+                continue
+            seen = set()
+            for name, kind, help, labels, value in samples:
+                if name not in seen:
+                    out.append(f"# HELP {name} {help}")
+                    out.append(f"# TYPE {name} {kind}")
+                    seen.add(name)
+                out.append(f"{name}{_fmt_labels(labels.keys(), labels.values())} {_fmt_value(value)}")
+        return "\n".join(out) + "\n"
+
+
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Iterable[str], values: Iterable[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _render_metric(out: List[str], name: str, m: Dict[str, Any]) -> None:
+    out.append(f"# HELP {name} {m['help']}")
+    out.append(f"# TYPE {name} {m['kind']}")
+    labels = m["labels"]
+    for key, value in sorted(m["values"], key=lambda kv: kv[0]):
+        if m["kind"] == "counter":
+            out.append(f"{name}{_fmt_labels(labels, key)} {_fmt_value(value)}")
+            continue
+        counts, total = value
+        acc = 0
+        for le, c in zip(list(m["buckets"]) + ["+Inf"], counts):
+            acc += c
+            le_label = 'le="%s"' % (le if le == "+Inf" else _fmt_value(le))
+            out.append(f"{name}_bucket{_fmt_labels(labels, key, le_label)} {acc}")
+        out.append(f"{name}_sum{_fmt_labels(labels, key)} {_fmt_value(total)}")
+        out.append(f"{name}_count{_fmt_labels(labels, key)} {acc}")
+
+
+def _merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    for snap in snapshots:
+        for name, m in snap.items():
+            dst = merged.setdefault(name, {**m, "values": {}})
+            for key, value in m["values"]:
+                key = tuple(key)
+                cur = dst["values"].get(key)
+                if cur is None:
+                    dst["values"][key] = value if m["kind"] == "counter" else [list(value[0]), value[1]]
+                elif m["kind"] == "counter":
+                    dst["values"][key] = cur + value
+                else:
+                    cur[0] = [a + b for a, b in zip(cur[0], value[0])]
+                    cur[1] += value[1]
+    for m in merged.values():
+        m["values"] = list(m["values"].items())
+    return merged
+
+
+# ---------- несколько процессов ----------
+
+def _snapshot_path(pid: int) -> Optional[str]:
+    return os.path.join(METRICS_DIR, f"{pid}.json") if METRICS_DIR else None
+
+
+def flush() -> None:
+    path = _snapshot_path(os.getpid())
+    if path is None:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(REGISTRY.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _read_peer_snapshots() -> List[Dict[str, Any]]:
+    # снимки других процессов (свой берётся из памяти); снимки завершённых воркеров
+    # остаются — их счётчики входят в сумму
+    if not METRICS_DIR or not os.path.isdir(METRICS_DIR):
+        return []
+    own = f"{os.getpid()}.json"
+    out = []
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json") or name == own:
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name), "r", encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+_flusher_pid: Optional[int] = None
+
+
+_flusher_lock = threading.Lock()
+
+
+def _start_flusher() -> None:
+    global _flusher_pid
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    if not METRICS_DIR:
+        return
+
+    def loop() -> None:
+        while True:
+            time.sleep(FLUSH_SEC)
+            try:
+                flush()
+            except OSError:
+                pass
+
+    threading.Thread(target=loop, name="metrics-flush", daemon=True).start()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("stp_http_requests_total", "HTTP-запросы", ("service", "route", "method", "status"))
+HTTP_LATENCY = REGISTRY.histogram("stp_http_request_duration_seconds", "Длительность запроса до закрытия ответа (со стримом)",
+                                  ("service", "route", "method"))
+HTTP_BYTES = REGISTRY.histogram("stp_http_response_bytes", "Размер ответа, байт", ("service", "route"), BYTES_BUCKETS)
+
+
+def count_iter(items: Iterable[Any], counter: Counter, step: int = 4096, **labels: Any) -> Iterator[Any]:
+    """
+    Пропускает элементы насквозь и добавляет их число в counter — пачками по step,
+    чтобы в горячем цикле выгрузки не брать блокировку на каждый код.
+    """
+    n = 0
+    try:
+        for item in items:
+            n += 1
+            if n == step:
+                counter.inc(n, **labels)
+                n = 0
+            yield item
+    finally:
+        if n:
+            counter.inc(n, **labels)
+
+
+# ---------- инструментирование Flask ----------
+
+def _route_labels() -> Tuple[str, str]:
+    service = request.blueprint or "main"
+    rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+    return service, rule
+
+
+class _CountingBody:
+    """
+    Обёртка тела стрима: считает отданные байты, не меняя порядок/поток.
+    """
+    def __init__(self, body: Iterable[bytes]):
+        self.body = body
+        self.bytes = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self.body:
+            self.bytes += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        close = getattr(self.body, "close", None)
+        if close is not None:
+            close()
+
+
+def _before_request() -> None:
+    g._metrics_t0 = time.perf_counter()
+    if _flusher_pid != os.getpid():
+        # поток сброса — в каждом воркере свой (после fork потоки родителя не живут)
+        _start_flusher()
+
+
+def _after_request(response: Response) -> Response:
+    t0 = getattr(g, "_metrics_t0", None)
+    if t0 is None:
+        return response
+    service, route = _route_labels()
+    method, status = request.method, response.status_code
+    counting = None
+    if response.is_streamed and not response.direct_passthrough:
+        counting = _CountingBody(response.response)
+        response.response = counting
+
+    def done() -> None:
+        size = counting.bytes if counting is not None else (response.content_length or 0)
+        HTTP_REQUESTS.inc(service=service, route=route, method=method, status=status)
+        HTTP_LATENCY.observe(time.perf_counter() - t0, service=service, route=route, method=method)
+        HTTP_BYTES.observe(size, service=service, route=route)
+
+    response.call_on_close(done)
+    return response
+
+
+def instrument(app: Flask) -> None:
+    """
+    Счётчики/гистограммы запросов для приложения (главного и сервисов — через add_app_hook).
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+
+def metrics_response() -> Response:
+    return Response(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,215 @@
+from __future__ import annotations
+import cProfile
+import hmac
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+# Профилирование одного запроса по требованию (cProfile).
+# Включается только при заданном PROFILE_TOKEN; запрос профилируется, если в нём
+# есть заголовок X-Profile: <токен> или параметр ?__profile=<токен>.
+# Профиль охватывает и отдачу стрима (до закрытия ответа) и пишется в кольцо
+# .prof-файлов в PROFILE_DIR рядом с .json с маршрутом и временем.
+# Смотреть: python -m pstats <файл>.prof или snakeviz.
+
+# ---------- конфиг ----------
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "stp_profiles")
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20") or 20)
+
+HEADER = "HTTP_X_PROFILE"
+QUERY_PARAM = "__profile"
+
+_NAME_RE = re.compile(r"^[0-9A-Za-z_.-]+\.(prof|json)$")
+# cProfile и sys.setprofile плохо уживаются в нескольких потоках сразу —
+# одновременно профилируется один запрос, остальные идут как обычно
+_busy = threading.Lock()
+_seq = itertools.count(1)
+
+
+def enabled() -> bool:
+    return bool(PROFILE_TOKEN)
+
+
+def check_token(value: Optional[str]) -> bool:
+    if not PROFILE_TOKEN or not value:
+        return False
+    # compare_digest на str с не-ASCII бросает TypeError — сравниваем байты
+    # (surrogateescape: заголовки WSGI — latin-1, в них бывает что угодно)
+    return hmac.compare_digest(value.encode("utf-8", "surrogateescape"), PROFILE_TOKEN.encode("utf-8"))
+
+
+def _requested_token(environ: Dict[str, Any]) -> Optional[str]:
+    token = environ.get(HEADER)
+    if token:
+        return token
+    qs = environ.get("QUERY_STRING", "")
+    if QUERY_PARAM not in qs:
+        return None
+    for k, v in parse_qsl(qs, keep_blank_values=True):
+        if k == QUERY_PARAM:
+            return v
+    return None
+
+
+def _strip_token(environ: Dict[str, Any]) -> None:
+    # токен не должен попасть ни в приложение, ни в метаданные профиля
+    environ.pop(HEADER, None)
+    qs = environ.get("QUERY_STRING", "")
+    if QUERY_PARAM in qs:
+        environ["QUERY_STRING"] = urlencode([(k, v) for k, v in parse_qsl(qs, keep_blank_values=True)
+                                             if k != QUERY_PARAM])
+
+
+class _ProfiledBody:
+    """
+    Тело ответа под профилировщиком: итерация стрима профилируется,
+    по close() профиль сохраняется и блокировка отпускается.
+    """
+    def __init__(self, body: Iterable[bytes], run: "_Run"):
+        self.body = body
+        self.run = run
+
+    def __iter__(self) -> Iterator[bytes]:
+        prof = self.run.prof
+        it = iter(self.body)
+        while True:
+            # между чанками управление у сервера (запись в сокет) — его не профилируем
+            prof.enable()
+            try:
+                chunk = next(it)
+            except StopIteration:
+                return
+            finally:
+                prof.disable()
+            self.run.bytes += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            close = getattr(self.body, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self.run.finish()
+
+
+class _Run:
+    def __init__(self, environ: Dict[str, Any]):
+        self.prof = cProfile.Profile()
+        now = time.time()
+        self.name = (time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+                     + f"{int(now * 1000) % 1000:03d}-{os.getpid()}-{next(_seq)}")
+        self.meta: Dict[str, Any] = {
+            "method": environ.get("REQUEST_METHOD"),
+            "path": (environ.get("SCRIPT_NAME", "") + environ.get("PATH_INFO", "")) or "/",
+            "query": environ.get("QUERY_STRING", ""),
+            "started": now,
+        }
+        self.status: Optional[str] = None
+        self.bytes = 0
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._done = False
+
+    def finish(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        try:
+            self.prof.disable()
+            self.meta.update(
+                status=self.status,
+                bytes=self.bytes,
+                wall_seconds=round(time.perf_counter() - self._t0, 6),
+                cpu_seconds=round(time.process_time() - self._cpu0, 6),   # CPU процесса, не только запроса
+            )
+            _save(self.name, self.prof, self.meta)
+        finally:
+            _busy.release()
+
+
+def _save(name: str, prof: cProfile.Profile, meta: Dict[str, Any]) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    prof.dump_stats(os.path.join(PROFILE_DIR, name + ".prof"))
+    with open(os.path.join(PROFILE_DIR, name + ".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    # кольцо: самые старые профили удаляются
+    for old in list_profiles()[PROFILE_KEEP:]:
+        for ext in (".prof", ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old["name"] + ext))
+            except OSError:
+                pass
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Профили из кольца, новые первыми: [{name, file, ...метаданные}]."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for fn in os.listdir(PROFILE_DIR):
+        if not fn.endswith(".prof"):
+            continue
+        name = fn[:-5]
+        meta: Dict[str, Any] = {}
+        try:
+            with open(os.path.join(PROFILE_DIR, name + ".json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+        out.append({"name": name, "file": fn, **meta})
+    out.sort(key=lambda p: p["name"], reverse=True)
+    return out
+
+
+def profile_path(filename: str) -> Optional[str]:
+    """Путь к файлу кольца по имени (без обхода каталогов) или None."""
+    if not _NAME_RE.match(filename):
+        return None
+    path = os.path.join(PROFILE_DIR, filename)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilerMiddleware:
+    """
+    WSGI-обёртка поверх всего приложения (включая сервисы под /services/<id>).
+    Запрос без флага проходит насквозь: проверка заголовка и строки запроса.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        token = _requested_token(environ)
+        if token is None:
+            return self.app(environ, start_response)
+        _strip_token(environ)
+        if not check_token(token) or not _busy.acquire(blocking=False):
+            return self.app(environ, start_response)
+
+        run = _Run(environ)
+
+        def _start_response(status, headers, exc_info=None):
+            run.status = status
+            headers = list(headers) + [("X-Profile-Id", run.name)]
+            return start_response(status, headers, exc_info)
+
+        run.prof.enable()
+        try:
+            body = self.app(environ, _start_response)
+        except BaseException:
+            run.finish()
+            raise
+        run.prof.disable()
+        return _ProfiledBody(body, run)
+
+
+def install(app) -> None:
+    if enabled():
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app)
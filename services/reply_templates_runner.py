@@ -1,14 +1,21 @@
 from __future__ import annotations
-import datetime, json
+import datetime, json, time
 from typing import Any, Dict
 from zoneinfo import ZoneInfo
 
-from flask import Blueprint, render_template_string, request, jsonify
+from flask import Blueprint, request, jsonify
 from .base import ServiceBase
+from . import assets, metrics
+from .cached_response import CachedBody
 from .template_store import load_all
 
 bp = Blueprint("reply_templates_runner", __name__)
 
+RENDERS = metrics.REGISTRY.counter("stp_reply_renders_total", "Рендеры шаблонов ответа")
+RENDER_SECONDS = metrics.REGISTRY.histogram(
+    "stp_reply_render_duration_seconds", "Время рендера шаблона ответа",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5))
+
 # ---------- time helpers ----------
 def _now_in_tz(tzname: str | None) -> datetime.datetime:
     if tzname:
@@ -99,24 +106,8 @@ HTML = """
 <!doctype html>
 <html lang="ru"><meta charset="utf-8">
 <title>Генератор ответов</title>
-<link rel="stylesheet" href="/static/style.css">
-<style>
-:root{color-scheme:dark}
-body{font-family:system-ui,Inter,Segoe UI,Roboto,Arial;background:#0f1116;color:#e6e6e6;margin:0}
-.container{max-width:1200px;margin:0 auto;padding:20px}
-.grid{display:grid;grid-template-columns:300px 1fr 1fr;gap:16px;align-items:start}
-.card{background:#131720;border:1px solid #232837;border-radius:12px;padding:12px}
-h2,h3{margin:6px 0 12px}
-input[type=text],textarea,select{width:100%;padding:8px 10px;border-radius:10px;border:1px solid #262b33;background:#0e1116;color:#e6e6e6}
-textarea{min-height:120px}
-button{padding:8px 12px;border:1px solid #334155;background:#1f2937;color:#e5e7eb;border-radius:10px;cursor:pointer}
-button:hover{background:#324155}
-.row{display:flex;gap:8px;flex-wrap:wrap;align-items:center}
-.kv{display:grid;grid-template-columns:150px 1fr;gap:8px;align-items:center;margin:6px 0}
-pre{white-space:pre-wrap;word-break:break-word;background:#0e1116;border:1px solid #262b33;border-radius:10px;padding:10px;min-height:220px}
-.muted{color:#9aa0a6}
-.help{border-bottom:1px dotted #9aa0a6;cursor:help}
-</style>
+<link rel="stylesheet" href="{base_css}">
+<link rel="stylesheet" href="{css}">
 <body><div class="container">
   <h2>🧩 Генератор ответов</h2>
   <div class="grid">
@@ -149,140 +140,21 @@ pre{white-space:pre-wrap;word-break:break-word;background:#0e1116;border:1px sol
     </div>
   </div>
 </div>
-<script>
-let items=[], current=null, values={};
-function $id(x){return document.getElementById(x)}
-
-async function loadList(){
-  const res = await fetch("list");
-  items = await res.json();
-  renderList(items);
-}
-function renderList(arr){
-  const box = $id("tpl-list"); box.innerHTML = "";
-  arr.forEach(t=>{
-    const a = document.createElement("a");
-    a.href="#"; a.textContent=t.name;
-    a.style.display="block"; a.style.padding="6px 8px"; a.style.borderRadius="8px";
-    a.onclick=(e)=>{e.preventDefault(); openTemplate(t.id)};
-    box.appendChild(a);
-  });
-}
-function filterList(){
-  const q = ($id("q").value || "").toLowerCase();
-  const filtered = items.filter(x=>(x.name||"").toLowerCase().includes(q));
-  renderList(filtered);
-}
-async function openTemplate(id){
-  const data = await fetch("get?id="+id).then(r=>r.json());
-  current = data; values = {};
-  $id("tpl-name").textContent = current.name || "(без имени)";
-  $id("fname").value = (current.name || "reply").replace(/\\s+/g, "_");
-  renderInputs();
-  $id("preview").textContent = "";
-}
-function flagHint(flags){
-  const f = flags||{}; const arr = [];
-  if (f.newline) arr.push("новая строка (до)");
-  if (f.newlineAfter) arr.push("новая строка (после)");
-  if (f.spaceBefore) arr.push("пробел до");
-  if (f.spaceAfter) arr.push("пробел после");
-  if (f.upper) arr.push("UPPER");
-  if (f.lower) arr.push("lower");
-  if (f.capitalize) arr.push("Capitalize");
-  return arr.join(", ");
-}
-
-// ОБНОВЛЁННЫЙ renderInputs с поддержкой multiline
-function renderInputs(){
-  const root = $id("inputs");
-  root.innerHTML = "";
-  if (!current){
-    root.innerHTML='<span class="muted">Выберите шаблон слева</span>';
-    return;
-  }
-  if (current.description){
-    const p = document.createElement("p");
-    p.innerHTML = `<span class="help" title="${current.description}">ℹ️ Подсказка к шаблону</span>`;
-    root.appendChild(p);
-  }
-  (current.blocks||[]).forEach((b)=>{
-    const wrap = document.createElement("div"); wrap.className="kv";
-    const lab = document.createElement("label");
-    lab.innerHTML = `${b.label || b.type} <span class="muted" title="${(b.desc||'') + (b.flags? ('\\n'+flagHint(b.flags)) : '')}">ⓘ</span>`;
-    wrap.appendChild(lab);
-    let ctrl = document.createElement("div");
-
-    if (b.type==="StaticText" || b.type==="Greeting" || b.type==="Separator" || b.type==="DateTime" || b.type==="Table"){
-      ctrl.innerHTML = `<span class="muted">Автоматический блок • ${b.type}</span>`;
-
-    } else if (b.type==="InputField" || b.type==="ConditionalInput"){
-      if (b.multiline){
-        const area = document.createElement("textarea");
-        area.placeholder = b.name || "field";
-        area.oninput = ()=>{ values[b.name]=area.value; };
-        ctrl.appendChild(area);
-      } else {
-        const inp = document.createElement("input");
-        inp.type="text";
-        inp.placeholder = b.name || "field";
-        inp.oninput = ()=>{ values[b.name]=inp.value; };
-        ctrl.appendChild(inp);
-      }
-
-    } else if (b.type==="Choice"){
-      const sel = document.createElement("select");
-      const ch = b.choices || {};
-      sel.innerHTML = '<option value="">— выберите —</option>' + Object.keys(ch).map(k=>`<option value="${k}">${k} — ${ch[k]}</option>`).join("");
-      sel.onchange = ()=>{ values[b.name]=sel.value; };
-      ctrl.appendChild(sel);
-
-    } else if (b.type==="Toggle"){
-      const cb = document.createElement("input"); cb.type="checkbox"; cb.onchange = ()=>{ values[b.name]=cb.checked; };
-      ctrl.appendChild(cb);
-
-    } else if (b.type==="Repeater"){
-      const area = document.createElement("textarea");
-      area.placeholder = "По одному значению в строке (будет доступно как { value })";
-      area.oninput = ()=>{ values[b.name] = area.value.split("\\n").map(s=>s.trim()).filter(Boolean).map(x=>({value:x})); };
-      ctrl.appendChild(area);
-
-    } else {
-      ctrl.innerHTML = `<span class="muted">Неизвестный блок: ${b.type}</span>`;
-    }
-
-    wrap.appendChild(ctrl); root.appendChild(wrap);
-  });
-}
-
-async function renderPreview(){
-  if (!current){ return; }
-  const tz = Intl.DateTimeFormat().resolvedOptions().timeZone || null;
-  const res = await fetch("render", {
-    method:"POST",
-    headers:{"Content-Type":"application/json"},
-    body: JSON.stringify({ template: current, values, timezone: tz })
-  });
-  $id("preview").textContent = await res.text();
-}
-function clearValues(){ values={}; renderInputs(); $id("preview").textContent=""; }
-function copyResult(){ const t = $id("preview").textContent||""; navigator.clipboard.writeText(t); }
-function downloadTxt(){
-  const t = $id("preview").textContent||"";
-  const custom = ($id("fname")?.value || "").trim();
-  const name = custom || (current?.name || "reply");
-  const a = document.createElement("a");
-  a.href = URL.createObjectURL(new Blob([t], {type:"text/plain;charset=utf-8"}));
-  a.download = name + ".txt"; a.click();
-}
-loadList();
-</script>
+<script src="{js}"></script>
 </body></html>
 """
 
+# страница статическая — байты, сжатие и ETag готовятся один раз;
+# стили и скрипт — в static/services/ (URL с отпечатком, кэшируются браузером)
+PAGE = CachedBody(HTML.format(
+    base_css=assets.url("style.css"),
+    css=assets.url("services/reply_templates_runner.css"),
+    js=assets.url("services/reply_templates_runner.js"),
+))
+
 @bp.route("/")
 def index():
-    return render_template_string(HTML)
+    return PAGE.response()
 
 @bp.route("/list")
 def list_templates():
@@ -304,7 +176,11 @@ def render_view():
     vals = payload.get("values", {})
     tz = payload.get("timezone")
     now_dt = _now_in_tz(tz)
-    return render_template_obj(tpl, vals, now_dt)
+    t0 = time.perf_counter()
+    text = render_template_obj(tpl, vals, now_dt)
+    RENDERS.inc()
+    RENDER_SECONDS.observe(time.perf_counter() - t0)
+    return text
 
 service = ServiceBase(
     id="reply-templates-runner",
@@ -0,0 +1,314 @@
+from __future__ import annotations
+import importlib
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from flask.sessions import SecureCookieSession, SessionInterface, session_json_serializer
+from itsdangerous import BadSignature, Signer
+
+# Серверные сессии: в cookie — только подписанный непрозрачный id,
+# данные (core/prod/путь json_inspector и т.п.) лежат в хранилище.
+# По умолчанию — SQLite на локальном диске; для нескольких узлов подключается
+# общий бэкенд (SESSION_BACKEND=module:factory), реализующий SessionBackend.
+# Перед бэкендом — LRU в памяти процесса; запись из LRU используется, только если
+# метка версии в хранилище не изменилась (другой воркер/узел мог записать сессию).
+# Недавно сверенной записи (LRU_TRUST_SEC) верим без запроса: запись другого
+# воркера станет видна с задержкой не больше этого окна, свои записи — сразу.
+
+# ---------- конфиг ----------
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "sqlite")   # sqlite | cookie | module:factory
+SQLITE_PATH = os.environ.get("SESSION_SQLITE_PATH") or os.path.join(tempfile.gettempdir(), "stp_sessions.sqlite3")
+TTL_SEC = int(os.environ.get("SESSION_TTL_SEC", str(7 * 24 * 3600)) or 7 * 24 * 3600)
+LRU_ITEMS = int(os.environ.get("SESSION_LRU_ITEMS", "1024") or 0)
+# бэкенд без меток версий (versioned=False): сколько доверять записи LRU; 0 — LRU не используется
+LRU_TTL_SEC = float(os.environ.get("SESSION_LRU_TTL_SEC", "0") or 0)
+# бэкенд с метками: столько секунд после сверки метки запись LRU отдаётся без запроса;
+# 0 — метка проверяется при каждом чтении
+LRU_TRUST_SEC = float(os.environ.get("SESSION_LRU_TRUST_SEC", "2") or 0)
+# срок жизни сессии, которую только читают, продлевается не чаще раза в столько секунд
+TOUCH_EVERY_SEC = max(1, TTL_SEC // 100)
+CLEANUP_EVERY_SEC = 600
+
+
+class SessionBackend:
+    """
+    Интерфейс хранилища: значения — уже сериализованные строки.
+    versioned=True — хранилище ведёт метку версии каждой записи (version()).
+    """
+    versioned = False
+
+    def get(self, sid: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def version(self, sid: str) -> Optional[str]:
+        """Метка последней записи живой сессии (дешёвый запрос); None — сессии нет."""
+        raise NotImplementedError
+
+    def touch(self, sid: str, ttl: int) -> None:
+        """Продление срока жизни без перезаписи данных."""
+
+    def set(self, sid: str, data: str, ttl: int) -> None:
+        raise NotImplementedError
+
+    def delete(self, sid: str) -> None:
+        raise NotImplementedError
+
+    def cleanup(self) -> None:
+        """Удаление протухших записей (если хранилище не делает этого само)."""
+
+
+class SQLiteBackend(SessionBackend):
+    versioned = True
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._inherited: list = []
+        os.register_at_fork(after_in_child=self._after_fork)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL,"
+            " version TEXT NOT NULL DEFAULT '')"
+        )
+        # файл от прежней версии — без столбца version
+        if "version" not in {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}:
+            conn.execute("ALTER TABLE sessions ADD COLUMN version TEXT NOT NULL DEFAULT ''")
+
+    def _conn(self) -> sqlite3.Connection:
+        # соединение на поток: sqlite3-соединение нельзя делить между потоками
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _after_fork(self) -> None:
+        # соединение SQLite нельзя использовать после fork — в дочернем процессе открываем своё
+        self._inherited.append(self._local)
+        self._local = threading.local()
+
+    def get(self, sid: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires > ?", (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def version(self, sid: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT version FROM sessions WHERE id = ? AND expires > ?", (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, sid: str, data: str, ttl: int) -> None:
+        self._conn().execute(
+            "INSERT INTO sessions (id, data, expires, version) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires = excluded.expires, "
+            "version = excluded.version",
+            (sid, data, time.time() + ttl, secrets.token_hex(8)),
+        )
+
+    def touch(self, sid: str, ttl: int) -> None:
+        self._conn().execute(
+            "UPDATE sessions SET expires = ? WHERE id = ? AND expires > ?",
+            (time.time() + ttl, sid, time.time()),
+        )
+
+    def delete(self, sid: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def cleanup(self) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),))
+
+
+class LRUCache:
+    """
+    sid → (сериализованные данные, метка версии, момент записи). Потокобезопасный;
+    ttl=0 — записи не устаревают по времени.
+    """
+    def __init__(self, max_items: int = LRU_ITEMS, ttl: float = LRU_TTL_SEC):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[str, Optional[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid: str) -> Optional[Tuple[str, Optional[str], float]]:
+        with self._lock:
+            item = self._items.get(sid)
+            if item is None:
+                return None
+            if self.ttl and time.monotonic() - item[2] > self.ttl:
+                del self._items[sid]
+                return None
+            self._items.move_to_end(sid)
+            return item
+
+    def put(self, sid: str, data: str, version: Optional[str] = None) -> None:
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._items[sid] = (data, version, time.monotonic())
+            self._items.move_to_end(sid)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def pop(self, sid: str) -> None:
+        with self._lock:
+            self._items.pop(sid, None)
+
+
+class ServerSession(SecureCookieSession):
+    def __init__(self, initial: Optional[Dict[str, Any]] = None, sid: Optional[str] = None, new: bool = False):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = session_json_serializer
+
+    def __init__(self, backend: SessionBackend, cache: Optional[LRUCache] = None, ttl: int = TTL_SEC):
+        self.backend = backend
+        self.cache = cache if cache is not None else LRUCache(ttl=0 if backend.versioned else LRU_TTL_SEC)
+        self.ttl = ttl
+        # sid → когда этот процесс последний раз продлевал сессию
+        self._touched = LRUCache(ttl=TOUCH_EVERY_SEC)
+        self._next_cleanup = 0.0
+        self._cleanup_lock = threading.Lock()
+
+    def _signer(self, app) -> Optional[Signer]:
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt="server-session")
+
+    def _read(self, sid: str) -> Optional[str]:
+        if self.backend.versioned:
+            cached = self.cache.get(sid)
+            if cached is not None and time.monotonic() - cached[2] < LRU_TRUST_SEC:
+                return cached[0]
+            # метку читаем до данных: запись между ними даст новые данные со старой меткой,
+            # и следующее обращение просто перечитает их
+            version = self.backend.version(sid)
+            if version is None:
+                self.cache.pop(sid)
+                return None
+            if cached is not None and cached[1] == version:
+                self.cache.put(sid, cached[0], version)   # сверено — окно доверия заново
+                return cached[0]
+            raw = self.backend.get(sid)
+            if raw is not None:
+                self.cache.put(sid, raw, version)
+            return raw
+        if not self.cache.ttl:
+            return self.backend.get(sid)
+        cached = self.cache.get(sid)
+        if cached is not None:
+            return cached[0]
+        raw = self.backend.get(sid)
+        if raw is not None:
+            self.cache.put(sid, raw)
+        return raw
+
+    def _load(self, sid: str) -> Optional[Dict[str, Any]]:
+        raw = self._read(sid)
+        if raw is None:
+            return None
+        try:
+            data = self.serializer.loads(raw)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def open_session(self, app, request) -> Optional[ServerSession]:
+        signer = self._signer(app)
+        if signer is None:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = signer.unsign(cookie).decode("ascii")
+            except (BadSignature, UnicodeDecodeError):
+                sid = None
+            if sid:
+                data = self._load(sid)
+                if data is not None:
+                    return ServerSession(data, sid=sid)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session: ServerSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                self.cache.pop(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add("Cookie")
+            return
+
+        if not self.should_set_cookie(app, session):
+            if not session.new:
+                self._touch(session.sid)
+            return
+        raw = self.serializer.dumps(dict(session))
+        self.backend.set(session.sid, raw, self.ttl)
+        # метку новой записи знает только хранилище — версионный LRU заполнится при следующем чтении
+        if self.backend.versioned:
+            self.cache.pop(session.sid)
+        else:
+            self.cache.put(session.sid, raw)
+        self._touched.put(session.sid, "")
+        self._maybe_cleanup()
+        cookie = self._signer(app).sign(session.sid).decode("ascii")
+        response.set_cookie(name, cookie, expires=self.get_expiration_time(app, session),
+                            httponly=httponly, domain=domain, path=path, secure=secure,
+                            samesite=samesite)
+        response.vary.add("Cookie")
+
+    def _touch(self, sid: str) -> None:
+        # сессию только читают — продлеваем срок в хранилище, но не на каждый запрос
+        if self._touched.get(sid) is None:
+            self.backend.touch(sid, self.ttl)
+            self._touched.put(sid, "")
+
+    def _maybe_cleanup(self) -> None:
+        now = time.monotonic()
+        if now < self._next_cleanup or not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_cleanup = now + CLEANUP_EVERY_SEC
+            self.backend.cleanup()
+        finally:
+            self._cleanup_lock.release()
+
+
+def make_interface(backend: str = SESSION_BACKEND) -> Optional[SessionInterface]:
+    """
+    Интерфейс сессий по конфигу; None — оставить стандартные cookie-сессии Flask.
+    """
+    if backend == "cookie":
+        return None
+    if backend == "sqlite":
+        return ServerSideSessionInterface(SQLiteBackend())
+    module_name, _, attr = backend.partition(":")
+    if not attr:
+        raise ValueError(f"SESSION_BACKEND: ожидалось sqlite, cookie или module:factory, получено {backend!r}")
+    factory = getattr(importlib.import_module(module_name), attr)
+    return ServerSideSessionInterface(factory())
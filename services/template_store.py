@@ -1,29 +1,114 @@
 from __future__ import annotations
 import os
 import json
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from urllib.parse import urlparse
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import db_trace, metrics
 
 # ---------- конфиг ----------
 
 DB_URL = os.environ.get("DATABASE_URL")
+# Пул соединений на процесс (воркер gunicorn); maxconn — не меньше числа потоков воркера
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1") or 1)
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "8") or 8)
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+_table_ready = False
+# пулы, унаследованные через fork: соединения родителя не закрываем из дочернего
+# процесса (это оборвало бы сессию родителя) — просто держим ссылку
+_inherited: List[ThreadedConnectionPool] = []
+
+DB_QUERIES = metrics.REGISTRY.counter("stp_db_queries_total", "Запросы к БД шаблонов", ("op",))
+DB_QUERY_SECONDS = metrics.REGISTRY.histogram("stp_db_query_duration_seconds", "Время запроса к БД шаблонов", ("op",))
+
+
+def _require_db_url() -> str:
+    # Проверка при первом обращении к БД, а не при импорте: модуль импортируют
+    # и там, где БД не нужна (CLI с шаблоном из файла, сервисы без шаблонов).
+    if not DB_URL:
+        raise RuntimeError(
+            "DATABASE_URL не задан. "
+            "В Render в Environment переменных веб-сервиса нужно указать DATABASE_URL "
+            "с Internal Database URL от PostgreSQL."
+        )
+    return DB_URL
+
+
+def init_pool() -> ThreadedConnectionPool:
+    """Пул соединений процесса; создаётся при первом обращении (или в post_fork воркера)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, _require_db_url())
+        return _pool
+
 
-if not DB_URL:
-    raise RuntimeError(
-        "DATABASE_URL не задан. "
-        "В Render в Environment переменных веб-сервиса нужно указать DATABASE_URL "
-        "с Internal Database URL от PostgreSQL."
-    )
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
 
 
-def _get_conn():
-    """Открывает новое соединение с БД."""
-    return psycopg2.connect(DB_URL)
+def _after_fork() -> None:
+    global _pool, _table_ready
+    if _pool is not None:
+        _inherited.append(_pool)
+    _pool = None
+    _table_ready = False
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+@contextmanager
+def _get_conn() -> Iterator[Any]:
+    """
+    Соединение из пула на время блока: commit при успехе, rollback при ошибке.
+    Оборванное соединение в пул не возвращается.
+    """
+    pool = _pool or init_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        with conn:
+            yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+
+def _execute(cur, sql: str, params: Any = None) -> None:
+    """
+    cur.execute с учётом в метриках и в трассировке HTTP-запроса (op — первое слово SQL).
+    Все запросы модуля идут через него.
+    """
+    op = sql.lstrip().split(None, 1)[0].upper()
+    t0 = time.perf_counter()
+    try:
+        cur.execute(sql, params)
+    finally:
+        elapsed = time.perf_counter() - t0
+        DB_QUERIES.inc(op=op)
+        DB_QUERY_SECONDS.observe(elapsed, op=op)
+        db_trace.record(sql, op, elapsed, getattr(cur, "rowcount", None))
 
 
 def _ensure_table():
-    """Создаёт таблицу для шаблонов, если её ещё нет."""
+    """Создаёт таблицу для шаблонов, если её ещё нет (один раз на процесс)."""
+    global _table_ready
+    if _table_ready:
+        return
     sql = """
     CREATE TABLE IF NOT EXISTS reply_templates (
         id      SERIAL PRIMARY KEY,
@@ -32,7 +117,8 @@ def _ensure_table():
     """
     with _get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(sql)
+            _execute(cur, sql)
+    _table_ready = True
 
 
 # ---------- дефолтные данные ----------
@@ -85,7 +171,7 @@ def load_all() -> List[Dict[str, Any]]:
 
     with _get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT payload FROM reply_templates ORDER BY id")
+            _execute(cur, "SELECT payload FROM reply_templates ORDER BY id")
             rows = cur.fetchall()
 
     if not rows:
@@ -125,9 +211,10 @@ def save_all(templates: List[Dict[str, Any]]) -> None:
     with _get_conn() as conn:
         with conn.cursor() as cur:
             # Полная перезапись — аналог твоего "перезаписать файл"
-            cur.execute("TRUNCATE reply_templates RESTART IDENTITY;")
+            _execute(cur, "TRUNCATE reply_templates RESTART IDENTITY;")
             for t in templates:
-                cur.execute(
+                _execute(
+                    cur,
                     "INSERT INTO reply_templates (payload) VALUES (%s)",
                     (json.dumps(t, ensure_ascii=False),)
                 )
@@ -139,7 +226,7 @@ def get_path() -> str:
     Используется только для отображения в UI.
     Вернём красивую строку типа PostgreSQL://host/dbname без пароля.
     """
-    parsed = urlparse(DB_URL)
+    parsed = urlparse(_require_db_url())
     host = parsed.hostname or "db"
     db = (parsed.path or "").lstrip("/") or "database"
     return f"PostgreSQL://{host}/{db}"
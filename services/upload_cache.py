@@ -0,0 +1,134 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Кэш загрузок по содержимому: файл спулится на диск с попутным SHA-256,
+# повторная загрузка того же содержимого берёт готовые core/prod без парсинга.
+
+# ---------- конфиг ----------
+CACHE_DIR = os.environ.get("UPLOAD_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "stp_upload_cache")
+CACHE_MAX_BYTES = int(os.environ.get("UPLOAD_CACHE_MAX_BYTES", str(10 * 1024 ** 3)) or 0)
+CACHE_TTL_SEC = int(os.environ.get("UPLOAD_CACHE_TTL_SEC", str(24 * 3600)) or 0)
+READ_CHUNK = 1024 * 1024  # 1 МБ
+
+_lock = threading.Lock()
+
+
+def _data_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, f"{digest}.json")
+
+
+def _meta_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, f"{digest}.meta")
+
+
+def spool(stream, limit: Optional[int] = None) -> Tuple[str, str, int]:
+    """
+    Пишет поток во временный файл кэша порциями, считая SHA-256.
+    Возвращает (путь, hex-дайджест, размер). При превышении limit — ValueError.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    h = hashlib.sha256()
+    total = 0
+    fd, path = tempfile.mkstemp(suffix=".spool", dir=CACHE_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(READ_CHUNK)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if limit is not None and total > limit:
+                    raise ValueError(f"Размер файла превышает лимит {limit} байт")
+                h.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, h.hexdigest(), total
+
+
+def lookup(digest: str) -> Optional[Dict[str, Any]]:
+    """
+    Запись кэша {path, size, core, prod} или None (нет/протухла).
+    Попадание обновляет mtime — вытеснение идёт по давности использования.
+    """
+    data, meta = _data_path(digest), _meta_path(digest)
+    try:
+        with open(meta, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        st = os.stat(data)
+    except (OSError, ValueError):
+        return None
+    # TTL считается от последнего использования (mtime), как и в evict()
+    if CACHE_TTL_SEC and time.time() - st.st_mtime > CACHE_TTL_SEC:
+        discard(digest)
+        return None
+    now = time.time()
+    for p in (data, meta):
+        try:
+            os.utime(p, (now, now))
+        except OSError:
+            pass
+    entry["path"] = data
+    entry["size"] = st.st_size
+    return entry
+
+
+def store(digest: str, spool_path: str, core: Dict[str, Any], prod: Dict[str, Any]) -> str:
+    """
+    Кладёт распарсенный файл в кэш под именем дайджеста; возвращает итоговый путь.
+    """
+    data = _data_path(digest)
+    os.replace(spool_path, data)
+    meta = _meta_path(digest)
+    tmp = meta + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"core": core, "prod": prod, "created_at": time.time()}, f, ensure_ascii=False)
+    os.replace(tmp, meta)
+    evict()
+    return data
+
+
+def discard(digest: str) -> None:
+    # вместе с файлом уходит и индекс товаров (json_index кладёт его рядом)
+    for p in (_data_path(digest), _meta_path(digest), _data_path(digest) + ".idx"):
+        try:
+            os.unlink(p)
+        except OSError:
+            pass
+
+
+def evict() -> None:
+    """
+    Удаляет протухшие записи и самые давно использованные сверх CACHE_MAX_BYTES.
+    """
+    with _lock:
+        try:
+            names = os.listdir(CACHE_DIR)
+        except OSError:
+            return
+        now = time.time()
+        entries = []
+        for name in names:
+            if not name.endswith(".meta"):
+                continue
+            digest = name[:-len(".meta")]
+            try:
+                st = os.stat(_data_path(digest))
+            except OSError:
+                discard(digest)
+                continue
+            entries.append((st.st_mtime, st.st_size, digest))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, digest in entries:
+            expired = CACHE_TTL_SEC and now - mtime > CACHE_TTL_SEC
+            if expired or (CACHE_MAX_BYTES and total > CACHE_MAX_BYTES):
+                discard(digest)
+                total -= size
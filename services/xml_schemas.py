@@ -0,0 +1,252 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+# Реестр XML-документов для выгрузки json_inspector.
+# Документ описывается декларативно (корень, поля шапки, поля товара) и один раз
+# компилируется в заготовки байтов. На каждую выгрузку значения из core/prod
+# подставляются сразу (они одинаковы для всех товаров), и товар рендерится как
+# prefix + код + suffix — общий быстрый путь для любого типа документа.
+
+CODE = "code"  # источник поля — сам код (КИ) текущего товара
+
+# ---------- экранирование ----------
+# Инвариантные поля (шапка, поля товара из core/prod) экранируются один раз в bind().
+# Для кода на товар — быстрый путь: isprintable() и поиск "]]>" идут в C,
+# и для обычного КИ это всё, что делается.
+
+# Символы, недопустимые в XML 1.0 (управляющие, кроме \t \n \r)
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def escape_text(s: str) -> str:
+    """
+    Текстовое содержимое элемента: &, <, > → сущности; недопустимые символы выкидываются.
+    """
+    if s.isprintable() and not ("&" in s or "<" in s or ">" in s):
+        return s
+    return _INVALID_XML.sub("", s).translate(_TEXT_ESCAPES)
+
+
+def escape_cdata(s: str) -> str:
+    """
+    Содержимое CDATA: "]]>" разрывается на две секции; недопустимые символы выкидываются.
+    """
+    if s.isprintable() and "]]>" not in s:
+        return s
+    return _INVALID_XML.sub("", s).replace("]]>", "]]]]><![CDATA[>")
+
+
+Source = Union[str, Tuple[str, ...]]
+
+
+@dataclass(frozen=True)
+class Field:
+    tag: str
+    source: Source             # "core.x" / "prod.x" / CODE; кортеж — фолбэки по порядку
+    default: str = ""
+    cdata: bool = False
+
+
+@dataclass(frozen=True)
+class DocumentSchema:
+    name: str
+    version: str
+    root: str
+    header: Tuple[Field, ...]
+    item: Tuple[Field, ...]
+    list_tag: str = "products_list"
+    item_tag: str = "product"
+    title: str = ""
+    # выбор схемы по умолчанию по данным ядра (см. schema_for)
+    match: Optional[Callable[[Dict[str, Any]], bool]] = None
+
+
+@dataclass
+class CompiledSchema:
+    """
+    Схема, разложенная на байтовые куски. В шапке и товаре — чередование
+    готовых байтов и слотов (Field); слоты-источники core/prod заполняются
+    в bind(), слот CODE остаётся до рендера товара.
+    """
+    schema: DocumentSchema
+    head: List[Union[bytes, Field]]
+    item: List[Union[bytes, Field]]
+    tail: bytes
+
+
+@dataclass
+class BoundDocument:
+    head: bytes
+    tail: bytes
+    # товар: куски байтов между слотами кода (len(item_parts) == число слотов + 1)
+    item_parts: Tuple[bytes, ...] = field(default_factory=tuple)
+    # экранирование для каждого слота кода (escape_cdata / escape_text)
+    item_escapes: Tuple[Callable[[str], str], ...] = field(default_factory=tuple)
+
+    def render(self, code: str) -> bytes:
+        parts = self.item_parts
+        if len(parts) == 2:
+            return parts[0] + self.item_escapes[0](code).encode("utf-8") + parts[1]
+        out = [parts[0]]
+        for esc, part in zip(self.item_escapes, parts[1:]):
+            out.append(esc(code).encode("utf-8"))
+            out.append(part)
+        return b"".join(out)
+
+
+def _compile_lines(lines: List[Union[str, Tuple[str, Field, str]]]) -> List[Union[bytes, Field]]:
+    """
+    Строки документа → список байтов/слотов; соседние литералы склеиваются.
+    """
+    out: List[Union[bytes, Field]] = []
+    buf: List[str] = []
+    for line in lines:
+        if isinstance(line, str):
+            buf.append(line + "\n")
+            continue
+        before, slot, after = line
+        buf.append(before)
+        out.append("".join(buf).encode("utf-8"))
+        buf = [after + "\n"]
+        out.append(slot)
+    out.append("".join(buf).encode("utf-8"))
+    return out
+
+
+def _field_line(indent: str, f: Field) -> Tuple[str, Field, str]:
+    if f.cdata:
+        return (f"{indent}<{f.tag}><![CDATA[", f, f"]]></{f.tag}>")
+    return (f"{indent}<{f.tag}>", f, f"</{f.tag}>")
+
+
+def compile_schema(schema: DocumentSchema) -> CompiledSchema:
+    head_lines: List[Union[str, Tuple[str, Field, str]]] = [f'<{schema.root} version="{schema.version}">']
+    head_lines += [_field_line("  ", f) for f in schema.header]
+    head_lines.append(f"  <{schema.list_tag}>")
+    item_lines: List[Union[str, Tuple[str, Field, str]]] = [f"    <{schema.item_tag}>"]
+    item_lines += [_field_line("      ", f) for f in schema.item]
+    item_lines.append(f"    </{schema.item_tag}>")
+    # хвост без завершающего перевода строки — как и раньше
+    tail = f"  </{schema.list_tag}>\n</{schema.root}>".encode("utf-8")
+    return CompiledSchema(schema, _compile_lines(head_lines), _compile_lines(item_lines), tail)
+
+
+def _resolve(f: Field, core: Dict[str, Any], prod: Dict[str, Any]) -> str:
+    sources = (f.source,) if isinstance(f.source, str) else f.source
+    for src in sources:
+        scope, _, key = src.partition(".")
+        data = core if scope == "core" else prod if scope == "prod" else {}
+        v = data.get(key)
+        v = "" if v is None else str(v).strip()
+        if v:
+            return v
+    return f.default
+
+
+def _bind_parts(parts: List[Union[bytes, Field]], core: Dict[str, Any], prod: Dict[str, Any]) -> List[bytes]:
+    """
+    Подставляет значения core/prod; возвращает куски между слотами CODE.
+    """
+    out: List[bytes] = []
+    buf: List[bytes] = []
+    for p in parts:
+        if isinstance(p, bytes):
+            buf.append(p)
+        elif p.source == CODE:
+            out.append(b"".join(buf))
+            buf = []
+        else:
+            value = _resolve(p, core, prod)
+            value = escape_cdata(value) if p.cdata else escape_text(value)
+            buf.append(value.encode("utf-8"))
+    out.append(b"".join(buf))
+    return out
+
+
+def _code_escapes(parts: List[Union[bytes, Field]]) -> Tuple[Callable[[str], str], ...]:
+    return tuple(escape_cdata if p.cdata else escape_text
+                 for p in parts if isinstance(p, Field) and p.source == CODE)
+
+
+# ---------- реестр ----------
+
+SCHEMAS: Dict[str, DocumentSchema] = {}
+_compiled: Dict[str, CompiledSchema] = {}
+
+
+def register(schema: DocumentSchema) -> DocumentSchema:
+    SCHEMAS[schema.name] = schema
+    _compiled[schema.name] = compile_schema(schema)
+    return schema
+
+
+def schema_for(core: Dict[str, Any], doc_type: Optional[str] = None) -> DocumentSchema:
+    """
+    Явно выбранный тип документа или первый зарегистрированный, чей match подходит.
+    """
+    if doc_type:
+        if doc_type not in SCHEMAS:
+            raise ValueError(f"Неизвестный тип документа: {doc_type}")
+        return SCHEMAS[doc_type]
+    for schema in SCHEMAS.values():
+        if schema.match is not None and schema.match(core):
+            return schema
+    return SCHEMAS[DEFAULT_SCHEMA]
+
+
+def bind(core: Dict[str, Any], prod: Dict[str, Any], doc_type: Optional[str] = None) -> BoundDocument:
+    compiled = _compiled[schema_for(core, doc_type).name]
+    head = _bind_parts(compiled.head, core, prod)
+    if len(head) != 1:
+        raise ValueError("Поле с кодом (CODE) допустимо только в товаре")
+    return BoundDocument(head=head[0], tail=compiled.tail,
+                         item_parts=tuple(_bind_parts(compiled.item, core, prod)),
+                         item_escapes=_code_escapes(compiled.item))
+
+
+# ---------- документы ----------
+
+_ITEM_FIELDS = (
+    Field("ki", CODE, cdata=True),
+    Field("production_date", ("prod.production_date", "core.production_date")),
+    Field("tnved_code", "prod.tnved_code"),
+    Field("certificate_type", "prod.certificate_type", default="CONFORMITY_DECLARATION"),
+    Field("certificate_number", "prod.certificate_number"),
+    Field("certificate_date", "prod.certificate_date"),
+    Field("vsd_number", "prod.vsd_number"),
+)
+
+register(DocumentSchema(
+    name="introduce_contract",
+    version="7",
+    root="introduce_contract",
+    title="Ввод в оборот (контрактное производство), v7",
+    header=(
+        Field("producer_inn", "core.producer_inn"),
+        Field("owner_inn", "core.owner_inn"),
+        Field("production_date", "core.production_date"),
+        Field("production_order", "core.production_type"),
+    ),
+    item=_ITEM_FIELDS,
+    match=lambda core: core.get("production_type") == "CONTRACT_PRODUCTION",
+))
+
+register(DocumentSchema(
+    name="introduce_rf",
+    version="9",
+    root="introduce_rf",
+    title="Ввод в оборот (производство РФ), v9",
+    header=(
+        Field("trade_participant_inn", "core.producer_inn"),
+        Field("producer_inn", "core.producer_inn"),
+        Field("owner_inn", "core.owner_inn"),
+        Field("production_date", "core.production_date"),
+        Field("production_order", "core.production_type"),
+    ),
+    item=_ITEM_FIELDS,
+))
+
+DEFAULT_SCHEMA = "introduce_rf"
@@ -0,0 +1,92 @@
+from __future__ import annotations
+import shutil
+import zipfile
+from typing import Iterable, Iterator, Optional, Tuple
+
+from flask import Response
+
+# Стриминговая запись ZIP: архив пишется в «неперематываемый» буфер,
+# который опустошается после каждой порции — в памяти держим один чанк,
+# сколько бы записей ни было в архиве.
+
+CHUNK_BYTES = 256 * 1024
+
+
+class _DrainBuffer:
+    """
+    Минимальный file-like приёмник для zipfile.ZipFile.
+    tell()/seek() не поддерживаются — zipfile сам переходит на data descriptor.
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, b) -> int:
+        if b:
+            self._parts.append(bytes(b))
+        return len(b)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        if not self._parts:
+            return b""
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def batched_bytes(chunks: Iterable[bytes], size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Склеивает мелкие порции (по одной на товар) в чанки ~size байт.
+    """
+    buf = []
+    buffered = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buf.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield b"".join(buf)
+            buf.clear()
+            buffered = 0
+    if buf:
+        yield b"".join(buf)
+
+
+def zip_stream(entries: Iterable[Tuple[str, Iterable[bytes]]],
+               compression: int = zipfile.ZIP_DEFLATED,
+               force_zip64: bool = True) -> Iterator[bytes]:
+    """
+    Стриминг ZIP-архива из пар (имя записи, итератор байтов).
+    Записи потребляются строго по очереди: следующая запрашивается
+    только после того, как предыдущая дочитана до конца.
+    """
+    sink = _DrainBuffer()
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as zf:
+        for name, chunks in entries:
+            with zf.open(name, mode="w", force_zip64=force_zip64) as entry:
+                for chunk in batched_bytes(chunks):
+                    entry.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def remove_on_close(resp: Response, tmp_dir: Optional[str]) -> Response:
+    """
+    Удаляет временный каталог стримингового ответа, когда сервер закроет ответ.
+    call_on_close срабатывает и при обрыве до первого чанка — finally внутри
+    генератора, который так и не запустился, не выполнился бы.
+    """
+    if tmp_dir:
+        resp.call_on_close(lambda: shutil.rmtree(tmp_dir, ignore_errors=True))
+    return resp
@@ -0,0 +1,68 @@
+function $id(x){return document.getElementById(x)}
+
+function mb(n){return (n/1048576).toFixed(1)}
+
+function renderDiff(text){
+  const out = $id("out"); out.innerHTML = "";
+  const frag = document.createDocumentFragment();
+  text.split("\n").forEach(line=>{
+    const span = document.createElement("span");
+    if (line.startsWith("+++") || line.startsWith("---")) span.className = "file";
+    else if (line.startsWith("@@")) span.className = "hunk";
+    else if (line.startsWith("+")) span.className = "add";
+    else if (line.startsWith("-")) span.className = "del";
+    span.textContent = line + "\n";
+    frag.appendChild(span);
+  });
+  out.appendChild(frag);
+}
+
+function mode(){return document.querySelector("input[name=mode]:checked").value}
+
+function showSets(job, st){
+  const s = st.stats || {};
+  $id("status").innerHTML = `Только в A: ${s.a_only}, только в B: ${s.b_only}, общих: ${s.common} `
+    + `(уникальных: A ${s.a_unique} из ${s.a_total}, B ${s.b_unique} из ${s.b_total}) — `
+    + `<a href="${job.download_url}">скачать set_diff.zip</a>`;
+  $id("out").textContent = "";
+}
+
+async function showResult(job, st, m){
+  if (m === "sets") return showSets(job, st);
+  const s = st.stats || {};
+  const box = $id("status");
+  if (!st.bytes){
+    box.textContent = "Файлы совпадают ✅";
+    $id("out").textContent = "";
+    return;
+  }
+  box.innerHTML = `Различий: ${s.hunks} блок(ов), +${s.added} / −${s.removed} строк, отчёт ${mb(st.bytes)} МБ — `
+    + `<a href="${job.download_url}">скачать diff.patch</a>`;
+  const pv = await fetch(job.preview_url).then(r=>r.json());
+  renderDiff(pv.text + (pv.truncated ? "\n… (показано начало отчёта, полностью — в файле)" : ""));
+}
+
+$id("cmpForm").addEventListener("submit", async (e)=>{
+  e.preventDefault();
+  const box = $id("status");
+  box.textContent = "Загрузка файлов…";
+  $id("out").textContent = "";
+  const m = mode();
+  const res = await fetch(m, { method:"POST", body: new FormData(e.target) });
+  const job = await res.json();
+  if (!res.ok){ box.textContent = job.error || "Ошибка"; return; }
+  const poll = async ()=>{
+    const st = await fetch(job.status_url).then(r=>r.json());
+    if (st.status === "done") return showResult(job, st, m);
+    if (st.status === "failed"){ box.textContent = "Ошибка: " + (st.error || ""); return; }
+    const pct = Math.round((st.progress || 0) * 100);
+    const eta = st.eta_sec == null ? "" : `, осталось ~${Math.ceil(st.eta_sec)} с`;
+    box.textContent = `${st.status}: ${pct}% (${mb(st.done || 0)} из ${mb(st.total || 0)} МБ)${eta}`;
+    setTimeout(poll, 1000);
+  };
+  poll();
+});
+
+document.querySelectorAll("input[name=mode]").forEach(r=>r.addEventListener("change", ()=>{
+  document.querySelectorAll(".diff-only").forEach(el=>el.hidden = mode() !== "diff");
+}));
@@ -0,0 +1,48 @@
+(function(){
+  const btn = document.getElementById('prodBtn');
+  if (!btn) return;
+  btn.addEventListener('click', async () => {
+    const n = Math.max(1, parseInt(document.getElementById('prodOffset').value, 10) || 1);
+    const out = document.getElementById('prodPage');
+    out.style.display = '';
+    const res = await fetch(`products?offset=${n - 1}&limit=20`);
+    const data = await res.json();
+    out.textContent = data.error || `Товары ${n}–${n - 1 + data.items.length} из ${data.total}\n\n` + JSON.stringify(data.items, null, 2);
+  });
+})();
+(function(){
+  const btn = document.getElementById('validateBtn');
+  if (!btn) return;
+  btn.addEventListener('click', async (e) => {
+    e.preventDefault();
+    const out = document.getElementById('validation');
+    out.style.display = '';
+    out.textContent = 'Проверяем…';
+    const res = await fetch('validate', { method:'POST', body: new FormData(btn.form) });
+    out.textContent = JSON.stringify(await res.json(), null, 2);
+  });
+})();
+(function(){
+  const btn = document.getElementById('jobBtn');
+  if (!btn) return;
+  const box = document.getElementById('jobStatus');
+  btn.addEventListener('click', async (e) => {
+    e.preventDefault();
+    box.textContent = 'Ставим в очередь…';
+    const res = await fetch('jobs', { method:'POST', body: new FormData(btn.form) });
+    const job = await res.json();
+    if (!res.ok){ box.textContent = job.error || 'Ошибка'; return; }
+    const poll = async () => {
+      const st = await fetch(job.status_url).then(r => r.json());
+      if (st.status === 'done'){
+        box.innerHTML = `Готово: <a href="${job.download_url}">${st.download_name}</a>`;
+        return;
+      }
+      if (st.status === 'failed'){ box.textContent = 'Ошибка: ' + (st.error || ''); return; }
+      const eta = st.eta_sec == null ? '' : `, осталось ~${Math.ceil(st.eta_sec)} с`;
+      box.textContent = `${st.status}: ${st.codes_done}/${st.codes_total} кодов, ${(st.bytes/1048576).toFixed(1)} МБ${eta}`;
+      setTimeout(poll, 1000);
+    };
+    poll();
+  });
+})();
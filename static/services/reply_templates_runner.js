@@ -0,0 +1,126 @@
+let items=[], current=null, values={};
+function $id(x){return document.getElementById(x)}
+
+async function loadList(){
+  const res = await fetch("list");
+  items = await res.json();
+  renderList(items);
+}
+function renderList(arr){
+  const box = $id("tpl-list"); box.innerHTML = "";
+  arr.forEach(t=>{
+    const a = document.createElement("a");
+    a.href="#"; a.textContent=t.name;
+    a.style.display="block"; a.style.padding="6px 8px"; a.style.borderRadius="8px";
+    a.onclick=(e)=>{e.preventDefault(); openTemplate(t.id)};
+    box.appendChild(a);
+  });
+}
+function filterList(){
+  const q = ($id("q").value || "").toLowerCase();
+  const filtered = items.filter(x=>(x.name||"").toLowerCase().includes(q));
+  renderList(filtered);
+}
+async function openTemplate(id){
+  const data = await fetch("get?id="+id).then(r=>r.json());
+  current = data; values = {};
+  $id("tpl-name").textContent = current.name || "(без имени)";
+  $id("fname").value = (current.name || "reply").replace(/\s+/g, "_");
+  renderInputs();
+  $id("preview").textContent = "";
+}
+function flagHint(flags){
+  const f = flags||{}; const arr = [];
+  if (f.newline) arr.push("новая строка (до)");
+  if (f.newlineAfter) arr.push("новая строка (после)");
+  if (f.spaceBefore) arr.push("пробел до");
+  if (f.spaceAfter) arr.push("пробел после");
+  if (f.upper) arr.push("UPPER");
+  if (f.lower) arr.push("lower");
+  if (f.capitalize) arr.push("Capitalize");
+  return arr.join(", ");
+}
+
+// ОБНОВЛЁННЫЙ renderInputs с поддержкой multiline
+function renderInputs(){
+  const root = $id("inputs");
+  root.innerHTML = "";
+  if (!current){
+    root.innerHTML='<span class="muted">Выберите шаблон слева</span>';
+    return;
+  }
+  if (current.description){
+    const p = document.createElement("p");
+    p.innerHTML = `<span class="help" title="${current.description}">ℹ️ Подсказка к шаблону</span>`;
+    root.appendChild(p);
+  }
+  (current.blocks||[]).forEach((b)=>{
+    const wrap = document.createElement("div"); wrap.className="kv";
+    const lab = document.createElement("label");
+    lab.innerHTML = `${b.label || b.type} <span class="muted" title="${(b.desc||'') + (b.flags? ('\n'+flagHint(b.flags)) : '')}">ⓘ</span>`;
+    wrap.appendChild(lab);
+    let ctrl = document.createElement("div");
+
+    if (b.type==="StaticText" || b.type==="Greeting" || b.type==="Separator" || b.type==="DateTime" || b.type==="Table"){
+      ctrl.innerHTML = `<span class="muted">Автоматический блок • ${b.type}</span>`;
+
+    } else if (b.type==="InputField" || b.type==="ConditionalInput"){
+      if (b.multiline){
+        const area = document.createElement("textarea");
+        area.placeholder = b.name || "field";
+        area.oninput = ()=>{ values[b.name]=area.value; };
+        ctrl.appendChild(area);
+      } else {
+        const inp = document.createElement("input");
+        inp.type="text";
+        inp.placeholder = b.name || "field";
+        inp.oninput = ()=>{ values[b.name]=inp.value; };
+        ctrl.appendChild(inp);
+      }
+
+    } else if (b.type==="Choice"){
+      const sel = document.createElement("select");
+      const ch = b.choices || {};
+      sel.innerHTML = '<option value="">— выберите —</option>' + Object.keys(ch).map(k=>`<option value="${k}">${k} — ${ch[k]}</option>`).join("");
+      sel.onchange = ()=>{ values[b.name]=sel.value; };
+      ctrl.appendChild(sel);
+
+    } else if (b.type==="Toggle"){
+      const cb = document.createElement("input"); cb.type="checkbox"; cb.onchange = ()=>{ values[b.name]=cb.checked; };
+      ctrl.appendChild(cb);
+
+    } else if (b.type==="Repeater"){
+      const area = document.createElement("textarea");
+      area.placeholder = "По одному значению в строке (будет доступно как { value })";
+      area.oninput = ()=>{ values[b.name] = area.value.split("\n").map(s=>s.trim()).filter(Boolean).map(x=>({value:x})); };
+      ctrl.appendChild(area);
+
+    } else {
+      ctrl.innerHTML = `<span class="muted">Неизвестный блок: ${b.type}</span>`;
+    }
+
+    wrap.appendChild(ctrl); root.appendChild(wrap);
+  });
+}
+
+async function renderPreview(){
+  if (!current){ return; }
+  const tz = Intl.DateTimeFormat().resolvedOptions().timeZone || null;
+  const res = await fetch("render", {
+    method:"POST",
+    headers:{"Content-Type":"application/json"},
+    body: JSON.stringify({ template: current, values, timezone: tz })
+  });
+  $id("preview").textContent = await res.text();
+}
+function clearValues(){ values={}; renderInputs(); $id("preview").textContent=""; }
+function copyResult(){ const t = $id("preview").textContent||""; navigator.clipboard.writeText(t); }
+function downloadTxt(){
+  const t = $id("preview").textContent||"";
+  const custom = ($id("fname")?.value || "").trim();
+  const name = custom || (current?.name || "reply");
+  const a = document.createElement("a");
+  a.href = URL.createObjectURL(new Blob([t], {type:"text/plain;charset=utf-8"}));
+  a.download = name + ".txt"; a.click();
+}
+loadList();
@@ -0,0 +1,50 @@
+import json
+import os
+import random
+
+import pytest
+
+from services.code_sets import SetDiff
+
+
+def _write(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+    return str(path)
+
+
+def _run(diff):
+    out = {name: b"".join(chunks) for name, chunks in diff.entries()}
+    a_only = out["a_minus_b.txt"].decode("utf-8").splitlines()
+    b_only = out["b_minus_a.txt"].decode("utf-8").splitlines()
+    return a_only, b_only, json.loads(out["summary.json"])
+
+
+@pytest.mark.parametrize("memory_items,partitions", [(10 ** 6, 64), (50, 4), (5, 2), (1, 3)])
+def test_matches_set_reference(tmp_path, memory_items, partitions):
+    rng = random.Random(memory_items * 31 + partitions)
+    a = [f"code{rng.randint(0, 300)}" for _ in range(400)] + ["", "  code1  "]
+    b = [f"code{rng.randint(150, 450)}" for _ in range(400)]
+    diff = SetDiff(_write(tmp_path / "a.txt", a), _write(tmp_path / "b.txt", b), work_dir=str(tmp_path),
+                   memory_items=memory_items, partitions=partitions)
+    a_only, b_only, summary = _run(diff)
+
+    sa, sb = {x.strip() for x in a if x.strip()}, {x.strip() for x in b if x.strip()}
+    assert sorted(a_only) == sorted(sa - sb)
+    assert sorted(b_only) == sorted(sb - sa)
+    assert len(a_only) == len(set(a_only)) and len(b_only) == len(set(b_only))
+    assert summary["a_total"] == len(a) - 1
+    assert summary["b_total"] == len(b)
+    assert summary["a_unique"] == len(sa) and summary["b_unique"] == len(sb)
+    assert summary["common"] == len(sa & sb)
+    assert summary["partitioned"] == (memory_items < len(sa) + len(sb))
+    # временный каталог убран после b_minus_a
+    assert [p for p in os.listdir(tmp_path) if p.startswith("stp_sets_")] == []
+
+
+def test_in_memory_keeps_first_seen_order(tmp_path):
+    diff = SetDiff(_write(tmp_path / "a.txt", ["﻿z", "y", "z", "x"]), _write(tmp_path / "b.txt", ["y"]),
+                   work_dir=str(tmp_path))
+    a_only, b_only, summary = _run(diff)
+    assert a_only == ["z", "x"]
+    assert b_only == []
+    assert summary["partitioned"] is False
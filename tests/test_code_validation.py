@@ -0,0 +1,44 @@
+import collections
+import random
+
+import pytest
+
+from services import code_validation
+from services.code_validation import DuplicateDetector, normalize_codes, validate_codes
+
+
+def _expected(codes):
+    return sum(n - 1 for n in collections.Counter(codes).values())
+
+
+@pytest.mark.parametrize("memory_items", [3, 50, 10 ** 6])
+@pytest.mark.parametrize("bloom", [False, True])
+def test_duplicates_exact(tmp_path, memory_items, bloom):
+    rng = random.Random(memory_items)
+    pool = [f"c{rng.randrange(10 ** 9)}" for _ in range(300)]
+    codes = [rng.choice(pool) for _ in range(2000)]
+    d = DuplicateDetector(memory_items=memory_items, partitions=4, spill_dir=str(tmp_path),
+                          bloom=bloom, bloom_capacity=10)   # маленький фильтр — много ложных «возможно был»
+    for c in codes:
+        d.add(c)
+    assert d.spilled == (len(set(codes)) > memory_items)
+    count, samples = d.finish()
+    assert count == _expected(codes)
+    assert samples and all(codes.count(s) > 1 for s in samples)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_bloom_capacity_clamped(monkeypatch):
+    monkeypatch.setattr(code_validation, "DUP_BLOOM_MAX_ITEMS", 1000)
+    d = DuplicateDetector(bloom=True, bloom_capacity=10 ** 9)
+    assert d._bloom.bits < 20_000
+
+
+def test_normalize_codes():
+    lines = ["  0104<GS>21a \n", "\n", "0104&lt;GS&gt;21a", "0104\\x1D21a", "0104\x1d21a\r\n"]
+    assert list(normalize_codes(lines)) == ["0104\x1d21a"] * 4
+
+
+def test_validate_report():
+    r = validate_codes(["010460000000000121abc", "010460000000000121abc", "garbage"])
+    assert r["total"] == 3 and r["duplicates"] == 1 and r["invalid"] >= 1 and not r["ok"]
@@ -0,0 +1,39 @@
+import pytest
+from flask import Flask
+
+from services import db_trace, profiling
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(db_trace, "HEADERS", False)
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    app = Flask(__name__)
+    db_trace.instrument(app)
+
+    @app.route("/")
+    def index():
+        db_trace.record("SELECT 1", "select", 0.002, 1)
+        return "ok"
+
+    return app.test_client()
+
+
+def test_no_headers_by_default(client):
+    resp = client.get("/")
+    assert "X-DB-Queries" not in resp.headers
+    assert "Server-Timing" not in resp.headers
+
+
+def test_headers_with_profile_token(client):
+    resp = client.get("/", headers={"X-Profile-Token": "secret"})
+    assert resp.headers["X-DB-Queries"] == "1"
+    assert resp.headers["Server-Timing"].startswith("db;dur=")
+    assert "X-DB-Queries" not in client.get("/", headers={"X-Profile-Token": "wrong"}).headers
+
+
+def test_slow_query_logged_without_headers(client, monkeypatch, caplog):
+    monkeypatch.setattr(db_trace, "SLOW_QUERY_MS", 1)
+    with caplog.at_level("WARNING", logger="stp.db"):
+        client.get("/")
+    assert "медленный запрос" in caplog.text
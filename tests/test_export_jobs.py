@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from services import export_jobs
+
+
+@pytest.fixture(autouse=True)
+def jobs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_jobs, "JOBS_DIR", str(tmp_path))
+    yield
+    export_jobs.shutdown(wait=True)
+
+
+def _wait(job_id, statuses, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        st = export_jobs.status(job_id)
+        if st and st["status"] in statuses:
+            return st
+        time.sleep(0.01)
+    raise AssertionError(f"задача не дошла до {statuses}")
+
+
+def test_status_reads_published_snapshot():
+    release = threading.Event()
+
+    def produce(state, jdir):
+        state["done"] = 3
+        state["stats"] = {"rows": 3}
+        yield b"abc"
+        # изменения без сброса прогресса в status() не видны
+        state["done"] = 0
+        state["stats"]["rows"] = 99
+        release.wait(5)
+        yield b"def"
+
+    job_id, _ = export_jobs.create()
+    export_jobs.start(job_id, produce, "out.txt", "text/plain", total=6)
+    st = _wait(job_id, ("running",))
+    time.sleep(0.1)
+    st = export_jobs.status(job_id)
+    assert st["status"] == "running"
+    assert 0.0 <= st["progress"] <= 1.0
+    release.set()
+    st = _wait(job_id, ("done",))
+    assert st["bytes"] == 6
+    assert st["stats"] == {"rows": 99}
+    assert job_id not in export_jobs._published
+    with open(export_jobs.artifact_path(job_id), "rb") as f:
+        assert f.read() == b"abcdef"
+
+
+def test_status_concurrent_with_progress():
+    stop = threading.Event()
+    errors = []
+
+    def produce(state, jdir):
+        for i in range(1, 2001):
+            state["done"] = i
+            state.setdefault("stats", {})[f"k{i % 50}"] = i
+            if i % 100 == 0:
+                yield b""
+        yield b"x"
+
+    def poll(job_id):
+        while not stop.is_set():
+            try:
+                st = export_jobs.status(job_id)
+                assert st is not None and 0.0 <= st["progress"] <= 1.0
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+                return
+
+    job_id, _ = export_jobs.create()
+    export_jobs.start(job_id, produce, "out.txt", "text/plain", total=2000)
+    t = threading.Thread(target=poll, args=(job_id,))
+    t.start()
+    st = _wait(job_id, ("done", "failed"))
+    stop.set()
+    t.join()
+    assert not errors
+    assert st["status"] == "done"
+    assert st["progress"] == 1.0
+
+
+def test_failed_job_zero_done_has_no_eta():
+    def produce(state, jdir):
+        raise ValueError("boom")
+        yield b""
+
+    job_id, _ = export_jobs.create()
+    export_jobs.start(job_id, produce, "out.txt", "text/plain", total=10)
+    st = _wait(job_id, ("failed",))
+    assert st["error"] == "boom"
+    assert st["eta_sec"] is None
+    assert st["progress"] == 0.0
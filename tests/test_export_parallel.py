@@ -0,0 +1,26 @@
+from services import export_parallel
+
+
+def _square(x):
+    return x * x
+
+
+def test_pools_of_different_sizes_coexist():
+    try:
+        p2 = export_parallel.get_pool(2)
+        it = export_parallel.ordered_map(_square, range(20), workers=2)
+        assert next(it) == 0
+        # другой размер не закрывает пул, которым пользуется незаконченный map
+        p3 = export_parallel.get_pool(3)
+        assert p3 is not p2
+        assert list(it) == [x * x for x in range(1, 20)]
+        assert export_parallel.get_pool(2) is p2
+        assert list(export_parallel.ordered_map(_square, range(5), workers=3)) == [0, 1, 4, 9, 16]
+    finally:
+        export_parallel.shutdown_pool()
+    assert not export_parallel._pools
+
+
+def test_ordered_map_inline_and_shards():
+    assert list(export_parallel.ordered_map(_square, range(4), workers=1)) == [0, 1, 4, 9]
+    assert list(export_parallel.shards(range(5), size=2)) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,46 @@
+import json
+
+from services import json_index
+
+
+def _products(n):
+    # строки со скобками и экранированием, вложенные объекты и массивы
+    return [{"id": i, "name": f'tov "{i}" {{[', "tags": [i, {"k": "}]"}], "n": None} for i in range(n)]
+
+
+def _write(path, doc, **kw):
+    path.write_text(json.dumps(doc, ensure_ascii=False, **kw), encoding="utf-8")
+    return str(path)
+
+
+def test_pages_match_full_parse(tmp_path):
+    products = _products(25)
+    path = _write(tmp_path / "doc.json", {"meta": {"products": []}, "products": products}, indent=2)
+    assert json_index.build(path) == 25
+    for offset, limit in [(0, 10), (10, 10), (20, 10), (24, 1), (25, 5), (-3, 2), (5, 0)]:
+        total, items = json_index.read_page(path, offset, limit)
+        assert total == 25
+        start = max(0, offset)
+        assert items == products[start:start + max(0, limit)]
+
+
+def test_products_list_fallback(tmp_path):
+    products = _products(3)
+    path = _write(tmp_path / "doc.json", {"products": [], "products_list": products})
+    assert json_index.read_page(path, 1, 5) == (3, products[1:])
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = _write(tmp_path / "doc.json", {"products": _products(2)})
+    assert json_index.ensure(path) == 2
+    _write(tmp_path / "doc.json", {"products": _products(7)})
+    assert json_index.count(path) is None
+    total, items = json_index.read_page(path, 6, 10)
+    assert total == 7 and items[0]["id"] == 6
+
+
+def test_no_products(tmp_path):
+    path = _write(tmp_path / "doc.json", {"other": [1, 2]})
+    assert json_index.read_page(path, 0, 10) == (0, [])
+    (tmp_path / "empty.json").write_bytes(b"")
+    assert json_index.read_page(str(tmp_path / "empty.json"), 0, 10) == (0, [])
@@ -0,0 +1,66 @@
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from services.line_diff import unified_diff
+
+pytestmark = pytest.mark.skipif(shutil.which("patch") is None, reason="нужен GNU patch")
+
+
+def _apply(tmp_path, a: bytes, b: bytes, **kw) -> bytes:
+    pa, pb = tmp_path / "a.txt", tmp_path / "b.txt"
+    pa.write_bytes(a)
+    pb.write_bytes(b)
+    diff = b"".join(unified_diff(str(pa), str(pb), **kw))
+    if a == b:
+        assert diff == b""
+        return a
+    (tmp_path / "d.patch").write_bytes(diff)
+    out = tmp_path / "out.txt"
+    subprocess.run(["patch", "-s", "--binary", "-o", str(out), str(pa), str(tmp_path / "d.patch")],
+                   check=True, capture_output=True)
+    return out.read_bytes()
+
+
+def _mutate(rng, lines):
+    lines = list(lines)
+    for _ in range(rng.randint(0, 8)):
+        op = rng.random()
+        i = rng.randint(0, len(lines))
+        if op < 0.4:
+            lines[i:i] = [f"new {rng.random()}\n".encode() for _ in range(rng.randint(1, 4))]
+        elif op < 0.8 and lines:
+            del lines[i:i + rng.randint(1, 4)]
+        elif lines:
+            j = min(i, len(lines) - 1)
+            lines[j] = f"changed {rng.random()}\n".encode()
+    return lines
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_patch_roundtrip(tmp_path, seed):
+    rng = random.Random(seed)
+    a = [f"line {rng.randint(0, 40)}\n".encode() for _ in range(rng.randint(0, 200))]
+    b = _mutate(rng, a)
+    a_bytes, b_bytes = b"".join(a), b"".join(b)
+    assert _apply(tmp_path, a_bytes, b_bytes, window=50) == b_bytes
+
+
+@pytest.mark.parametrize("a,b", [
+    (b"x\ny\nz\n", b"x\ny\nz"),             # у нового нет \n в конце
+    (b"x\ny\nz", b"x\nY\nz"),               # у обоих нет \n в конце
+    (b"x\r\ny\r\n", b"x\ny\r\n"),           # сменился только конец строки
+    (b"", b"one\n"),
+    (b"one\n", b""),
+])
+def test_line_endings(tmp_path, a, b):
+    assert _apply(tmp_path, a, b) == b
+
+
+def test_ignore_space_hides_whitespace_changes(tmp_path):
+    pa, pb = tmp_path / "a.txt", tmp_path / "b.txt"
+    pa.write_bytes(b"a  b\nc\n")
+    pb.write_bytes(b"a b \nc\n")
+    assert b"".join(unified_diff(str(pa), str(pb), ignore_space=True)) == b""
@@ -0,0 +1,31 @@
+import pytest
+
+from services import profiling
+
+
+@pytest.fixture
+def token(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return "secret"
+
+
+def test_check_token(token):
+    assert profiling.check_token("secret")
+    assert not profiling.check_token("secreT")
+    assert not profiling.check_token("")
+    assert not profiling.check_token(None)
+
+
+def test_check_token_non_ascii(token):
+    # compare_digest на str с не-ASCII бросал TypeError
+    assert not profiling.check_token("s\xe9cret")
+    assert not profiling.check_token("\udce9")
+
+
+def test_non_ascii_token_over_http(token):
+    from app import create_app
+    client = create_app().test_client()
+    assert client.get("/", headers={"X-Profile": "s\xe9cret"}).status_code == 200
+    assert client.get("/_profiles?token=%C3%A9").status_code == 404
+    assert client.get("/_profiles", headers={"X-Profile-Token": "secret"}).status_code == 200
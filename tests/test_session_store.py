@@ -0,0 +1,89 @@
+import pytest
+from flask import Flask, session
+
+from services import session_store
+from services.session_store import ServerSideSessionInterface, SQLiteBackend
+
+
+class CountingBackend(SQLiteBackend):
+    def __init__(self, path):
+        super().__init__(path)
+        self.calls = {"get": 0, "version": 0}
+
+    def get(self, sid):
+        self.calls["get"] += 1
+        return super().get(sid)
+
+    def version(self, sid):
+        self.calls["version"] += 1
+        return super().version(sid)
+
+
+def _app(backend):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = ServerSideSessionInterface(backend)
+
+    @app.route("/set/<value>")
+    def set_value(value):
+        session["v"] = value
+        return "ok"
+
+    @app.route("/get")
+    def get_value():
+        return session.get("v", "-")
+
+    return app
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.sqlite3")
+
+
+def test_lru_hit_within_trust_window_skips_db(db_path, monkeypatch):
+    monkeypatch.setattr(session_store, "LRU_TRUST_SEC", 60.0)
+    backend = CountingBackend(db_path)
+    client = _app(backend).test_client()
+    client.get("/set/a")
+    assert client.get("/get").text == "a"
+    before = dict(backend.calls)
+    for _ in range(5):
+        assert client.get("/get").text == "a"
+    assert backend.calls == before
+
+
+def test_own_write_visible_immediately(db_path, monkeypatch):
+    monkeypatch.setattr(session_store, "LRU_TRUST_SEC", 60.0)
+    client = _app(CountingBackend(db_path)).test_client()
+    client.get("/set/a")
+    assert client.get("/get").text == "a"
+    client.get("/set/b")
+    assert client.get("/get").text == "b"
+
+
+def test_other_worker_write_seen_after_trust_window(db_path, monkeypatch):
+    monkeypatch.setattr(session_store, "LRU_TRUST_SEC", 60.0)
+    app1, app2 = _app(CountingBackend(db_path)), _app(CountingBackend(db_path))
+    client = app1.test_client()
+    client.get("/set/a")
+    assert client.get("/get").text == "a"
+    # тот же cookie — во «второй воркер»
+    client2 = app2.test_client()
+    client2._cookies = client._cookies
+    client2.get("/set/b")
+    assert client.get("/get").text == "a"   # в пределах окна — из LRU
+    monkeypatch.setattr(session_store, "LRU_TRUST_SEC", 0.0)
+    assert client.get("/get").text == "b"
+
+
+def test_zero_trust_checks_version_each_read(db_path, monkeypatch):
+    monkeypatch.setattr(session_store, "LRU_TRUST_SEC", 0.0)
+    backend = CountingBackend(db_path)
+    client = _app(backend).test_client()
+    client.get("/set/a")
+    client.get("/get")
+    before = dict(backend.calls)
+    client.get("/get")
+    assert backend.calls["version"] == before["version"] + 1
+    assert backend.calls["get"] == before["get"]
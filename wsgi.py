@@ -0,0 +1,69 @@
+"""
+Точка входа для продакшена.
+
+    gunicorn -c gunicorn.conf.py wsgi:app          # Linux (Render и т.п.)
+    python wsgi.py                                 # waitress, если установлен (Windows)
+
+Модули сервисов загружаются до fork (STP_PRELOAD_SERVICES, по умолчанию — да),
+и воркеры делят их страницы памяти. Всё, что не переживает fork (пулы соединений,
+потоки и процессы пулов выгрузок, соединения SQLite), сбрасывается в дочернем
+процессе через os.register_at_fork в самих модулях и поднимается в init_worker().
+app.py с app.run(debug=True) остаётся для локальной разработки.
+"""
+from __future__ import annotations
+import logging
+import os
+import sys
+
+os.environ.setdefault("STP_PRELOAD_SERVICES", "1")
+
+from app import create_app  # noqa: E402
+
+log = logging.getLogger("stp.wsgi")
+
+app = create_app()
+
+
+def init_worker() -> None:
+    """
+    Прогрев воркера после fork: пул БД и т.п. Ошибки не роняют воркер —
+    сервис поднимет ресурс при первом обращении.
+    """
+    store = sys.modules.get("services.template_store")
+    if store is not None and store.DB_URL:
+        try:
+            store.init_pool()
+        except Exception as e:
+            log.warning("Пул БД не поднят при старте воркера: %s", e)
+
+
+def shutdown_worker() -> None:
+    """
+    Останов воркера: дождаться фоновых выгрузок (в пределах graceful_timeout),
+    закрыть пулы процессов и соединений, сбросить снимок метрик.
+    """
+    jobs = sys.modules.get("services.export_jobs")
+    if jobs is not None:
+        jobs.shutdown(wait=True)
+    parallel = sys.modules.get("services.export_parallel")
+    if parallel is not None:
+        parallel.shutdown_pool()
+    store = sys.modules.get("services.template_store")
+    if store is not None:
+        store.close_pool()
+    metrics = sys.modules.get("services.metrics")
+    if metrics is not None:
+        metrics.flush()   # последние счётчики воркера остаются в сумме /metrics
+
+
+if __name__ == "__main__":
+    try:
+        from waitress import serve
+    except ImportError:
+        sys.exit("waitress не установлен: pip install waitress (или запускайте через gunicorn)")
+    init_worker()
+    try:
+        serve(app, host=os.environ.get("HOST", "0.0.0.0"), port=int(os.environ.get("PORT", "5000")),
+              threads=int(os.environ.get("WAITRESS_THREADS", "8")), channel_timeout=300)
+    finally:
+        shutdown_worker()